@@ -0,0 +1,130 @@
+import asyncio
+import inspect
+import threading
+import collections
+from core.event_bus import topic_of, BUS_CAPACITY
+
+# Dispatch concorrenti per topic: oltre, gli eventi attendono sul semaforo (nessun thread occupato)
+TOPIC_CONCURRENCY = 64
+
+
+class AsyncEventBus:
+    """
+    Bus pub/sub su un solo event loop, con la stessa API subscribe/emit di EventBusV6.
+    I listener possono essere coroutine o funzioni (queste girano inline sul loop: devono essere brevi).
+    Ogni topic ha un semaforo di concorrenza (set_concurrency; 1 = consegna in ordine): migliaia di
+    eventi in volo sono task in attesa, non thread. emit_and_wait() attende tutti i listener e ne
+    ritorna i risultati (request/response). bridge() collega topic del bus sincrono: il listener
+    sincrono fa solo call_soon_threadsafe, nessun thread resta in attesa del loop.
+    """
+
+    def __init__(self, logger, concurrency=TOPIC_CONCURRENCY, capacity=BUS_CAPACITY, loop=None):
+        self.logger = logger
+        self.concurrency = concurrency
+        self.capacity = capacity
+        self.listeners = {}
+        self.lock = threading.Lock()
+        self._limits = {}
+        self._semaphores = {}
+        self._tasks = set()
+        self._loop = loop
+        self.rejected = collections.Counter()
+        self.errors = collections.Counter()
+        self.dispatched = collections.Counter()
+
+    @property
+    def pending_count(self):
+        return len(self._tasks)
+
+    def bind(self, loop=None):
+        """Lega il bus al loop (default: quello in esecuzione). Necessario prima di emit_threadsafe/bridge."""
+        self._loop = loop or asyncio.get_running_loop()
+        return self._loop
+
+    def subscribe(self, event, fn):
+        topic = topic_of(event)
+        with self.lock:
+            self.listeners[topic] = self.listeners.get(topic, ()) + (fn,)
+
+    def set_concurrency(self, event, limit):
+        topic = topic_of(event)
+        self._limits[topic] = max(1, int(limit))
+        self._semaphores.pop(topic, None)
+
+    def _semaphore(self, topic):
+        sem = self._semaphores.get(topic)
+        if sem is None:
+            sem = self._semaphores[topic] = asyncio.Semaphore(self._limits.get(topic, self.concurrency))
+        return sem
+
+    # --- Emissione ---
+
+    def emit(self, event, data=None):
+        """Fire-and-forget, dal thread del loop."""
+        topic = topic_of(event)
+        loop = self._loop or self.bind()
+        if len(self._tasks) >= self.capacity:
+            self.rejected[topic] += 1
+            self.logger.critical(f"⚠️ AsyncEventBus SATURATO (>{self.capacity}). Dropping event: {event}")
+            return
+        task = loop.create_task(self._dispatch(topic, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def emit_threadsafe(self, event, data=None):
+        """emit() da qualunque thread: un solo hop sul loop, nessuna attesa."""
+        if self._loop is None: raise RuntimeError("AsyncEventBus non legato a un loop: chiamare bind().")
+        try:
+            self._loop.call_soon_threadsafe(self.emit, event, data)
+        except RuntimeError:
+            # Loop chiuso: l'evento non ha più consumatori
+            self.rejected[topic_of(event)] += 1
+
+    async def emit_and_wait(self, event, data=None, timeout=None, return_exceptions=False):
+        """
+        Consegna l'evento a tutti i listener e ne attende la fine. Ritorna i risultati in ordine di
+        sottoscrizione; con return_exceptions=False la prima eccezione di un listener viene rilanciata.
+        """
+        dispatch = self._dispatch(topic_of(event), data)
+        results = await (asyncio.wait_for(dispatch, timeout) if timeout is not None else dispatch)
+        if not return_exceptions:
+            for r in results:
+                if isinstance(r, BaseException): raise r
+        return results
+
+    async def _dispatch(self, topic, data):
+        listeners = self.listeners.get(topic, ())
+        if not listeners: return []
+        async with self._semaphore(topic):
+            self.dispatched[topic] += 1
+            if len(listeners) == 1: return [await self._call(topic, listeners[0], data)]
+            return list(await asyncio.gather(*(self._call(topic, fn, data) for fn in listeners)))
+
+    async def _call(self, topic, fn, data):
+        try:
+            result = fn(data)
+            if inspect.isawaitable(result): result = await result
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors[topic] += 1
+            self.logger.error(f"AsyncEventBus Error ({topic}): {e}")
+            return e
+
+    # --- Ponte dal bus sincrono ---
+
+    def bridge(self, sync_bus, *events):
+        """Inoltra i topic indicati dal bus sincrono (EventBusV6) a questo bus."""
+        if self._loop is None: raise RuntimeError("AsyncEventBus non legato a un loop: chiamare bind().")
+        for event in events:
+            sync_bus.subscribe(event, lambda data, e=topic_of(event): self.emit_threadsafe(e, data))
+
+    async def wait_idle(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for t in tasks: t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
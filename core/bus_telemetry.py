@@ -0,0 +1,103 @@
+import os
+import json
+import time
+
+# Bucket log2 su unità da 1024ns (~1µs): il bucket i copre [2^(i-1), 2^i) unità.
+# 64 bucket coprono qualunque int64 di nanosecondi: nessun clamp nel percorso caldo
+HISTOGRAM_BUCKETS = 64
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """
+    Istogramma log2 a scrittore singolo: ogni topic è smaltito da un solo worker alla volta (e ogni
+    listener gira su una sola lane), quindi gli incrementi non hanno bisogno di lock.
+    I lettori vedono al più un campione di ritardo.
+    """
+    __slots__ = ("counts", "n", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.n = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.counts[(ns >> 10).bit_length()] += 1
+        self.n += 1
+        self.total_ns += ns
+        if ns > self.max_ns: self.max_ns = ns
+
+    def add_many(self, values):
+        counts, top = self.counts, self.max_ns
+        for ns in values:
+            counts[(ns >> 10).bit_length()] += 1
+            if ns > top: top = ns
+        self.n += len(values)
+        self.total_ns += sum(values)
+        self.max_ns = top
+
+    def percentile_ms(self, pct):
+        # Limite superiore del bucket che contiene il rank: stima per eccesso, mai per difetto
+        if not self.n: return 0.0
+        rank, seen = -(-self.n * pct // 100), 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank: return min((1 << i) * 1024 / 1e6, self.max_ns / 1e6)
+        return self.max_ns / 1e6
+
+    def merged_with(self, values):
+        h = Histogram()
+        h.counts, h.n, h.total_ns, h.max_ns = list(self.counts), self.n, self.total_ns, self.max_ns
+        if values: h.add_many(values)
+        return h
+
+    def summary(self):
+        out = {"count": self.n, "avg_ms": round(self.total_ns / self.n / 1e6, 3) if self.n else 0.0}
+        for pct in PERCENTILES:
+            out[f"p{pct}_ms"] = round(self.percentile_ms(pct), 3)
+        out["max_ms"] = round(self.max_ns / 1e6, 3)
+        return out
+
+
+class TopicTelemetry:
+    __slots__ = ("emitted", "dispatched", "lag")
+
+    def __init__(self):
+        self.emitted = 0
+        self.dispatched = 0
+        self.lag = Histogram()
+
+
+class ListenerTelemetry:
+    """
+    Tempi di esecuzione di un listener. Il percorso caldo fa solo un append su `samples`;
+    il worker li riversa nell'istogramma a fine batch (fold), i lettori vedono entrambi.
+    """
+    __slots__ = ("errors", "runtime", "samples")
+
+    def __init__(self):
+        self.errors = 0
+        self.runtime = Histogram()
+        self.samples = []
+
+    def fold(self):
+        samples, self.samples = self.samples, []
+        self.runtime.add_many(samples)
+
+    def histogram(self):
+        return self.runtime.merged_with(list(self.samples))
+
+
+def dump(snapshot, path, logger=None):
+    """Scrive lo snapshot di telemetria in JSON (scrittura atomica) e ne logga il riassunto."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"at": time.time(), **snapshot}, f, indent=2, default=str)
+    os.replace(tmp, path)
+    if logger:
+        worst = snapshot.get("slowest_listeners") or []
+        head = ", ".join(f"{l['topic']}/{l['listener']} p99={l['p99_ms']}ms" for l in worst[:3]) or "nessuno"
+        logger.info(f"📊 Telemetria EventBus salvata in {path}. Listener più lenti: {head}")
+    return path
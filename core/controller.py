@@ -9,6 +9,9 @@ from typing import Dict, Any
 from PySide6.QtCore import QObject, Signal
 
 from core.event_bus import bus
+from core.events import AppEvent, Heartbeat, BalanceUpdate
+from core.event_journal import EventJournal
+from core.event_ring import EventRing
 from core.playwright_worker import PlaywrightWorker
 from core.telegram_worker import TelegramWorker
 from core.execution_engine import ExecutionEngine
@@ -39,6 +42,8 @@ class SuperAgentController(QObject):
         allow_bets = self.config.get("betting", {}).get("allow_place", False)
 
         self.db = Database()
+        ttl_hours = self.config.get("ledger", {}).get("dedup_ttl_hours")
+        if ttl_hours: self.db.set_dedup_ttl(float(ttl_hours) * 3600)
         
         try: self.db.resolve_panics()
         except: pass
@@ -52,6 +57,10 @@ class SuperAgentController(QObject):
                 self.logger.critical(f"♻️ RECOVERY: Trovate {len(placed)} PLACED post-crash.")
         except: pass
 
+        # 🗄️ Tiering del journal in background: il boot non aspetta l'archiviazione
+        horizon = self.config.get("ledger", {}).get("archive_horizon_days", 90)
+        threading.Thread(target=self._archive_journal, args=(horizon,), daemon=True, name="JournalArchiver").start()
+
         self.money_manager = MoneyManager(self.db)
         
         self._worker_lock = threading.Lock()
@@ -82,16 +91,36 @@ class SuperAgentController(QObject):
         bus.subscribe("BET_SUCCESS", self._on_bet_success)
         bus.subscribe("BET_FAILED", self._on_bet_failed)
 
+        # 📼 Journal eventi: dopo le subscribe, così le notifiche non consegnate prima del crash vengono rigiocate
+        if self.config.get("events", {}).get("journal", False):
+            try: bus.attach_journal(EventJournal(logger=logger))
+            except Exception as e: self.logger.error(f"Journal eventi non disponibile: {e}")
+
+        # 🔁 Ring in shared memory: heartbeat e supervisor leggono il bus da fuori processo
+        if self.config.get("events", {}).get("shared_ring", False):
+            try: bus.attach_ring(EventRing.create())
+            except Exception as e: self.logger.error(f"Ring eventi condiviso non disponibile: {e}")
+
         threading.Thread(target=self._master_watchdog, daemon=True).start()
         
         # 💓 ATTIVAZIONE BATTITO CARDIACO PER LA UI
         self._heartbeat_thread = threading.Thread(target=self._keep_alive, daemon=True)
         self._heartbeat_thread.start()
 
+    def _archive_journal(self, horizon_days):
+        try: self.db.archive_journal(horizon_days)
+        except Exception as e: self.logger.error(f"Errore archiviazione journal: {e}")
+        # Dopo il tiering: le analytics caricano il journal caldo una volta sola, poi vanno a delta
+        try:
+            for account in self.db.accounts(): self.db.ledger(account).analytics.warm()
+        except Exception as e: self.logger.error(f"Errore warm-up analytics: {e}")
+
     def _keep_alive(self):
         """Invia un segnale di vita continuo per non far scattare l'allarme della UI."""
         while True:
             self.last_heartbeat = time.time()
+            # Topic latest-value: un subscriber in ritardo vede solo l'ultimo battito
+            bus.emit(AppEvent.HEARTBEAT, Heartbeat("controller", self.last_heartbeat))
             time.sleep(5)
 
     def _signal_handler(self, signum, frame):
@@ -173,10 +202,13 @@ class SuperAgentController(QObject):
         if not self.is_running or self.circuit_open: return False
         
         try:
-            if bus.pending_count > 30:
+            # backlog: coda più arretrato su disco, un bus che sta riversando su spill è sotto pressione
+            if bus.backlog > 30:
+                # Shedding esplicito: il segnale non entra nel bus sotto pressione, ma resta contato
+                bus.shed("process_signal")
                 return False
         except AttributeError:
-            self.logger.critical("❌ Errore d'infrastruttura: EventBus non implementa 'pending_count'. Drop forzato.")
+            self.logger.critical("❌ Errore d'infrastruttura: EventBus non implementa 'backlog'. Drop forzato.")
             return False
 
         if isinstance(payload, str):
@@ -275,12 +307,22 @@ class SuperAgentController(QObject):
                         self.telegram.start()
                     except Exception: pass
 
+    def _publish_balances(self):
+        # Saldi dallo specchio in-memory; BALANCE_UPDATE è latest-value per conto
+        try:
+            for account in self.db.accounts():
+                current, peak = self.db.get_balance(account)
+                bus.emit(AppEvent.BALANCE_UPDATE, BalanceUpdate(account, current, peak))
+        except Exception as e: self.logger.error(f"Errore pubblicazione saldi: {e}")
+
     def _on_bet_success(self, payload):
         tx_id = payload.get("tx_id", "UNKNOWN")
         stake = payload.get("stake", 0)
         self.log_message.emit(f"✅ BET SUCCESS (Tx: {tx_id}) - {stake}€")
+        self._publish_balances()
 
     def _on_bet_failed(self, payload):
         tx_id = payload.get("tx_id", "UNKNOWN")
         reason = payload.get("reason", "Unknown Error")
         self.log_message.emit(f"❌ BET FAILED (Tx: {tx_id}) - Reason: {reason}")
+        self._publish_balances()
@@ -3,17 +3,367 @@ import time
 import threading
 import sqlite3
 import math
+import queue
+import functools
+import contextlib
+import collections
+import concurrent.futures
 from pathlib import Path
 from core.invariants_guard import LedgerGuard
+from core.ledger_mirror import LedgerMirror
+from core.journal_archive import JournalArchiver, ARCHIVE_HORIZON_DAYS
+from core.intent_log import IntentLog, PRE_CLICK, POST_CLICK
+from core.ledger_maintenance import LedgerMaintenance
+from core import journal_transitions
+from core.journal_analytics import JournalAnalytics
+from core.roserpina_state import RoserpinaStore
+from core.signal_dedup import DEDUP_TTL_SECONDS, claim_fingerprint, prune_fingerprints
 
 DB_DIR = os.path.join(str(Path.home()), ".superagent_data")
 os.makedirs(DB_DIR, exist_ok=True)
 DB_PATH = os.path.join(DB_DIR, "money_db.sqlite")
+ARCHIVE_DIR = os.path.join(DB_DIR, "archive")
+INTENT_LOG_PATH = os.path.join(DB_DIR, "intent.log")
+ACCOUNTS_DIR = os.path.join(DB_DIR, "accounts")
+
+# Conto di default: resta in money_db.sqlite. Gli altri conti sono shard in accounts/<conto>.sqlite,
+# ognuno con bankroll, writer e lock propri: le scritture su conti diversi committano in parallelo.
+DEFAULT_ACCOUNT = "default"
+
+# Group-commit: finestra di raccolta e dimensione massima di un batch di transizioni
+GROUP_COMMIT_WINDOW = 0.002
+GROUP_COMMIT_MAX_BATCH = 256
+
+# Connessioni read-only separate dallo scrittore (WAL: i lettori non bloccano e non sono bloccati)
+READER_POOL_SIZE = 4
+READER_CHECKOUT_TIMEOUT = 30
+
+# Stati "in volo": l'indice parziale copre solo queste righe, quindi resta piccolo qualunque sia lo storico.
+# Le query hot-path devono riportare _INFLIGHT_SQL letterale perché SQLite possa usare l'indice parziale.
+INFLIGHT_STATUSES = ("RESERVED", "PRE_COMMIT", "PLACED", "MANUAL_CHECK")
+_INFLIGHT_SQL = "status IN ('RESERVED', 'PRE_COMMIT', 'PLACED', 'MANUAL_CHECK')"
+
+# Pagina di default dello storico (keyset su (timestamp, id), costo indipendente dalla dimensione del journal)
+HISTORY_PAGE_SIZE = 100
+
+# Migrazioni di schema versionate (PRAGMA user_version). Ogni step è SQL o callable(conn).
+# Solo append: mai modificare una versione già rilasciata.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        f"CREATE INDEX IF NOT EXISTS idx_journal_inflight ON journal(status, table_id) WHERE {_INFLIGHT_SQL}",
+        "CREATE INDEX IF NOT EXISTS idx_journal_timestamp ON journal(timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_journal_match_hash ON journal(match_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_journal_table_id ON journal(table_id)",
+    ]),
+    (2, [
+        lambda conn: _add_column(conn, "journal", "robot", "TEXT DEFAULT ''"),
+    ]),
+    (3, [
+        # Indice unico di dedup dei segnali: fingerprint -> tx che l'ha giocato, potato per TTL
+        """CREATE TABLE IF NOT EXISTS signal_dedup (
+            fingerprint TEXT PRIMARY KEY,
+            tx_id TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_signal_dedup_created ON signal_dedup(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_signal_dedup_tx ON signal_dedup(tx_id)",
+    ]),
+    (4, [
+        # Storico append-only dei cambi di stato, alimentato da trigger TEMP (journal_transitions.install)
+        """CREATE TABLE IF NOT EXISTS journal_transitions (
+            id INTEGER PRIMARY KEY,
+            tx_id TEXT NOT NULL,
+            from_status TEXT,
+            to_status TEXT NOT NULL,
+            mono_ns INTEGER NOT NULL,
+            wall_ns INTEGER NOT NULL,
+            session INTEGER NOT NULL,
+            robot TEXT DEFAULT '',
+            table_id INTEGER
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_transitions_tx ON journal_transitions(tx_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_transitions_wall ON journal_transitions(wall_ns)",
+    ]),
+    (5, [
+        # Storico filtrato per stato o robot: keyset sull'indice composto, niente scan di idx_journal_timestamp
+        "CREATE INDEX IF NOT EXISTS idx_journal_status_ts ON journal(status, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_journal_robot_ts ON journal(robot, timestamp, id)",
+    ]),
+]
+
+
+def _account_name(account):
+    name = str(account or DEFAULT_ACCOUNT).strip()
+    if not all(c.isalnum() or c in "-_" for c in name):
+        raise ValueError(f"Nome conto non valido: {account}")
+    return name
+
+
+def _route_by_tx(method):
+    """Le transizioni su una tx in volo vengono eseguite dallo shard del conto che la possiede."""
+    @functools.wraps(method)
+    def wrapper(self, tx_id, *args, **kwargs):
+        ledger = self._ledger_for_tx(tx_id)
+        if ledger is not self:
+            return getattr(ledger, method.__name__)(tx_id, *args, **kwargs)
+        return method(self, tx_id, *args, **kwargs)
+    return wrapper
+
+
+def _add_column(conn, table, column, decl):
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+class ReaderPool:
+    """
+    Pool di connessioni SQLite read-only con checkout per-thread.
+    In WAL ogni lettore vede l'ultimo snapshot committato senza contendere il lock dello scrittore:
+    report lunghi e polling UI girano in parallelo al piazzamento delle bet.
+    Espone metriche di attesa (checkout, attese, tempo medio/massimo) per rendere visibile la contesa.
+    """
+
+    def __init__(self, path, size=READER_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._all = []
+        self._waiters = collections.deque()
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                               timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON;")
+        conn.execute("PRAGMA trusted_schema=OFF;")
+        return conn
+
+    def _acquire(self):
+        with self._pool_lock:
+            if self._idle:
+                return self._idle.pop(), 0.0
+            if len(self._all) < self.size:
+                conn = self._open()
+                self._all.append(conn)
+                return conn, 0.0
+            # Pool esaurito: coda FIFO, la connessione viene consegnata direttamente al primo in attesa
+            slot = queue.Queue(maxsize=1)
+            self._waiters.append(slot)
+
+        start = time.perf_counter()
+        try:
+            conn = slot.get(timeout=READER_CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            with self._pool_lock:
+                try: self._waiters.remove(slot)
+                except ValueError: pass
+            # Consegna arrivata sul filo del timeout: non va persa
+            if slot.empty():
+                raise TimeoutError(f"ReaderPool esaurito: nessuna connessione libera in {READER_CHECKOUT_TIMEOUT}s")
+            conn = slot.get_nowait()
+        return conn, time.perf_counter() - start
+
+    def _release(self, conn):
+        with self._pool_lock:
+            if self._waiters:
+                self._waiters.popleft().put_nowait(conn)
+            else:
+                self._idle.append(conn)
+
+    @contextlib.contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # Checkout annidato sullo stesso thread: riusa la connessione già in mano
+            yield held
+            return
+
+        conn, waited = self._acquire()
+        with self._stats_lock:
+            self.checkouts += 1
+            if waited > 0:
+                self.waits += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                try: conn.execute("ROLLBACK")
+                except: pass
+            self._release(conn)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "open": len(self._all),
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_avg_ms": (self.wait_total / self.waits * 1000.0) if self.waits else 0.0,
+                "wait_max_ms": self.wait_max * 1000.0,
+            }
+
+    def close(self):
+        with self._pool_lock:
+            for conn in self._all:
+                try: conn.close()
+                except: pass
+            self._all.clear()
+
+
+class LedgerWriter:
+    """
+    Thread scrittore unico del ledger (group-commit).
+    Raccoglie le transizioni di tutti i chiamanti e le applica in un'unica transazione
+    BEGIN IMMEDIATE ... COMMIT per finestra di flush: un solo fsync per batch.
+    Ogni transizione gira nel proprio SAVEPOINT (un errore non contamina le altre) e
+    il suo Future viene risolto solo dopo il COMMIT, quindi il chiamante resta crash-safe.
+    """
+
+    def __init__(self, db, window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.transitions = 0
+        self._effects = []
+        self._queue = queue.Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="LedgerWriter")
+        self._thread.start()
+
+    def submit(self, op):
+        """Accoda op(conn) e ritorna il Future di durabilità della transizione."""
+        future = concurrent.futures.Future()
+        if not self._running:
+            future.set_exception(RuntimeError("LedgerWriter fermo: scrittura rifiutata."))
+            return future
+        self._queue.put((op, future))
+        return future
+
+    def after_commit(self, fn):
+        """Registra un effetto in-memory della transizione corrente: applicato solo se il suo batch committa."""
+        self._effects.append(fn)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while self._running:
+            try: first = self._queue.get(timeout=1)
+            except queue.Empty: continue
+            if first is None: break
+            self._flush(self._collect(first))
+
+        # Drain finale: nessun chiamante deve restare appeso su un Future mai risolto
+        leftovers = []
+        while True:
+            try: item = self._queue.get_nowait()
+            except queue.Empty: break
+            if item is not None: leftovers.append(item)
+        if leftovers:
+            self._flush(leftovers)
+
+    def _flush(self, batch):
+        done = []
+        with self.db._write_lock:
+            with self.db._lock:
+                conn = self.db.conn
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                except Exception as e:
+                    for _, future in batch: future.set_exception(e)
+                    return
+
+                for idx, (op, future) in enumerate(batch):
+                    if not future.set_running_or_notify_cancel(): continue
+                    self._effects = []
+                    try:
+                        conn.execute("SAVEPOINT transition")
+                        result = op(conn)
+                        conn.execute("RELEASE transition")
+                        done.append((future, result, self._effects))
+                    except BaseException as e:
+                        if conn.in_transaction:
+                            try:
+                                conn.execute("ROLLBACK TO transition")
+                                conn.execute("RELEASE transition")
+                            except: pass
+                        future.set_exception(e)
+                        if not conn.in_transaction:
+                            # SQLite ha annullato l'intera transazione (I/O, disco pieno): batch perso
+                            for f, _, _ in done: f.set_exception(e)
+                            for _, f in batch[idx + 1:]: f.set_exception(e)
+                            return
+
+                try:
+                    if done: LedgerGuard.pre_commit_check(conn)
+                    balance = conn.execute("SELECT current_balance, peak_balance FROM balance WHERE id = 1").fetchone()
+                    conn.execute("COMMIT")
+                except BaseException as e:
+                    try: conn.execute("ROLLBACK")
+                    except: pass
+                    for future, _, _ in done: future.set_exception(e)
+                    return
+
+                self.batches += 1
+                self.transitions += len(done)
+                self._apply_effects(conn, balance, done)
+
+        for future, result, _ in done:
+            future.set_result(result)
+
+    def _apply_effects(self, conn, balance, done):
+        # Stessa sezione critica del COMMIT: nessun lettore vede SQLite e specchio disallineati
+        mirror = self.db.mirror
+        try:
+            if balance: mirror.set_balance(balance["current_balance"], balance["peak_balance"])
+            for _, _, effects in done:
+                for fn in effects: fn()
+        except Exception:
+            self.db._rebuild_mirror()
+
+    def stop(self, timeout=5):
+        if not self._running: return
+        self._running = False
+        self._queue.put(None)
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30, isolation_level=None)
+    def __init__(self, path=DB_PATH, account=DEFAULT_ACCOUNT):
+        self.path = path
+        self.account = account
+        self.dedup_ttl = DEDUP_TTL_SECONDS
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
+        # Effettivo solo su file nuovi (prima di CREATE TABLE): abilita il recupero a step di LedgerMaintenance
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
         self.conn.execute("PRAGMA journal_mode=WAL;")
         self.conn.execute("PRAGMA synchronous=FULL;")
         self.conn.execute("PRAGMA foreign_keys=ON;")
@@ -21,7 +371,22 @@ class Database:
         
         self._lock = threading.RLock()
         self._write_lock = threading.Lock()
+        self.mirror = LedgerMirror()
+        self.roserpina = RoserpinaStore()
         self._init_db()
+        self._rebuild_mirror()
+        self._writer = LedgerWriter(self)
+        self.readers = ReaderPool(path)
+        # Intent log unico per processo: i marker sono per tx_id, lo shard si risolve dallo specchio
+        self.intents = IntentLog.open(INTENT_LOG_PATH)
+        self.archive = JournalArchiver(self, ARCHIVE_DIR if account == DEFAULT_ACCOUNT else os.path.join(ARCHIVE_DIR, account))
+        self.maintenance = LedgerMaintenance(self, path + "-wal")
+        self.analytics = JournalAnalytics(self)
+
+        self._accounts = {account: self}
+        self._accounts_lock = threading.Lock()
+        if account == DEFAULT_ACCOUNT:
+            self._open_existing_accounts()
 
     def _init_db(self):
         with self._write_lock:
@@ -46,7 +411,9 @@ class Database:
                         peak_balance REAL CHECK (peak_balance >= current_balance)
                     )
                 """)
-                self.conn.execute("INSERT OR IGNORE INTO balance (id, current_balance, peak_balance) VALUES (1, 1000.0, 1000.0)")
+                # Bankroll iniziale solo per il conto storico: un conto nuovo parte da zero finché non viene finanziato
+                initial = 1000.0 if self.account == DEFAULT_ACCOUNT else 0.0
+                self.conn.execute("INSERT OR IGNORE INTO balance (id, current_balance, peak_balance) VALUES (1, ?, ?)", (initial, initial))
                 
                 # 🛡️ FIX: Aggiunta tabella per Roserpina
                 self.conn.execute("""
@@ -71,223 +438,482 @@ class Database:
                         SELECT RAISE(ABORT, 'FATAL INVARIANT: Peak balance cannot decrease');
                     END;
                 """)
+                self._migrate()
+                LedgerGuard.install(self.conn)
+                journal_transitions.install(self.conn)
 
-    def get_balance(self):
+    def _migrate(self):
+        """Porta un money_db.sqlite esistente all'ultima versione di schema, una transazione per versione."""
+        current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, steps in SCHEMA_MIGRATIONS:
+            if version <= current: continue
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for step in steps:
+                    if callable(step): step(self.conn)
+                    else: self.conn.execute(step)
+                self.conn.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.execute("COMMIT")
+            except Exception:
+                try: self.conn.execute("ROLLBACK")
+                except: pass
+                raise
+            current = version
+
+    @property
+    def schema_version(self):
+        with self._lock:
+            return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def audit_ledger(self):
+        """Verifica full-table esplicita degli invarianti (fuori dal percorso di commit)."""
+        for ledger in self._ledgers():
+            with ledger.readers.connection() as conn:
+                LedgerGuard.audit(conn)
+
+    def reader_stats(self):
+        return self.readers.stats()
+
+    def maintenance_stats(self, account=DEFAULT_ACCOUNT):
+        """Metriche WAL/checkpoint/optimize/vacuum dello scheduler di manutenzione del conto."""
+        return self.ledger(account).maintenance.stats()
+
+    def archive_journal(self, horizon_days=ARCHIVE_HORIZON_DAYS):
+        """Sposta SETTLED/VOID più vecchi dell'orizzonte negli archivi mensili (batch, crash-safe)."""
+        return sum(ledger.archive.run(horizon_days) for ledger in self._ledgers())
+
+    def query_journal(self, where="1=1", params=(), since=None, until=None, order_by="timestamp DESC, id DESC", limit=None, account=DEFAULT_ACCOUNT):
+        """API di lettura unificata: file caldo + archivi mensili attaccati on-demand."""
+        ledger = self.ledger(account)
+        with ledger.readers.connection() as conn:
+            return ledger.archive.query(conn, where, params, since, until, order_by, limit)
+
+    # --- Storico paginato (dashboard) ---
+
+    @staticmethod
+    def _history_filters(status=None, robot=None, since=None, until=None):
+        clauses, params = [], []
+        if status:
+            statuses = (status,) if isinstance(status, str) else tuple(status)
+            clauses.append(f"status IN ({','.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if robot is not None:
+            clauses.append("robot = ?")
+            params.append(robot)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(int(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(int(until))
+        return clauses, params
+
+    def history_page(self, limit=HISTORY_PAGE_SIZE, before=None, after=None, status=None, robot=None,
+                     since=None, until=None, account=DEFAULT_ACCOUNT):
+        """
+        Pagina dello storico dal più recente, keyset su (timestamp, id) (con filtri: (status|robot, timestamp, id)).
+        before=(ts, id): pagina successiva (più vecchia); after=(ts, id): pagina precedente (più recente).
+        Quando la pagina scende nel range degli archivi mensili (o il file caldo è finito) la stessa
+        keyset passa da archive.query, che unisce file caldo e mesi archiviati.
+        Ritorna {"rows", "next", "prev"}: i cursori da passare come before/after, None a fine corsa.
+        """
+        clauses, params = self._history_filters(status, robot, since, until)
+        if before is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(before)
+        elif after is not None:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params.extend(after)
+        where = " AND ".join(clauses) or "1=1"
+        direction = "ASC" if after is not None and before is None else "DESC"
+
+        ledger = self.ledger(account)
+        with ledger.readers.connection() as conn:
+            rows = [dict(r) for r in conn.execute(
+                f"SELECT * FROM journal WHERE {where} ORDER BY timestamp {direction}, id {direction} LIMIT ?",
+                params + [int(limit) + 1],
+            ).fetchall()]
+            newest = ledger.archive.newest_timestamp()
+            if newest is not None:
+                # File caldo finito, o limite basso della pagina nel range archiviato: righe archiviate le appartengono
+                if len(rows) <= limit:
+                    low = None
+                else:
+                    low = rows[-1]["timestamp"] if direction == "DESC" else after[0]
+                if low is None or low <= newest:
+                    # Il cursore restringe i mesi da attaccare
+                    lo, hi = since, until
+                    if after is not None: lo = after[0] if lo is None else max(lo, after[0])
+                    if before is not None: hi = before[0] + 1 if hi is None else min(hi, before[0] + 1)
+                    rows = ledger.archive.query(conn, where, params, lo, hi,
+                                                f"timestamp {direction}, id {direction}", int(limit) + 1)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "ASC": rows.reverse()
+
+        cursor = lambda r: (r["timestamp"], r["id"])
+        older = more if direction == "DESC" else after is not None
+        newer = (before is not None) if direction == "DESC" else more
+        return {
+            "rows": rows,
+            "next": cursor(rows[-1]) if rows and older else None,
+            "prev": cursor(rows[0]) if rows and newer else None,
+        }
+
+    def journal_version(self, account=DEFAULT_ACCOUNT):
+        """Versione corrente del journal: id dell'ultima transizione registrata (monotona)."""
+        with self.ledger(account).readers.connection() as conn:
+            return conn.execute("SELECT MAX(id) FROM journal_transitions").fetchone()[0] or 0
+
+    def history_changes(self, since_version, limit=HISTORY_PAGE_SIZE, account=DEFAULT_ACCOUNT):
+        """
+        Delta: righe inserite o cambiate di stato dopo since_version (id di journal_transitions).
+        Costo proporzionale ai cambiamenti. Ritorna {"rows", "version"}; se i cambi superano limit,
+        version si ferma all'ultimo consegnato e la chiamata successiva riprende da lì.
+        """
+        with self.ledger(account).readers.connection() as conn:
+            conn.execute("BEGIN")  # righe e versione dallo stesso snapshot
+            try:
+                rows, version = self._changes_since(conn, int(since_version), int(limit))
+            finally:
+                conn.execute("COMMIT")
+        return {"rows": rows, "version": max(version, int(since_version))}
+
+    @staticmethod
+    def _changes_since(conn, since_version, limit):
+        # NOT INDEXED: senza, il planner sceglie idx_transitions_tx per il GROUP BY e scansiona tutta la tabella;
+        # così è un range sul rowid, proporzionale ai soli cambi.
+        # LEFT JOIN: le tx già archiviate contano per il limite (versione coerente) ma non vengono consegnate
+        changed = conn.execute("""
+            SELECT c.version, j.* FROM (
+                SELECT tx_id, MAX(id) AS version FROM journal_transitions NOT INDEXED
+                WHERE id > ? GROUP BY tx_id ORDER BY version LIMIT ?
+            ) c LEFT JOIN journal j ON j.tx_id = c.tx_id
+            ORDER BY c.version
+        """, (since_version, limit)).fetchall()
+        rows = [dict(r) for r in changed if r["id"] is not None]
+        if len(changed) < limit:
+            return rows, conn.execute("SELECT MAX(id) FROM journal_transitions").fetchone()[0] or 0
+        return rows, changed[-1]["version"]
+
+    def transition_latency(self, since=None, until=None, by=("day", "robot", "table_id"), account=DEFAULT_ACCOUNT):
+        """p50/p95/p99 (ms) del tempo in RESERVED/PRE_COMMIT/PLACED/MANUAL_CHECK per giorno, robot e tavolo."""
+        with self.ledger(account).readers.connection() as conn:
+            return journal_transitions.time_in_state(conn, since, until, by)
+
+    def journal_analytics(self, account=DEFAULT_ACCOUNT, rolling_window=100, points=500):
+        """Analytics vettoriali P&L/drawdown/ROI del conto (cache per high-water mark). None senza NumPy."""
+        return self.ledger(account).analytics.summary(rolling_window, points)
+
+    # --- Conti (shard del ledger) ---
+
+    def _open_existing_accounts(self):
+        if not os.path.isdir(ACCOUNTS_DIR): return
+        for name in sorted(os.listdir(ACCOUNTS_DIR)):
+            if name.endswith(".sqlite"): self.ledger(name[:-len(".sqlite")])
+
+    def ledger(self, account=DEFAULT_ACCOUNT):
+        """Ledger del conto, aperto on-demand (accounts/<conto>.sqlite, bankroll iniziale 0)."""
+        account = _account_name(account)
+        shard = self._accounts.get(account)
+        if shard is not None: return shard
+        if self.account != DEFAULT_ACCOUNT:
+            raise ValueError(f"Lo shard {self.account} non gestisce il conto {account}.")
+        with self._accounts_lock:
+            shard = self._accounts.get(account)
+            if shard is None:
+                os.makedirs(ACCOUNTS_DIR, exist_ok=True)
+                shard = Database(os.path.join(ACCOUNTS_DIR, f"{account}.sqlite"), account)
+                shard.dedup_ttl = self.dedup_ttl
+                self._accounts[account] = shard
+            return shard
+
+    def accounts(self):
+        return sorted(self._accounts)
+
+    def _ledgers(self):
+        return list(self._accounts.values())
+
+    def _find_tx(self, tx_id):
+        for ledger in self._ledgers():
+            if ledger.mirror.has_tx(tx_id): return ledger
+        return None
+
+    def _ledger_for_tx(self, tx_id):
+        # Lookup O(1) sugli specchi: ogni tx in volo appartiene a un solo shard
+        return self._find_tx(tx_id) or self
+
+    def has_inflight(self, tx_id):
+        return self._find_tx(tx_id) is not None
+
+    def total_balance(self):
+        """Totali cross-conto calcolati in lettura dagli specchi: (somma saldi, somma peak)."""
+        balances = [ledger.mirror.get_balance() for ledger in self._ledgers()]
+        return sum(b[0] for b in balances), sum(b[1] for b in balances)
+
+    def total_exposure(self):
+        return sum(ledger.mirror.total_exposure() for ledger in self._ledgers())
+
+    def accounts_snapshot(self):
+        snap = {ledger.account: ledger.mirror.snapshot() for ledger in self._ledgers()}
+        current, peak = self.total_balance()
+        snap["total"] = {"balance": current, "peak": peak, "exposure": self.total_exposure(),
+                         "pending": sum(s["pending"] for s in snap.values())}
+        return snap
+
+    def _rebuild_mirror(self):
         with self._lock:
             row = self.conn.execute("SELECT current_balance, peak_balance FROM balance WHERE id = 1").fetchone()
-            return (float(row["current_balance"]), float(row["peak_balance"])) if row else (0.0, 0.0)
+            rows = self.conn.execute(f"SELECT tx_id, amount, table_id, robot FROM journal WHERE {_INFLIGHT_SQL}").fetchall()
+            self.mirror.rebuild((row[0], row[1]) if row else (0.0, 0.0), rows)
+            self.roserpina.load(self.conn.execute("SELECT * FROM roserpina_tables ORDER BY table_id").fetchall())
+
+    def get_balance(self, account=DEFAULT_ACCOUNT):
+        # Servito dallo specchio in-memory: nessun accesso a disco né al lock del Database
+        return self.ledger(account).mirror.get_balance()
 
     # 🛡️ FIX: Metodo di lettura sicuro per il Cruscotto UI (previene gli errori a schermo)
-    def get_roserpina_tables(self):
-        with self._lock:
-            try:
-                return [dict(r) for r in self.conn.execute("SELECT * FROM roserpina_tables").fetchall()]
-            except sqlite3.OperationalError:
-                return []
+    def get_roserpina_tables(self, account=DEFAULT_ACCOUNT):
+        # Snapshot copy-on-write dello store: nessun lock, nessuna query
+        return [state.as_dict() for state in self.ledger(account).roserpina.snapshot().values()]
 
-    def update_bankroll(self, current_balance, peak_balance):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    self.conn.execute(
-                        "UPDATE balance SET current_balance=?, peak_balance=? WHERE id=1", 
-                        (float(current_balance), float(peak_balance))
-                    )
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except Exception:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+    def _run_write(self, op):
+        """Accoda la transizione al group-commit e blocca fino al COMMIT durevole del suo batch."""
+        future = self._writer.submit(op)
+        try:
+            return future.result()
+        except sqlite3.IntegrityError as e:
+            LedgerGuard.handle_db_error(e)
+
+    def update_bankroll(self, current_balance, peak_balance, account=DEFAULT_ACCOUNT):
+        ledger = self.ledger(account)
+        if ledger is not self:
+            return ledger.update_bankroll(current_balance, peak_balance, account)
+
+        def _op(conn):
+            conn.execute(
+                "UPDATE balance SET current_balance=?, peak_balance=? WHERE id=1", 
+                (float(current_balance), float(peak_balance))
+            )
+        self._run_write(_op)
+
+    def reserve(self, tx_id, amount, table_id=1, teams="", match_hash="", robot="", account=DEFAULT_ACCOUNT):
+        ledger = self.ledger(account)
+        owner = self._find_tx(tx_id)
+        if owner is not None and owner is not ledger:
+            raise ValueError(f"TX {tx_id} già in volo sul conto {owner.account}.")
+        if ledger is not self:
+            return ledger.reserve(tx_id, amount, table_id, teams, match_hash, robot, account)
 
-    def reserve(self, tx_id, amount, table_id=1, teams="", match_hash=""):
         try:
             amt = float(amount)
             if math.isnan(amt) or math.isinf(amt) or amt <= 0:
                 raise ValueError(f"Stake invalido: {amount}")
         except: raise ValueError("Stake invalido")
 
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    row = self.conn.execute("SELECT current_balance FROM balance WHERE id = 1").fetchone()
-                    if not row or float(row["current_balance"]) < float(amt):
-                        raise ValueError("Fondi insufficienti.")
-
-                    self.conn.execute("""
-                        INSERT INTO journal (tx_id, amount, status, timestamp, table_id, teams, match_hash)
-                        VALUES (?, ?, 'RESERVED', ?, ?, ?, ?)
-                    """, (tx_id, amt, int(time.time()), table_id, teams, match_hash))
-                    self.conn.execute("UPDATE balance SET current_balance = current_balance - ? WHERE id = 1", (amt,))
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except Exception:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        def _op(conn):
+            row = conn.execute("SELECT current_balance FROM balance WHERE id = 1").fetchone()
+            if not row or float(row["current_balance"]) < float(amt):
+                raise ValueError("Fondi insufficienti.")
+            # Dedup nella stessa transazione: un duplicato annulla il SAVEPOINT, niente fondi riservati
+            if match_hash: claim_fingerprint(conn, match_hash, tx_id, self.dedup_ttl)
+
+            conn.execute("""
+                INSERT INTO journal (tx_id, amount, status, timestamp, table_id, teams, match_hash, robot)
+                VALUES (?, ?, 'RESERVED', ?, ?, ?, ?, ?)
+            """, (tx_id, amt, int(time.time()), table_id, teams, match_hash, robot))
+            conn.execute("UPDATE balance SET current_balance = current_balance - ? WHERE id = 1", (amt,))
+            self._writer.after_commit(lambda: self.mirror.add(tx_id, amt, table_id, robot))
+        self._run_write(_op)
+
+    def commit(self, tx_id, payout, account=None):
+        ledger = self.ledger(account) if account else self._ledger_for_tx(tx_id)
+        if ledger is not self:
+            return ledger.commit(tx_id, payout, ledger.account)
 
-    def commit(self, tx_id, payout):
         try:
             payout = float(payout)
             if math.isnan(payout) or math.isinf(payout) or payout < 0:
                 raise ValueError("Payout negativo o malformato.")
         except: raise ValueError("Payout invalido")
 
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    LedgerGuard.assert_transition(self.conn, tx_id, "SETTLED")
-                    row = self.conn.execute("SELECT amount FROM journal WHERE tx_id=?", (tx_id,)).fetchone()
-                    stake = float(row["amount"])
-                    profit = payout - stake
-
-                    self.conn.execute("UPDATE journal SET status='SETTLED', payout=? WHERE tx_id=?", (payout, tx_id))
-                    self.conn.execute("UPDATE balance SET current_balance = current_balance + ? WHERE id = 1", (profit + stake,))
-                    self.conn.execute("UPDATE balance SET peak_balance = MAX(peak_balance, current_balance) WHERE id = 1")
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except Exception:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        def _op(conn):
+            LedgerGuard.assert_transition(conn, tx_id, "SETTLED")
+            conn.execute("UPDATE journal SET status='SETTLED', payout=? WHERE tx_id=?", (payout, tx_id))
+            self._credit_payout(conn, payout)
+            self._writer.after_commit(lambda: self.mirror.remove(tx_id))
+        self._run_write(_op)
+
+    def settle_many(self, settlements, account=None):
+        """
+        Settlement bulk: [(tx_id, payout), ...] in un'unica transazione.
+        Tutte le transizioni PLACED -> SETTLED sono validate in un solo passaggio, i payout applicati
+        con SQL set-based e balance/peak aggiornati una volta sola. Tutto o niente per conto:
+        con più conti ogni shard chiude il proprio gruppo nella sua transazione.
+        """
+        settlements = list(settlements)
+        if account is not None:
+            ledger = self.ledger(account)
+            if ledger is not self: return ledger.settle_many(settlements, account)
+        elif len(self._accounts) > 1:
+            groups = {}
+            for item in settlements:
+                groups.setdefault(self._ledger_for_tx(item[0]), []).append(item)
+            return sum(ledger.settle_many(items, ledger.account) for ledger, items in groups.items())
 
+        batch, seen = [], set()
+        for tx_id, payout in settlements:
+            try:
+                payout = float(payout)
+                if math.isnan(payout) or math.isinf(payout) or payout < 0:
+                    raise ValueError
+            except: raise ValueError(f"Payout invalido per {tx_id}")
+            if tx_id in seen: raise ValueError(f"tx_id duplicato nel batch: {tx_id}")
+            seen.add(tx_id)
+            batch.append((tx_id, payout))
+        if not batch: return 0
+
+        def _op(conn):
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS settle_batch (tx_id TEXT PRIMARY KEY, payout REAL) WITHOUT ROWID")
+            conn.execute("DELETE FROM temp.settle_batch")
+            conn.executemany("INSERT INTO temp.settle_batch (tx_id, payout) VALUES (?, ?)", batch)
+            LedgerGuard.assert_bulk_settle(conn)
+
+            conn.execute("""
+                UPDATE journal SET status='SETTLED',
+                    payout=(SELECT s.payout FROM temp.settle_batch s WHERE s.tx_id = journal.tx_id)
+                WHERE tx_id IN (SELECT tx_id FROM temp.settle_batch)
+            """)
+            total = conn.execute("SELECT TOTAL(payout) FROM temp.settle_batch").fetchone()[0]
+            self._credit_payout(conn, total)
+            conn.execute("DELETE FROM temp.settle_batch")
+            self._writer.after_commit(lambda: [self.mirror.remove(t) for t, _ in batch])
+            return len(batch)
+        return self._run_write(_op)
+
+    def set_dedup_ttl(self, seconds):
+        self.dedup_ttl = int(seconds)
+        for ledger in self._ledgers(): ledger.dedup_ttl = self.dedup_ttl
+
+    def prune_signal_dedup(self):
+        """Pota l'indice di dedup oltre il TTL su tutti i conti. Ritorna le righe rimosse."""
+        return sum(ledger._run_write(lambda conn, l=ledger: prune_fingerprints(conn, l.dedup_ttl)) for ledger in self._ledgers())
+
+    def _credit_payout(self, conn, amount):
+        # Saldo e peak in un unico statement: il CHECK peak >= current è valutato una sola volta sul risultato finale
+        conn.execute("""
+            UPDATE balance SET current_balance = current_balance + ?,
+                peak_balance = MAX(peak_balance, current_balance + ?) WHERE id = 1
+        """, (amount, amount))
+
+    @_route_by_tx
     def mark_pre_commit(self, tx_id):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    self.conn.execute("UPDATE journal SET status='PRE_COMMIT' WHERE tx_id=?", (tx_id,))
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        self._run_write(lambda conn: conn.execute("UPDATE journal SET status='PRE_COMMIT' WHERE tx_id=?", (tx_id,)))
 
+    @_route_by_tx
     def mark_placed(self, tx_id):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    self.conn.execute("UPDATE journal SET status='PLACED' WHERE tx_id=?", (tx_id,))
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        def _op(conn):
+            conn.execute("UPDATE journal SET status='PLACED' WHERE tx_id=?", (tx_id,))
+            self._writer.after_commit(lambda: self.intents.resolve_many([tx_id], barrier=False))
+        self._run_write(_op)
 
     def pending(self):
-        with self._lock:
-            return [dict(r) for r in self.conn.execute("SELECT * FROM journal WHERE status NOT IN ('VOID', 'SETTLED')").fetchall()]
+        return self._collect_rows(f"SELECT * FROM journal WHERE {_INFLIGHT_SQL}")
+
+    def has_transient(self):
+        """True se questo file ha bet in RESERVED/PRE_COMMIT (transizioni brevi); PLACED e MANUAL_CHECK non contano."""
+        with self.readers.connection() as conn:
+            # Il predicato dell'indice parziale è ripetuto alla lettera: il planner lo usa solo così
+            sql = f"SELECT 1 FROM journal WHERE {_INFLIGHT_SQL} AND status IN ('RESERVED', 'PRE_COMMIT') LIMIT 1"
+            return conn.execute(sql).fetchone() is not None
 
     def get_unsettled_placed(self):
-        with self._lock:
-            return [dict(r) for r in self.conn.execute("SELECT * FROM journal WHERE status='PLACED'").fetchall()]
+        return self._collect_rows(f"SELECT * FROM journal WHERE {_INFLIGHT_SQL} AND status='PLACED'")
 
-    def write_panic_file(self, tx_id):
-        try:
-            with open(os.path.join(DB_DIR, f"{tx_id}.panic"), "w") as f: f.write("PLACED")
-        except: pass
+    def _collect_rows(self, sql):
+        rows = []
+        for ledger in self._ledgers():
+            with ledger.readers.connection() as conn:
+                rows.extend(dict(r, account=ledger.account) for r in conn.execute(sql).fetchall())
+        return rows
+
+    def log_pre_click(self, tx_id):
+        """Marker durevole PRE_CLICK (barriera msync) prima di toccare il bookmaker."""
+        self.intents.append(PRE_CLICK, tx_id)
+
+    def log_post_click(self, tx_id):
+        """Marker durevole POST_CLICK: il click è avvenuto, la bet va considerata PLACED anche dopo un crash."""
+        self.intents.append(POST_CLICK, tx_id)
+
+    # Backward compatibility: il vecchio file <tx_id>.panic è ora un marker POST_CLICK nell'intent log
+    write_panic_file = log_post_click
 
     def resolve_panics(self):
+        """
+        Replay single-pass dell'intent log: tutti i POST_CLICK non risolti diventano PLACED
+        in un'unica transazione. Include gli eventuali file .panic legacy.
+        """
         import glob
-        with self._write_lock:
-            with self._lock:
-                for p_file in glob.glob(os.path.join(DB_DIR, "*.panic")):
-                    tx_id = os.path.basename(p_file).replace(".panic", "")
-                    try:
-                        self.conn.execute("BEGIN IMMEDIATE")
-                        self.conn.execute("UPDATE journal SET status='PLACED' WHERE tx_id=?", (tx_id,))
-                        LedgerGuard.pre_commit_check(self.conn)
-                        self.conn.execute("COMMIT")
-                        os.remove(p_file)
-                    except sqlite3.IntegrityError as e:
-                        try: self.conn.execute("ROLLBACK")
-                        except: pass
-                        LedgerGuard.handle_db_error(e)
-                    except: 
-                        try: self.conn.execute("ROLLBACK")
-                        except: pass
+        posted = [t for t, kind in self.intents.pending().items() if kind == POST_CLICK]
+        legacy = glob.glob(os.path.join(DB_DIR, "*.panic"))
+        posted += [os.path.basename(p).replace(".panic", "") for p in legacy]
+        if not posted: return
+
+        groups = {}
+        for t in set(posted):
+            groups.setdefault(self._ledger_for_tx(t), []).append((t,))
+        for ledger, rows in groups.items():
+            ledger._run_write(lambda conn, rows=rows: conn.executemany(
+                "UPDATE journal SET status='PLACED' WHERE tx_id=? AND status IN ('RESERVED', 'PRE_COMMIT', 'MANUAL_CHECK')", rows
+            ))
+        self.intents.resolve_many(set(posted))
+        for p_file in legacy:
+            try: os.remove(p_file)
+            except: pass
 
+    @_route_by_tx
     def rollback(self, tx_id):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    row = self.conn.execute("SELECT amount FROM journal WHERE tx_id = ? AND status = 'RESERVED'", (tx_id,)).fetchone()
-                    if row and row["amount"] is not None:
-                        self.conn.execute("UPDATE journal SET status = 'VOID' WHERE tx_id = ?", (tx_id,))
-                        self.conn.execute("UPDATE balance SET current_balance = current_balance + ? WHERE id = 1", (float(row["amount"]),))
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        def _op(conn):
+            row = conn.execute("SELECT amount FROM journal WHERE tx_id = ? AND status = 'RESERVED'", (tx_id,)).fetchone()
+            if row and row["amount"] is not None:
+                conn.execute("UPDATE journal SET status = 'VOID' WHERE tx_id = ?", (tx_id,))
+                # Bet mai piazzata: il segnale torna giocabile
+                conn.execute("DELETE FROM signal_dedup WHERE tx_id = ?", (tx_id,))
+                conn.execute("UPDATE balance SET current_balance = current_balance + ? WHERE id = 1", (float(row["amount"]),))
+                self._writer.after_commit(lambda: self.mirror.remove(tx_id))
+        self._run_write(_op)
 
     def recover_reserved(self):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    rows = self.conn.execute("SELECT tx_id, amount FROM journal WHERE status='RESERVED'").fetchall()
-                    for r in rows:
-                        if r["amount"] is not None:
-                            self.conn.execute("UPDATE journal SET status='VOID' WHERE tx_id=?", (r["tx_id"],))
-                            self.conn.execute("UPDATE balance SET current_balance = current_balance + ? WHERE id = 1", (float(r["amount"]),))
-                    self.conn.execute("UPDATE journal SET status='MANUAL_CHECK' WHERE status='PRE_COMMIT'")
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        for ledger in self._ledgers():
+            ledger._run_write(ledger._recover_reserved_op)
+
+        # Recovery d'avvio: i PRE_CLICK orfani sono ora MANUAL_CHECK durevoli, il log può essere compattato
+        orphans = [t for t, kind in self.intents.pending().items() if kind == PRE_CLICK]
+        self.intents.resolve_many(orphans)
+        self.intents.compact()
+
+    def _recover_reserved_op(self, conn):
+        rows = conn.execute(f"SELECT tx_id, amount FROM journal WHERE {_INFLIGHT_SQL} AND status='RESERVED'").fetchall()
+        for r in rows:
+            if r["amount"] is not None:
+                conn.execute("UPDATE journal SET status='VOID' WHERE tx_id=?", (r["tx_id"],))
+                conn.execute("DELETE FROM signal_dedup WHERE tx_id = ?", (r["tx_id"],))
+                conn.execute("UPDATE balance SET current_balance = current_balance + ? WHERE id = 1", (float(r["amount"]),))
+                self._writer.after_commit(lambda t=r["tx_id"]: self.mirror.remove(t))
+        conn.execute(f"UPDATE journal SET status='MANUAL_CHECK' WHERE {_INFLIGHT_SQL} AND status='PRE_COMMIT'")
 
+    @_route_by_tx
     def mark_manual_check(self, tx_id):
-        with self._write_lock:
-            with self._lock:
-                self.conn.execute("BEGIN IMMEDIATE")
-                try:
-                    self.conn.execute("UPDATE journal SET status='MANUAL_CHECK' WHERE tx_id=?", (tx_id,))
-                    LedgerGuard.pre_commit_check(self.conn)
-                    self.conn.execute("COMMIT")
-                except sqlite3.IntegrityError as e:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    LedgerGuard.handle_db_error(e)
-                except:
-                    try: self.conn.execute("ROLLBACK")
-                    except: pass
-                    raise
+        def _op(conn):
+            conn.execute("UPDATE journal SET status='MANUAL_CHECK' WHERE tx_id=?", (tx_id,))
+            self._writer.after_commit(lambda: self.intents.resolve_many([tx_id], barrier=False))
+        self._run_write(_op)
+
+    def close(self):
+        for ledger in self._ledgers():
+            if ledger is not self: ledger.close()
+        self.maintenance.stop()
+        self._writer.stop()
+        self.readers.close()
+        # Segmento condiviso da tutti i conti: lo chiude il ledger principale, a writer svuotati
+        if self.account == DEFAULT_ACCOUNT: self.intents.close()
@@ -1,51 +1,889 @@
+import os
+import time
+import struct
+import pickle
 import threading
-import queue
 import logging
+import itertools
+import collections
+from enum import Enum
+from pathlib import Path
+from core.events import EventPriority, EVENT_PRIORITY, COALESCED_EVENTS, EVENT_PAYLOADS
+from core import bus_telemetry
+from core.bus_telemetry import TopicTelemetry, ListenerTelemetry
+
+# Eventi in coda su tutte le lane prima di rifiutare nuovi emit
+BUS_CAPACITY = 5000
+# Code limitate per classe di priorità: un burst di eventi LOW non consuma lo spazio dei CRITICAL
+PRIORITY_CAPACITY = {
+    EventPriority.CRITICAL: 1000,
+    EventPriority.HIGH: 2000,
+    EventPriority.NORMAL: 5000,
+    EventPriority.LOW: 2000,
+}
+# Drenaggio pesato: su 15 lane servite, 8 CRITICAL, 4 HIGH, 2 NORMAL, 1 LOW (se hanno eventi pronti)
+PRIORITY_WEIGHTS = {
+    EventPriority.CRITICAL: 8,
+    EventPriority.HIGH: 4,
+    EventPriority.NORMAL: 2,
+    EventPriority.LOW: 1,
+}
+
+
+class OverflowPolicy(str, Enum):
+    """Cosa fa emit() quando la coda del topic (o della sua classe) è piena."""
+    REJECT = "reject"            # scarta il nuovo evento (comportamento storico)
+    BLOCK = "block"              # attende spazio fino al timeout, poi scarta
+    DROP_OLDEST = "drop_oldest"  # scarta l'evento più vecchio del topic e accoda il nuovo
+    COALESCE = "coalesce"        # sostituisce l'ultimo evento in coda con la stessa chiave
+    SPILL = "spill"              # accoda su un segmento su disco, riprodotto quando la pressione scende
+
+
+# Policy di default per classe: i CRITICAL non si perdono mai, lo stato LOW vale solo l'ultimo.
+# HIGH (esiti del motore) va su disco invece di bloccare: chi emette dal percorso caldo non attende mai
+OVERFLOW_POLICY = {
+    EventPriority.CRITICAL: OverflowPolicy.SPILL,
+    EventPriority.HIGH: OverflowPolicy.SPILL,
+    EventPriority.NORMAL: OverflowPolicy.REJECT,
+    EventPriority.LOW: OverflowPolicy.DROP_OLDEST,
+}
+BLOCK_TIMEOUT = 1.0
+# Lo spill di una lane si riversa quando la sua classe scende sotto questa frazione della capacità
+SPILL_RESUME_RATIO = 0.5
+SPILL_DIR = os.path.join(str(Path.home()), ".superagent_data", "bus_spill")
+TELEMETRY_DUMP_DIR = os.path.join(str(Path.home()), ".superagent_data", "telemetry")
+_SPILL_HEADER = struct.Struct("<I")
+# Pool limitato: topic diversi girano in parallelo, mai più di questi thread
+BUS_WORKERS = min(16, (os.cpu_count() or 1) + 4)
+# Eventi che una lane smaltisce prima di cedere il worker agli altri topic
+LANE_BURST = 32
+# Un listener che sfora il budget QUARANTINE_STRIKES volte nelle ultime QUARANTINE_WINDOW chiamate viene
+# isolato sulla sua lane in quarantena; rientra dopo QUARANTINE_WINDOW chiamate di fila nel budget
+LISTENER_BUDGET = 0.25
+QUARANTINE_STRIKES = 3
+QUARANTINE_WINDOW = 20
+QUARANTINE_WORKERS = 2
+# Backlog in memoria di ogni lane in quarantena: oltre, CRITICAL e HIGH vanno su disco (mai persi),
+# le altre classi scartano il più vecchio (o fondono, se latest-value).
+# Il backlog isolato non conta in pending_count né nelle capacità di classe: un listener lento non frena l'emit
+QUARANTINE_CAPACITY = 500
+QUARANTINE_LOSSLESS = (EventPriority.CRITICAL, EventPriority.HIGH)
+
+
+def topic_of(event):
+    """Chiave del topic: AppEvent e stringa equivalente finiscono sulla stessa lane."""
+    return event.value if isinstance(event, Enum) else event
+
+
+def _weighted_schedule(weights):
+    # Round-robin pesato interlacciato: [C, H, N, L, C, H, N, C, H, C, H, C, C, C, C]
+    order = sorted(weights)
+    return [p for r in range(max(weights.values())) for p in order if r < weights[p]]
+
+
+def _key_fn(key):
+    """Chiave di coalescing: callable, nome di campo del payload o None (un solo valore per topic)."""
+    if key is None or callable(key): return key
+    return lambda data: data.get(key) if isinstance(data, dict) else getattr(data, key, None)
+
+
+_worker_ctx = threading.local()
+
+
+class _SpillSegment:
+    """
+    Segmento append-only degli eventi in overflow di una lane: record [len u32][pickle(topic, data, expires, enqueued_ns, seq)].
+    Letto in ordine FIFO; quando il lettore raggiunge lo scrittore il file torna a zero byte.
+    Vive quanto il processo (la persistenza tra riavvii non è compito suo).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+        self.read_pos = 0
+        self.write_pos = 0
+        self.count = 0
+        self._head = None
+
+    def append(self, record):
+        blob = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fh = open(self.path, "w+b")
+        self._fh.seek(self.write_pos)
+        self._fh.write(_SPILL_HEADER.pack(len(blob)) + blob)
+        self.write_pos = self._fh.tell()
+        self.count += 1
+
+    def peek(self):
+        if self._head is None and self.count:
+            self._fh.flush()
+            self._fh.seek(self.read_pos)
+            (size,) = _SPILL_HEADER.unpack(self._fh.read(_SPILL_HEADER.size))
+            self._head = (pickle.loads(self._fh.read(size)), self._fh.tell())
+        return self._head[0] if self._head else None
+
+    def pop(self):
+        record = self.peek()
+        self.read_pos = self._head[1]
+        self._head = None
+        self.count -= 1
+        if not self.count:
+            self._fh.truncate(0)
+            self.read_pos = self.write_pos = 0
+        return record
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            try: os.remove(self.path)
+            except OSError: pass
+        self.count = 0
+        self._head = None
+
+
+class _Listener:
+    __slots__ = ("fn", "name", "lane", "stats", "recent")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.name = getattr(fn, "__qualname__", None) or repr(fn)
+        self.lane = None  # lane di quarantena, assegnata solo se il listener sfora il budget più volte
+        self.stats = ListenerTelemetry()
+        self.recent = collections.deque(maxlen=QUARANTINE_WINDOW)  # True = chiamata oltre il budget
+
+    @property
+    def recovered(self):
+        return len(self.recent) == QUARANTINE_WINDOW and not any(self.recent)
+
+
+class _Lane:
+    """Coda FIFO di un topic (o di un listener isolato): al più un worker alla volta la smaltisce."""
+    __slots__ = ("topic", "priority", "items", "scheduled", "pool", "listener", "spill", "inflight")
+
+    def __init__(self, topic, priority, pool, listener=None):
+        self.topic = topic
+        self.priority = priority
+        self.items = collections.deque()
+        self.scheduled = False
+        self.pool = pool
+        self.listener = listener
+        self.spill = None  # _SpillSegment della lane, creato al primo overflow su disco
+        self.inflight = 0  # seq minimo del batch in consegna (journal), 0 se nessuno
+
+    @property
+    def spilled(self):
+        """Eventi della lane ancora sul suo segmento di spill."""
+        return self.spill.count if self.spill is not None else 0
+
+    def head_seq(self):
+        # Il seq cresce lungo la coda (le fusioni tengono il seq dello slot): la testa è il minimo
+        return self.items[0][3] if self.items else 0
+
+    def spill_seq(self):
+        return self.spill.peek()[4] if self.spilled else 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def would_merge(self, item):
+        return False
+
+    def put(self, item):
+        """Accoda; False se l'evento è stato fuso con uno già in coda (nessun posto nuovo occupato)."""
+        self.items.append(item)
+        return True
+
+    def take(self, n):
+        return [self.items.popleft() for _ in range(min(n, len(self.items)))]
+
+    def drop_oldest(self):
+        self.items.popleft()
+
+
+class _CoalescingLane(_Lane):
+    """Lane latest-value: al più un evento in coda per chiave, il più recente; l'ordine è quello della prima comparsa."""
+    __slots__ = ("key",)
+
+    def __init__(self, topic, priority, pool, key, listener=None):
+        super().__init__(topic, priority, pool, listener)
+        self.items = collections.OrderedDict()
+        self.key = key
+
+    def _key(self, item):
+        return self.key(item[0]) if self.key else None
+
+    def would_merge(self, item):
+        return self._key(item) in self.items
+
+    def put(self, item):
+        k = self._key(item)
+        old = self.items.get(k)
+        if old is None:
+            self.items[k] = item
+            return True
+        # Payload nuovo, seq dello slot: l'ordine di consegna resta l'ordine dei seq (checkpoint del journal)
+        self.items[k] = item[:3] + (old[3] or item[3],)
+        return False
+
+    def take(self, n):
+        return [self.items.popitem(last=False)[1] for _ in range(min(n, len(self.items)))]
+
+    def drop_oldest(self):
+        self.items.popitem(last=False)
+
+    def head_seq(self):
+        return next(iter(self.items.values()))[3] if self.items else 0
+
+
+class _WorkerPool:
+    """
+    Worker che servono le lane pronte, una coda ready per classe di priorità.
+    Con reserve_critical il worker 0 serve solo lane CRITICAL: anche a bus saturo di listener lenti
+    la latenza di dispatch di un evento del ledger resta limitata alla durata dei listener CRITICAL.
+    """
+
+    def __init__(self, bus, name, size, reserve_critical=False):
+        self.ready = {p: collections.deque() for p in EventPriority}
+        self.cond = threading.Condition(bus._sched_lock)
+        self.critical_cond = threading.Condition(bus._sched_lock)
+        self.schedule = _weighted_schedule(bus.weights)
+        self.cursor = 0
+        self.threads = []
+        for i in range(size):
+            critical_only = reserve_critical and i == 0 and size > 1
+            name_i = f"{name}-critical" if critical_only else f"{name}-{i}"
+            self.threads.append(threading.Thread(target=bus._worker_loop, args=(self, critical_only), daemon=True, name=name_i))
+        for t in self.threads: t.start()
+
+    def has_ready(self, critical_only):
+        if critical_only: return bool(self.ready[EventPriority.CRITICAL])
+        return any(self.ready.values())
+
+    def push(self, lane):
+        self.ready[lane.priority].append(lane)
+        if lane.priority == EventPriority.CRITICAL: self.critical_cond.notify()
+        self.cond.notify()
+
+    def pop(self, critical_only):
+        if critical_only: return self.ready[EventPriority.CRITICAL].popleft()
+        n = len(self.schedule)
+        for i in range(n):
+            p = self.schedule[(self.cursor + i) % n]
+            if self.ready[p]:
+                self.cursor = (self.cursor + i + 1) % n
+                return self.ready[p].popleft()
+
+    def clear(self):
+        for ready in self.ready.values():
+            for lane in ready: lane.items.clear()
+            ready.clear()
+        self.cond.notify_all()
+        self.critical_cond.notify_all()
+
 
 class EventBusV6:
-    def __init__(self, logger):
+    """
+    Pub/Sub a lane per topic su un pool di worker limitato.
+    Ogni topic ha la sua coda FIFO e un solo worker alla volta: l'ordine è garantito dentro il topic,
+    topic diversi procedono in parallelo. Un listener che sfora più volte LISTENER_BUDGET viene spostato
+    su una lane dedicata nel pool di quarantena: riceve gli eventi in ordine, ma non rallenta più gli
+    altri listener del topic né gli altri topic, e rientra quando i suoi tempi tornano nel budget.
+    Il suo backlog è fuori da pending_count e dalle capacità di classe: oltre QUARANTINE_CAPACITY va
+    su disco per CRITICAL/HIGH e scarta il più vecchio per le altre classi. L'emit non lo aspetta mai.
+    Le lane sono divise per classe di priorità (EVENT_PRIORITY in core/events.py): code limitate
+    per classe, drenaggio pesato e un worker riservato ai CRITICAL. Un evento emesso con deadline
+    e non ancora consegnato allo scadere viene scartato e contato in `expired`.
+    A coda piena decide la OverflowPolicy del topic (set_overflow, default per classe in
+    OVERFLOW_POLICY); ogni policy ha i suoi contatori in overflow_stats(). Lo spill è per lane e si
+    riversa classe per classe, CRITICAL prima: backlog (coda + disco) è ciò che misura il load shedding.
+    I topic di stato (COALESCED_EVENTS, set_coalescing) tengono in coda solo l'ultimo payload per
+    chiave: un listener lento riceve il valore corrente, non la sequenza dei valori intermedi.
+    Con telemetry=True (default) ogni topic misura lag emit->dispatch e ogni listener il tempo di
+    esecuzione, su istogrammi a scrittore singolo: telemetry_snapshot() / dump_telemetry().
+    Con un EventJournal agganciato (attach_journal) ogni evento riceve un seq ed è persistito prima
+    di entrare in coda; il checkpoint di consegna permette di rigiocare dopo un crash (o dopo stop())
+    gli eventi mai consegnati.
+    Con un EventRing agganciato (attach_ring) ogni emit è pubblicato anche in shared memory, per i
+    processi esterni (heartbeat, supervisor) che leggono col proprio cursore.
+    I topic con payload tipizzato (EVENT_PAYLOADS) convertono un dict nel record una sola volta, in
+    emit(): i listener ricevono tutti la stessa tupla immutabile, che risponde anche a payload.get().
+    """
+
+    def __init__(self, logger, workers=BUS_WORKERS, capacity=BUS_CAPACITY, listener_budget=LISTENER_BUDGET,
+                 priorities=None, priority_capacity=None, weights=None, spill_dir=SPILL_DIR, telemetry=True, payloads=None):
         self.logger = logger
+        self.capacity = capacity
+        self.listener_budget = listener_budget
+        self.priorities = {topic_of(e): EventPriority(p) for e, p in {**EVENT_PRIORITY, **(priorities or {})}.items()}
+        self.priority_capacity = {**PRIORITY_CAPACITY, **(priority_capacity or {})}
+        self.weights = {**PRIORITY_WEIGHTS, **(weights or {})}
+        self.payload_types = {topic_of(e): t for e, t in {**EVENT_PAYLOADS, **(payloads or {})}.items()}
+        self.invalid = collections.Counter()
         self.listeners = {}
         self.lock = threading.Lock()
-        self._queue = queue.Queue(maxsize=5000)
+        self._sched_lock = threading.Lock()
+        self._idle = threading.Condition(self._sched_lock)
+        self._lanes = {}
+        self._pending = 0
+        self._pending_by_priority = dict.fromkeys(EventPriority, 0)
+        self._quarantined = 0
+        self._active = 0
+        self.expired = collections.Counter()
+        self.rejected = collections.Counter()
+        self.overflow = collections.defaultdict(collections.Counter)
+        self.shed_count = collections.Counter()
+        self._overflow_policy = {}
+        self._coalescing = {topic_of(e): _key_fn(k) for e, k in COALESCED_EVENTS.items()}
+        self.merged = collections.Counter()
+        self.telemetry = telemetry
+        self._topic_stats = collections.defaultdict(TopicTelemetry)
+        self._space = threading.Condition(self._sched_lock)
+        self._spill_dir = spill_dir
+        self._spill_ids = itertools.count()
+        # Lane con arretrato su disco, per classe (dict come insieme ordinato): il replay parte dai CRITICAL
+        self._spill_lanes = {p: {} for p in EventPriority}
+        self._spilled = 0
+        self._spilled_isolated = 0
+        self.journal = None
+        self.journal_errors = collections.Counter()
+        self.journal_replayed = 0
+        self._delivered = {}
+        self.ring = None
+        self.ring_errors = collections.Counter()
         self._running = True
-        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True, name="EventBus")
-        self._dispatcher.start()
+        self._pool = _WorkerPool(self, "EventBus", max(1, workers), reserve_critical=True)
+        self._quarantine = _WorkerPool(self, "EventBus-Quarantine", QUARANTINE_WORKERS)
 
     @property
     def pending_count(self):
-        return self._queue.qsize()
+        return self._pending
+
+    @property
+    def backlog(self):
+        """Eventi accettati e non ancora consegnati dal pool principale: in coda più quelli su disco."""
+        return self._pending + self._spilled - self._spilled_isolated
+
+    def priority_of(self, event):
+        return self.priorities.get(topic_of(event), EventPriority.NORMAL)
+
+    def set_overflow(self, event, policy, timeout=BLOCK_TIMEOUT, key=None):
+        """
+        Policy di overflow del topic. timeout vale per BLOCK; key(data) per COALESCE
+        (None = l'ultimo evento in coda del topic, qualunque sia).
+        """
+        self._overflow_policy[topic_of(event)] = (OverflowPolicy(policy), timeout, key)
+
+    def overflow_policy(self, event):
+        topic = topic_of(event)
+        if topic in self._overflow_policy: return self._overflow_policy[topic][0]
+        return OVERFLOW_POLICY[self.priority_of(topic)]
+
+    def set_coalescing(self, event, key=None):
+        """Rende il topic latest-value. key: campo del payload o callable; None = un solo valore per topic."""
+        topic = topic_of(event)
+        with self._sched_lock:
+            lane = self._lanes.get(topic)
+            if lane is not None and (len(lane) or lane.scheduled or lane.spilled):
+                raise RuntimeError(f"Topic {topic} con eventi in coda: coalescing da configurare prima dell'uso.")
+            self._lanes.pop(topic, None)
+            self._coalescing[topic] = _key_fn(key)
+
+    def _new_lane(self, topic, pool, listener=None):
+        if topic in self._coalescing:
+            return _CoalescingLane(topic, self.priority_of(topic), pool, self._coalescing[topic], listener)
+        return _Lane(topic, self.priority_of(topic), pool, listener)
+
+    def shed(self, source):
+        """Load shedding esplicito a monte del bus (es. segnali rifiutati perché il bus è sotto pressione)."""
+        self.shed_count[source] += 1
 
     def subscribe(self, event, fn):
+        topic = topic_of(event)
         with self.lock:
-            if event not in self.listeners: self.listeners[event] = []
-            self.listeners[event].append(fn)
-
-    def emit(self, event, data=None):
-        try: self._queue.put_nowait((event, data))
-        except queue.Full: self.logger.critical(f"⚠️ EventBus SATURATO (>5000). Dropping event: {event}")
-
-    def _dispatch_loop(self):
-        while self._running:
-            try: event, data = self._queue.get(timeout=1)
-            except queue.Empty: continue
-                
-            with self.lock: listeners = list(self.listeners.get(event, []))
-                
-            for fn in listeners:
-                try: fn(data)
-                except Exception as e: self.logger.error(f"EventBus Error ({event}): {e}")
-            
-            self._queue.task_done()
+            # Copy-on-write: il dispatch legge la tupla corrente senza lock
+            self.listeners[topic] = self.listeners.get(topic, ()) + (_Listener(fn),)
+
+    def isolated_listeners(self):
+        out = {topic: [l.name for l in ls if l.lane is not None] for topic, ls in self.listeners.items()}
+        return {topic: names for topic, names in out.items() if names}
+
+    def emit(self, event, data=None, deadline=None):
+        """Accoda l'evento. deadline: secondi entro cui va consegnato, poi viene scartato (None = nessuna)."""
+        topic = topic_of(event)
+        payload_type = self.payload_types.get(topic)
+        if payload_type is not None and type(data) is not payload_type: data = self._typed(topic, payload_type, data)
+        expires = None if deadline is None else time.monotonic() + deadline
+        enqueued_ns = time.perf_counter_ns() if self.telemetry else 0
+        encoded = self._encode(topic, data) if self.journal is not None else None
+        ring_record = self._encode_ring(topic, data) if self.ring is not None else None
+        with self._sched_lock:
+            if not self._running: return
+            item = (data, expires, enqueued_ns, 0)
+            publish = (encoded, ring_record) if encoded or ring_record else None
+            self._topic_stats[topic].emitted += 1
+            lane = self._lanes.get(topic)
+            if lane is None:
+                lane = self._lanes[topic] = self._new_lane(topic, self._pool)
+            # Con arretrato su disco anche i nuovi eventi del topic vanno in coda al segmento: l'ordine resta FIFO
+            if lane.spilled: return self._spill_item(lane, self._publish(item, publish))
+            # Una fusione non occupa posti nuovi: sui topic latest-value non c'è overflow per chiavi già in coda
+            if self._has_room(lane) or lane.would_merge(item): return self._enqueue(lane, self._publish(item, publish))
+            self._overflow(lane, item, publish)
+
+    def _publish(self, item, publish):
+        # Dopo la decisione di overflow: journal e ring vedono solo eventi accettati.
+        # Seq e record si scrivono sotto il lock di scheduling: ordine = ordine di accodamento
+        if publish is None: return item
+        encoded, ring_record = publish
+        if ring_record: self.ring.write(ring_record)
+        if encoded: item = item[:3] + (self.journal.write(encoded),)
+        return item
+
+    def _typed(self, topic, payload_type, data):
+        try:
+            return payload_type.coerce(data)
+        except (TypeError, ValueError) as e:
+            # Payload fuori schema: consegnato com'è (i listener usano .get), ma contato e loggato
+            self.invalid[topic] += 1
+            if self.invalid[topic] == 1:
+                self.logger.error(f"🧾 EventBus: payload {topic} non valido: {e}")
+            return data
+
+    def _encode(self, topic, data):
+        try:
+            return self.journal.encode(topic, data)
+        except Exception as e:
+            self.journal_errors[topic] += 1
+            if self.journal_errors[topic] == 1:
+                self.logger.error(f"📼 EventBus: evento {topic} non persistito nel journal: {e}")
+            return None
+
+    def _encode_ring(self, topic, data):
+        try:
+            return self.ring.encode(topic, data)
+        except Exception as e:
+            self.ring_errors[topic] += 1
+            if self.ring_errors[topic] == 1:
+                self.logger.error(f"🔁 EventBus: evento {topic} non pubblicato sul ring: {e}")
+            return None
+
+    def _has_room(self, lane):
+        # Solo lane del pool principale: il backlog in quarantena non consuma la capacità della classe.
+        # I CRITICAL rispondono solo alla propria coda: il tetto globale non li blocca mai
+        if self._pending >= self.capacity and lane.priority != EventPriority.CRITICAL: return False
+        return self._pending_by_priority[lane.priority] < self.priority_capacity[lane.priority]
+
+    def _overflow(self, lane, item, publish=None):
+        policy, timeout, key = self._overflow_policy.get(lane.topic, (OVERFLOW_POLICY[lane.priority], BLOCK_TIMEOUT, None))
+        counters = self.overflow[lane.topic]
+
+        # Un listener che emette su un topic pieno non può attendere sé stesso: da un worker BLOCK degrada a REJECT
+        if policy is OverflowPolicy.BLOCK and not getattr(_worker_ctx, "active", False):
+            counters["blocked"] += 1
+            if self._space.wait_for(lambda: not self._running or self._has_room(lane), timeout):
+                if self._running: self._enqueue(lane, self._publish(item, publish))
+                return
+            counters["block_timeouts"] += 1
+        elif policy is OverflowPolicy.DROP_OLDEST and len(lane):
+            lane.drop_oldest()
+            self._pending -= 1
+            self._pending_by_priority[lane.priority] -= 1
+            counters["dropped_oldest"] += 1
+            return self._enqueue(lane, self._publish(item, publish))
+        elif policy is OverflowPolicy.COALESCE and isinstance(lane.items, collections.deque):
+            k = key(item[0]) if key else None
+            for i in range(len(lane.items) - 1, -1, -1):
+                if key is None or key(lane.items[i][0]) == k:
+                    item = self._publish(item, publish)
+                    lane.items[i] = item[:3] + (lane.items[i][3] or item[3],)
+                    counters["coalesced"] += 1
+                    return
+        elif policy is OverflowPolicy.SPILL:
+            return self._spill_item(lane, self._publish(item, publish))
+
+        self.rejected[lane.topic] += 1
+        self.logger.critical(f"⚠️ EventBus SATURATO ({lane.priority.name}, {policy.value}). Dropping event: {lane.topic}")
+
+    def _spill_item(self, lane, item):
+        try:
+            if lane.spill is None:
+                name = f"spill_{os.getpid()}_{id(self):x}_{next(self._spill_ids)}.seg"
+                lane.spill = _SpillSegment(os.path.join(self._spill_dir, name))
+            lane.spill.append((lane.topic, *item))
+        except Exception as e:
+            self.rejected[lane.topic] += 1
+            self.logger.critical(f"⚠️ EventBus: spill su disco fallito ({lane.topic}): {e}. Evento scartato.")
+            return
+        self._spilled += 1
+        self._spill_lanes[lane.priority][lane] = None
+        if lane.listener is not None:
+            self._spilled_isolated += 1
+            self.overflow[lane.topic]["quarantine_spilled"] += 1
+        else:
+            self.overflow[lane.topic]["spilled"] += 1
+
+    def _replay_room(self, lane):
+        if lane.listener is not None: return len(lane) <= QUARANTINE_CAPACITY * SPILL_RESUME_RATIO
+        # Soglia della classe: un topic NORMAL allagato non trattiene lo spill dei CRITICAL
+        p = lane.priority
+        if self._pending_by_priority[p] > self.priority_capacity[p] * SPILL_RESUME_RATIO: return False
+        return p == EventPriority.CRITICAL or self._pending <= self.capacity * SPILL_RESUME_RATIO
+
+    def _replay_spill(self):
+        # Col lock di scheduling in mano: riversa gli spill nelle loro lane, CRITICAL prima, FIFO per lane
+        for p in EventPriority:
+            lanes = self._spill_lanes[p]
+            for lane in list(lanes):
+                while lane.spilled and self._replay_room(lane):
+                    topic, *item = lane.spill.pop()
+                    self._spilled -= 1
+                    self.overflow[topic]["replayed"] += 1
+                    if lane.listener is not None:
+                        self._spilled_isolated -= 1
+                        self._put_isolated(lane, tuple(item))
+                    else:
+                        self._enqueue(lane, tuple(item))
+                if not lane.spilled: del lanes[lane]
+
+    def _enqueue(self, lane, item):
+        # Chiamato col lock di scheduling in mano
+        if lane.listener is not None: return self._enqueue_isolated(lane, item)
+        if not lane.put(item):
+            self.merged[lane.topic] += 1
+            return
+        self._pending += 1
+        self._pending_by_priority[lane.priority] += 1
+        if not lane.scheduled:
+            lane.scheduled = True
+            lane.pool.push(lane)
+
+    def _enqueue_isolated(self, lane, item):
+        # Lane di quarantena: limite proprio, mai un'attesa per chi emette. CRITICAL/HIGH su disco
+        # (con arretrato su disco anche i nuovi: FIFO), le altre classi scartano il più vecchio
+        if lane.spilled: return self._spill_item(lane, item)
+        if len(lane) >= QUARANTINE_CAPACITY and not lane.would_merge(item):
+            if lane.priority in QUARANTINE_LOSSLESS: return self._spill_item(lane, item)
+            lane.drop_oldest()
+            self._quarantined -= 1
+            self.overflow[lane.topic]["quarantine_dropped"] += 1
+        self._put_isolated(lane, item)
+
+    def _put_isolated(self, lane, item):
+        if not lane.put(item):
+            self.merged[lane.topic] += 1
+            return
+        self._quarantined += 1
+        if not lane.scheduled:
+            lane.scheduled = True
+            lane.pool.push(lane)
+
+    def _worker_loop(self, pool, critical_only=False):
+        _worker_ctx.active = True
+        cond = pool.critical_cond if critical_only else pool.cond
+        while True:
+            with self._sched_lock:
+                while self._running and not pool.has_ready(critical_only):
+                    cond.wait()
+                if not self._running: return
+                lane = pool.pop(critical_only)
+                batch = lane.take(LANE_BURST)
+                if self.journal is not None: lane.inflight = min((it[3] for it in batch if it[3]), default=0)
+                if lane.listener is not None:
+                    self._quarantined -= len(batch)
+                else:
+                    self._pending -= len(batch)
+                    self._pending_by_priority[lane.priority] -= len(batch)
+                    self._space.notify_all()
+                self._active += 1
+
+            if self.telemetry and lane.listener is None:
+                # Lag emit->prelievo del batch, una lettura di clock per batch; l'attesa dentro il batch
+                # è il tempo dei listener precedenti, misurato a parte
+                stats, dequeued_ns = self._topic_stats[lane.topic], time.perf_counter_ns()
+                stats.dispatched += len(batch)
+                stats.lag.add_many([dequeued_ns - item[2] for item in batch])
+            for item in batch:
+                # Orologio per evento: la scadenza conta anche il tempo passato dietro ai listener precedenti
+                if item[1] is not None and item[1] < time.monotonic():
+                    self.expired[lane.topic] += 1
+                    continue
+                if lane.listener is not None: self._call(lane.topic, lane.listener, item[0], isolated=True)
+                else:
+                    self._dispatch(lane, item)
+                    if item[3]: self._delivered[lane.topic] = item[3]
+            if self.telemetry:
+                # Ogni listener ha un solo scrittore: la sua lane di quarantena se isolato, altrimenti quella del topic
+                if lane.listener is not None: lane.listener.stats.fold()
+                else:
+                    for l in self.listeners.get(lane.topic, ()):
+                        if l.lane is None and l.stats.samples: l.stats.fold()
+
+            with self._sched_lock:
+                self._active -= 1
+                lane.inflight = 0
+                if lane.items:
+                    # In fondo alla sua coda ready: un topic molto attivo non affama gli altri
+                    pool.push(lane)
+                else:
+                    lane.scheduled = False
+                    if lane.listener is not None and not lane.spilled and lane.listener.recovered:
+                        # Lane vuota e tempi di nuovo nel budget: il listener torna sul pool principale
+                        lane.listener.lane = None
+                        if lane.spill is not None: lane.spill.close()
+                        self.logger.info(f"🐇 EventBus: listener {lane.listener.name} su {lane.topic} rientrato dalla quarantena.")
+                if self._spilled: self._replay_spill()
+                if not (self._pending or self._quarantined or self._active or self._spilled): self._idle.notify_all()
+
+    def _dispatch(self, lane, item):
+        for listener in self.listeners.get(lane.topic, ()):
+            if listener.lane is not None:
+                # Riletta sotto lock: un rientro concorrente non lascia l'evento su una lane abbandonata
+                with self._sched_lock:
+                    isolated = listener.lane
+                    if isolated is not None: self._enqueue(isolated, item)
+                if isolated is not None: continue
+            self._call(lane.topic, listener, item[0])
+
+    def _call(self, topic, listener, data, isolated=False):
+        started = time.perf_counter_ns()
+        try: listener.fn(data)
+        except Exception as e:
+            listener.stats.errors += 1
+            self.logger.error(f"EventBus Error ({topic}): {e}")
+        elapsed_ns = time.perf_counter_ns() - started
+        if self.telemetry: listener.stats.samples.append(elapsed_ns)
+        elapsed = elapsed_ns / 1e9
+        # Un solo scrittore per listener (la lane del topic o quella di quarantena): deque senza lock
+        listener.recent.append(elapsed > self.listener_budget)
+        if not isolated and listener.recent[-1] and sum(listener.recent) >= QUARANTINE_STRIKES:
+            with self._sched_lock:
+                if listener.lane is None:
+                    listener.lane = self._new_lane(topic, self._quarantine, listener)
+            self.logger.warning(
+                f"🐢 EventBus: listener {listener.name} su {topic} ha impiegato {elapsed * 1000:.0f}ms "
+                f"(budget {self.listener_budget * 1000:.0f}ms, {sum(listener.recent)} sforamenti "
+                f"nelle ultime {len(listener.recent)} chiamate). Isolato in quarantena."
+            )
+
+    def priority_stats(self):
+        quarantined = collections.Counter()
+        for ls in self.listeners.values():
+            for l in ls:
+                if l.lane is not None: quarantined[l.lane.priority] += len(l.lane)
+        return {
+            p.name: {
+                "pending": self._pending_by_priority[p],
+                "quarantined": quarantined[p],
+                "capacity": self.priority_capacity[p],
+                "weight": self.weights[p],
+                "expired": sum(n for t, n in self.expired.items() if self.priority_of(t) == p),
+                "rejected": sum(n for t, n in self.rejected.items() if self.priority_of(t) == p),
+            }
+            for p in EventPriority
+        }
+
+    def overflow_stats(self):
+        """Per topic: policy attiva, contatori di overflow ed eventi ancora sul segmento di spill."""
+        topics = set(self.overflow) | {t for t, lane in self._lanes.items() if lane.spilled} | set(self.rejected)
+        out = {}
+        for topic in sorted(topics):
+            lane = self._lanes.get(topic)
+            out[topic] = {
+                "policy": self.overflow_policy(topic).value,
+                "rejected": self.rejected[topic],
+                "spill_backlog": lane.spilled if lane else 0,
+                **self.overflow[topic],
+            }
+        return {"topics": out, "spill_backlog": self._spilled, "shed": dict(self.shed_count)}
+
+    def coalescing_stats(self):
+        """Per topic latest-value: eventi fusi (valori intermedi mai consegnati) e chiavi in coda."""
+        return {
+            topic: {"merged": self.merged[topic], "queued_keys": len(self._lanes[topic]) if topic in self._lanes else 0}
+            for topic in self._coalescing
+        }
+
+    def slowest_listeners(self, n=5):
+        """I listener con il p99 di esecuzione più alto (a parità, tempo totale)."""
+        rows = []
+        for topic, listeners in self.listeners.items():
+            for l in listeners:
+                h = l.stats.histogram()
+                if not h.n: continue
+                rows.append({
+                    "topic": topic, "listener": l.name, "isolated": l.lane is not None, "errors": l.stats.errors,
+                    "total_ms": round(h.total_ns / 1e6, 3), **h.summary(),
+                })
+        rows.sort(key=lambda r: (r["p99_ms"], r["total_ms"]), reverse=True)
+        return rows[:n]
+
+    def telemetry_snapshot(self):
+        """Stato per topic: lag, listener, drop e fusioni. Letture senza lock (al più un campione di ritardo)."""
+        topics = {}
+        for topic in sorted(set(self._topic_stats) | set(self.listeners)):
+            st = self._topic_stats.get(topic) or TopicTelemetry()
+            lane = self._lanes.get(topic)
+            topics[topic] = {
+                "priority": self.priority_of(topic).name,
+                "emitted": st.emitted,
+                "dispatched": st.dispatched,
+                "pending": len(lane) if lane else 0,
+                "lag": st.lag.summary(),
+                "drops": {
+                    "rejected": self.rejected[topic],
+                    "expired": self.expired[topic],
+                    **self.overflow.get(topic, {}),
+                },
+                "merged": self.merged[topic],
+                "listeners": [
+                    {"listener": l.name, "isolated": l.lane is not None, "errors": l.stats.errors, **l.stats.histogram().summary()}
+                    for l in self.listeners.get(topic, ())
+                ],
+            }
+        return {
+            "pending": self._pending,
+            "quarantined": self._quarantined,
+            "telemetry": self.telemetry,
+            "topics": topics,
+            "slowest_listeners": self.slowest_listeners(),
+            "priorities": self.priority_stats(),
+            "spill_backlog": self._spilled,
+            "backlog": self.backlog,
+            "shed": dict(self.shed_count),
+            "invalid_payloads": dict(self.invalid),
+            "journal": self.journal.stats() if self.journal is not None else None,
+            "ring": self.ring.stats() if self.ring is not None else None,
+        }
+
+    def dump_telemetry(self, path=None):
+        """Salva telemetry_snapshot() in JSON (default: telemetry/eventbus_<ts>.json) e ritorna il path."""
+        path = path or os.path.join(TELEMETRY_DUMP_DIR, f"eventbus_{int(time.time())}.json")
+        return bus_telemetry.dump(self.telemetry_snapshot(), path, self.logger)
+
+    # --- Journal persistente ---
+
+    def attach_journal(self, journal, replay=True):
+        """
+        Aggancia un EventJournal: da qui ogni emit è persistito. Con replay=True rigioca prima gli
+        eventi non consegnati nella sessione precedente (da chiamare dopo le subscribe).
+        """
+        checkpoint = journal.load_checkpoint()
+        with self._sched_lock:
+            self.journal = journal
+            self._delivered = {t: int(s) for t, s in checkpoint.get("topics", {}).items()}
+        replayed = self.replay_journal() if replay else 0
+        # Il checkpoint si aggiorna solo dopo il replay: un crash a metà non perde gli eventi da rigiocare
+        journal.checkpoint_source = self.journal_checkpoint
+        return replayed
+
+    def journal_checkpoint(self):
+        """
+        Low-water: ogni evento con seq <= low_water è stato consegnato (o scartato per policy).
+        topics: ultimo seq consegnato per topic FIFO da tutte le sue lane (quarantena compresa),
+        per non rigiocare ciò che è già uscito.
+        """
+        with self._sched_lock:
+            lanes = self._all_lanes()
+            candidates = [lane.inflight for lane in lanes if lane.inflight]
+            candidates += [seq for seq in (lane.head_seq() for lane in lanes) if seq]
+            candidates += [seq for ls in self._spill_lanes.values() for seq in (lane.spill_seq() for lane in ls) if seq]
+            low = min(candidates) - 1 if candidates else self.journal.last_seq
+            return {"low_water": low, "topics": self._topic_checkpoint(self._quarantine_floor())}
+
+    def _all_lanes(self):
+        # Col lock: lane dei topic e lane di quarantena attive
+        return list(self._lanes.values()) + [l.lane for ls in self.listeners.values() for l in ls if l.lane is not None]
+
+    def _quarantine_floor(self, inflight=True):
+        # Col lock: per topic, il seq più basso ancora da consegnare su una sua lane di quarantena
+        floor = {}
+        for topic, ls in self.listeners.items():
+            seqs = [seq for l in ls if l.lane is not None for seq in (l.lane.head_seq(), l.lane.spill_seq())]
+            if inflight: seqs += [l.lane.inflight for l in ls if l.lane is not None]
+            seqs = [seq for seq in seqs if seq]
+            if seqs: floor[topic] = min(seqs)
+        return floor
+
+    def _topic_checkpoint(self, floor):
+        # Il topic è consegnato fin dove è arrivata la sua lane più indietro: un listener isolato in
+        # ritardo fa rigiocare il topic da lì (at-least-once anche per i listener già serviti)
+        topics = dict(self._delivered)
+        for topic, seq in floor.items():
+            if topic in topics: topics[topic] = min(topics[topic], seq - 1)
+        return topics
+
+    def replay_journal(self, from_seq=None):
+        """
+        Rigioca ai subscriber gli eventi persistiti: da from_seq, oppure (None) quelli oltre il
+        checkpoint di consegna. Gli eventi entrano nelle lane col loro seq originale, senza deadline.
+        """
+        checkpoint = self.journal.load_checkpoint()
+        start = from_seq if from_seq is not None else int(checkpoint.get("low_water", 0)) + 1
+        delivered = {} if from_seq is not None else {t: int(s) for t, s in checkpoint.get("topics", {}).items()}
+        replayed = 0
+        for seq, _, topic, data in self.journal.read(start):
+            if seq <= delivered.get(topic, 0): continue
+            item = (data, None, time.perf_counter_ns() if self.telemetry else 0, seq)
+            with self._sched_lock:
+                if not self._running: break
+                lane = self._lanes.get(topic)
+                if lane is None:
+                    lane = self._lanes[topic] = self._new_lane(topic, self._pool)
+                self._space.wait_for(lambda: not self._running or self._has_room(lane) or lane.would_merge(item))
+                if not self._running: break
+                self._enqueue(lane, item)
+            replayed += 1
+        self.journal_replayed += replayed
+        if replayed: self.logger.info(f"📼 EventBus: {replayed} eventi rigiocati dal journal (da seq {start}).")
+        return replayed
+
+    # --- Ring in shared memory ---
+
+    def attach_ring(self, ring):
+        """Aggancia un EventRing creato da questo processo (scrittore): il bus lo chiude in stop()."""
+        with self._sched_lock:
+            self.ring = ring
+
+    def wait_idle(self, timeout=None):
+        """Attende che tutte le lane e lo spill siano vuoti e nessun listener in esecuzione. False allo scadere."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._sched_lock:
+            while self._pending or self._quarantined or self._active or self._spilled:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: return False
+                self._idle.wait(remaining)
+        return True
 
     def stop(self):
-        self._running = False
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-                self._queue.task_done()
-            except queue.Empty: break
-        if self._dispatcher.is_alive():
-            self._dispatcher.join(timeout=2)
-
-bus = EventBusV6(logging.getLogger("DummyBus"))
\ No newline at end of file
+        # Col journal gli eventi ancora in coda restano oltre il low-water: rigiocati al prossimo avvio
+        checkpoint = self.journal_checkpoint() if self.journal is not None else None
+        with self._sched_lock:
+            # Code di quarantena prima di svuotarle; i batch in consegna si rileggono dopo il join
+            floor = self._quarantine_floor(inflight=False)
+            self._running = False
+            for lane in self._lanes.values(): lane.items.clear()
+            for pool in (self._pool, self._quarantine): pool.clear()
+            self._pending = 0
+            self._pending_by_priority = dict.fromkeys(EventPriority, 0)
+            self._quarantined = 0
+            for lane in self._all_lanes():
+                if lane.spill is not None: lane.spill.close()
+            for ls in self._spill_lanes.values(): ls.clear()
+            self._spilled = self._spilled_isolated = 0
+            self._space.notify_all()
+        for pool in (self._pool, self._quarantine):
+            for t in pool.threads:
+                if t.is_alive() and t is not threading.current_thread(): t.join(timeout=2)
+        if self.journal is not None:
+            # Low-water calcolato prima di svuotare le code; i seq consegnati dopo il join dei worker
+            with self._sched_lock:
+                for topic, seq in self._quarantine_floor().items(): floor[topic] = min(seq, floor.get(topic, seq))
+                checkpoint["topics"] = self._topic_checkpoint(floor)
+            self.journal.close(checkpoint)
+        if self.ring is not None:
+            with self._sched_lock: ring, self.ring = self.ring, None
+            ring.close()
+
+bus = EventBusV6(logging.getLogger("DummyBus"))
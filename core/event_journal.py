@@ -0,0 +1,268 @@
+import os
+import re
+import mmap
+import json
+import time
+import zlib
+import pickle
+import struct
+import logging
+import threading
+from pathlib import Path
+
+EVENT_JOURNAL_DIR = os.path.join(str(Path.home()), ".superagent_data", "event_journal")
+SEGMENT_BYTES = 64 * 1024 * 1024
+# Group fsync: gli append non aspettano il disco, il flusher rende durevole ogni FSYNC_INTERVAL
+FSYNC_INTERVAL = 0.05
+CHECKPOINT_INTERVAL = 1.0
+# Segmenti chiusi tenuti comunque (replay da un seq passato), anche se già consegnati
+RETAIN_SEGMENTS = 4
+WRITE_BUFFER = 1024 * 1024
+
+# Record: [body_len u32][crc32 u32][seq u64][ts f64][topic_len u16] + topic utf-8 + payload pickle
+_HEADER = struct.Struct("<IIQdH")
+_SEGMENT_RE = re.compile(r"^events_(\d{20})\.log$")
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def _segment_name(first_seq):
+    return f"events_{first_seq:020d}.log"
+
+
+def _iter_records(buf, start=0):
+    """(offset_fine, seq, ts, topic, payload_bytes) per ogni record valido; si ferma al primo record troncato o corrotto."""
+    pos, end = start, len(buf)
+    while pos + _HEADER.size <= end:
+        body_len, crc, seq, ts, topic_len = _HEADER.unpack_from(buf, pos)
+        body_start = pos + _HEADER.size
+        if body_len < topic_len or body_start + body_len > end: return
+        body = buf[body_start:body_start + body_len]
+        if zlib.crc32(body, seq & 0xFFFFFFFF) != crc: return
+        pos = body_start + body_len
+        yield pos, seq, ts, bytes(body[:topic_len]).decode("utf-8"), body[topic_len:]
+
+
+class EventJournal:
+    """
+    Log append-only segmentato degli eventi del bus, con numeri di sequenza.
+    Gli append vanno in un buffer; un thread flusher fa flush+fsync ogni FSYNC_INTERVAL (durabilità
+    a finestra, come il group-commit del ledger) e salva il checkpoint di consegna del bus.
+    I segmenti ruotano oltre SEGMENT_BYTES e si chiamano col primo seq che contengono; i lettori
+    li leggono via mmap. All'apertura la coda troncata da un crash (CRC o lunghezza) viene tagliata.
+    """
+
+    def __init__(self, directory=EVENT_JOURNAL_DIR, segment_bytes=SEGMENT_BYTES, fsync_interval=FSYNC_INTERVAL,
+                 retain_segments=RETAIN_SEGMENTS, logger=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.retain_segments = retain_segments
+        self.logger = logger or logging.getLogger("EventJournal")
+        self.checkpoint_source = None
+        self.appended = 0
+        self.fsyncs = 0
+        self.compacted_segments = 0
+        self.compacted_records = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._rotated = False
+        self._last_checkpoint = None
+        self._open_tail()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="EventJournal-Flusher")
+        self._flusher.start()
+
+    # --- Segmenti ---
+
+    def segments(self):
+        """[(first_seq, path)] in ordine di sequenza."""
+        out = []
+        for name in os.listdir(self.directory):
+            m = _SEGMENT_RE.match(name)
+            if m: out.append((int(m.group(1)), os.path.join(self.directory, name)))
+        return sorted(out)
+
+    def _open_tail(self):
+        segs = self.segments()
+        if not segs:
+            self.next_seq = 1
+            self._open_segment(1)
+            return
+        first, path = segs[-1]
+        last_seq, valid = first - 1, 0
+        size = os.path.getsize(path)
+        if size:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for valid, seq, _, _, _ in _iter_records(buf): last_seq = seq
+        if valid < size:
+            self.logger.warning(f"📼 Journal eventi: coda troncata in {os.path.basename(path)} ({size - valid} byte scartati).")
+            with open(path, "r+b") as f: f.truncate(valid)
+        self.next_seq = last_seq + 1
+        self._fh = open(path, "ab", buffering=WRITE_BUFFER)
+        self._segment_first, self._size = first, valid
+
+    def _open_segment(self, first_seq):
+        self._fh = open(os.path.join(self.directory, _segment_name(first_seq)), "ab", buffering=WRITE_BUFFER)
+        self._segment_first, self._size = first_seq, 0
+
+    def _rotate(self):
+        # Col lock in mano: il segmento chiuso è durevole prima di aprire il successivo
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self._open_segment(self.next_seq)
+        self._rotated = True
+
+    # --- Scrittura ---
+
+    @property
+    def last_seq(self):
+        return self.next_seq - 1
+
+    @staticmethod
+    def encode(topic, data):
+        """Serializza fuori da ogni lock: il lock del journal copre solo seq e write."""
+        topic_b = topic.encode("utf-8")
+        return len(topic_b), topic_b + pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def append(self, topic, data):
+        """Appende un evento e ne ritorna il seq. Durevole entro fsync_interval (o subito dopo sync())."""
+        return self.write(self.encode(topic, data))
+
+    def write(self, encoded):
+        topic_len, body = encoded
+        with self._lock:
+            seq = self.next_seq
+            self._fh.write(_HEADER.pack(len(body), zlib.crc32(body, seq & 0xFFFFFFFF), seq, time.time(), topic_len) + body)
+            self.next_seq = seq + 1
+            self._size += _HEADER.size + len(body)
+            self._dirty = True
+            self.appended += 1
+            if self._size >= self.segment_bytes: self._rotate()
+        return seq
+
+    def sync(self):
+        with self._lock:
+            if not self._dirty: return
+            self._fh.flush()
+            fd = self._fh.fileno()
+            self._dirty = False
+        os.fsync(fd)
+        self.fsyncs += 1
+
+    def _flush_loop(self):
+        next_checkpoint = 0.0
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+                if time.monotonic() >= next_checkpoint:
+                    self.save_checkpoint()
+                    next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL
+                if self._rotated:
+                    self._rotated = False
+                    self.compact()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Journal eventi: flush fallito: {e}")
+
+    # --- Checkpoint di consegna ---
+
+    def save_checkpoint(self, checkpoint=None):
+        if checkpoint is None:
+            if self.checkpoint_source is None: return
+            checkpoint = self.checkpoint_source()
+        if checkpoint == self._last_checkpoint: return
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._last_checkpoint = checkpoint
+
+    def load_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"low_water": 0, "topics": {}}
+
+    # --- Lettura ---
+
+    def read(self, from_seq=1):
+        """Genera (seq, ts, topic, data) da from_seq in poi, leggendo i segmenti via mmap."""
+        self.sync()
+        segs = self.segments()
+        for i, (first, path) in enumerate(segs):
+            if i + 1 < len(segs) and segs[i + 1][0] <= from_seq: continue
+            if not os.path.getsize(path): continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for _, seq, ts, topic, payload in _iter_records(buf):
+                    if seq >= from_seq: yield seq, ts, topic, pickle.loads(payload)
+
+    # --- Compattazione ---
+
+    def compact(self, delivered=None, latest_value_keys=None):
+        """
+        Rimuove i segmenti chiusi interamente consegnati (seq <= delivered, default il low-water del
+        checkpoint) oltre i retain_segments più recenti. Con latest_value_keys {topic: key(data)} riscrive
+        i segmenti chiusi rimasti tenendo, per quei topic, solo l'ultimo record di ogni chiave.
+        """
+        if delivered is None: delivered = self.load_checkpoint().get("low_water", 0)
+        with self._lock: active = self._segment_first
+        closed = [(first, path) for first, path in self.segments() if first < active]
+        bounds = [first for first, _ in closed[1:]] + [active]
+
+        removable = closed[:max(0, len(closed) - self.retain_segments)]
+        for (first, path), next_first in zip(removable, bounds):
+            if next_first - 1 > delivered: break
+            os.remove(path)
+            self.compacted_segments += 1
+        if latest_value_keys:
+            self._compact_latest_values([s for s in closed if os.path.exists(s[1])], latest_value_keys)
+
+    def _compact_latest_values(self, closed, keys):
+        seen = set()
+        for first, path in reversed(closed):
+            if not os.path.getsize(path): continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                keep, dropped = [], 0
+                records = list(_iter_records(buf))
+                starts = [0] + [r[0] for r in records[:-1]]
+                # Dal più recente al più vecchio: il primo record visto per chiave è l'ultimo valore
+                for start, (end, seq, ts, topic, payload) in reversed(list(zip(starts, records))):
+                    if topic in keys:
+                        k = (topic, keys[topic](pickle.loads(payload)))
+                        if k in seen:
+                            dropped += 1
+                            continue
+                        seen.add(k)
+                    keep.append((start, end))
+                if not dropped: continue
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as out:
+                    for start, end in reversed(keep): out.write(buf[start:end])
+                    out.flush()
+                    os.fsync(out.fileno())
+            os.replace(tmp, path)
+            self.compacted_records += dropped
+
+    def stats(self):
+        segs = self.segments()
+        return {
+            "last_seq": self.last_seq,
+            "appended": self.appended,
+            "fsyncs": self.fsyncs,
+            "segments": len(segs),
+            "bytes": sum(os.path.getsize(p) for _, p in segs),
+            "compacted_segments": self.compacted_segments,
+            "compacted_records": self.compacted_records,
+        }
+
+    def close(self, checkpoint=None):
+        self._stop.set()
+        if self._flusher.is_alive() and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=2)
+        self.sync()
+        self.save_checkpoint(checkpoint)
+        with self._lock: self._fh.close()
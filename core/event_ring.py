@@ -0,0 +1,232 @@
+import os
+import pickle
+import time
+import struct
+import threading
+from multiprocessing import shared_memory
+
+BUS_RING_NAME = "superagent_bus"
+RING_CAPACITY = 4096
+RECORD_SIZE = 512
+RING_MAGIC = b"SAER"
+RING_VERSION = 1
+
+# Header (64 byte): magic, version, closed, record_size, capacity, writer_pid, created, write_seq.
+# write_seq è l'ultimo seq pubblicato: i lettori lo confrontano col proprio cursore
+_HEADER = struct.Struct("<4sHHIIIdQ")
+_HEADER_BYTES = 64
+_CLOSED_OFFSET = 6
+_WRITE_SEQ_OFFSET = 28
+_U16 = struct.Struct("<H")
+_U64 = struct.Struct("<Q")
+
+# Slot a dimensione fissa: [seq u64][ts f64][topic_len u16][payload_len u32][codec u8] + topic + payload
+_SLOT = struct.Struct("<QdHIB")
+CODEC_PICKLE = 0
+CODEC_RAW = 1
+CODEC_TRUNCATED = 2
+
+
+# Segmenti creati da questo processo: il resource_tracker li deve tenere (pulizia dopo un crash)
+_OWNED = set()
+
+
+def _untrack(shm):
+    # Python < 3.13 registra anche i segmenti solo agganciati: all'uscita del lettore il
+    # resource_tracker li rimuoverebbe da sotto lo scrittore
+    if shm._name in _OWNED: return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class RingEvent:
+    """Evento letto dal ring. Il payload è copiato una volta dallo slot; l'unpickle è lazy."""
+    __slots__ = ("seq", "ts", "topic", "codec", "raw")
+
+    def __init__(self, seq, ts, topic, codec, raw):
+        self.seq = seq
+        self.ts = ts
+        self.topic = topic
+        self.codec = codec
+        self.raw = raw
+
+    @property
+    def truncated(self):
+        return self.codec == CODEC_TRUNCATED
+
+    @property
+    def data(self):
+        if self.codec == CODEC_PICKLE: return pickle.loads(self.raw)
+        if self.codec == CODEC_RAW: return self.raw
+        return None
+
+    def __repr__(self):
+        return f"RingEvent(seq={self.seq}, topic={self.topic!r})"
+
+
+class EventRing:
+    """
+    Ring di eventi in shared memory (multiprocessing.shared_memory), a record di dimensione fissa.
+    Un solo scrittore (il processo del bus, create()) e N lettori in altri processi (attach()),
+    ognuno col proprio cursore (RingReader): lo scrittore non aspetta mai nessuno, un lettore troppo
+    lento viene superato e conta gli eventi persi. Ogni slot è protetto da un seqlock: lo scrittore
+    azzera il seq dello slot, scrive il record e poi il seq definitivo; il lettore scarta lo slot
+    se il seq cambia durante la copia.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+        magic, version, _, self.record_size, self.capacity, self.writer_pid, self.created, _ = \
+            _HEADER.unpack_from(self._buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            self._buf = None
+            shm.close()
+            raise ValueError(f"Segmento {shm.name} non è un EventRing v{RING_VERSION}.")
+        self.name = shm.name
+        self.published = 0
+        self.oversize = 0
+        self._lock = threading.Lock()
+        self._next = self.head + 1
+
+    @classmethod
+    def create(cls, name=BUS_RING_NAME, capacity=RING_CAPACITY, record_size=RECORD_SIZE):
+        """Crea il segmento come scrittore. Un segmento orfano di una sessione precedente viene sostituito."""
+        size = _HEADER_BYTES + capacity * record_size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:_HEADER_BYTES] = bytes(_HEADER_BYTES)
+        _HEADER.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, 0, record_size, capacity, os.getpid(), time.time(), 0)
+        _OWNED.add(shm._name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=BUS_RING_NAME):
+        """Aggancia il segmento come lettore. FileNotFoundError se lo scrittore non l'ha ancora creato."""
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return cls(shm, owner=False)
+
+    # --- Stato condiviso ---
+
+    @property
+    def head(self):
+        return _U64.unpack_from(self._buf, _WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def closed(self):
+        return self._buf is None or bool(_U16.unpack_from(self._buf, _CLOSED_OFFSET)[0])
+
+    # --- Scrittura ---
+
+    @staticmethod
+    def encode(topic, data):
+        """Serializza fuori da ogni lock. bytes passano così come sono, il resto in pickle (come journal e spill)."""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return topic.encode("utf-8"), CODEC_RAW, bytes(data)
+        return topic.encode("utf-8"), CODEC_PICKLE, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def publish(self, topic, data):
+        return self.write(self.encode(topic, data))
+
+    def write(self, encoded):
+        """Pubblica un record e ne ritorna il seq. Un record oltre record_size esce troncato (solo topic)."""
+        topic_b, codec, payload = encoded
+        topic_b = topic_b[:self.record_size - _SLOT.size]
+        if _SLOT.size + len(topic_b) + len(payload) > self.record_size:
+            codec, payload = CODEC_TRUNCATED, b""
+            self.oversize += 1
+        # Il record si compone fuori dallo slot; nello slot: seq a 0, corpo, seq definitivo
+        record = _SLOT.pack(0, time.time(), len(topic_b), len(payload), codec) + topic_b + payload
+        buf = self._buf
+        with self._lock:
+            seq = self._next
+            off = _HEADER_BYTES + (seq % self.capacity) * self.record_size
+            _U64.pack_into(buf, off, 0)
+            buf[off + 8:off + len(record)] = record[8:]
+            _U64.pack_into(buf, off, seq)
+            _U64.pack_into(buf, _WRITE_SEQ_OFFSET, seq)
+            self._next = seq + 1
+            self.published += 1
+        return seq
+
+    # --- Lettura ---
+
+    def reader(self, start="latest"):
+        return RingReader(self, start)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "head": self.head if self._buf is not None else 0,
+            "capacity": self.capacity,
+            "record_size": self.record_size,
+            "published": self.published,
+            "oversize": self.oversize,
+        }
+
+    def close(self):
+        """Lo scrittore marca il ring chiuso (i lettori lo vedono) e rimuove il segmento."""
+        if self._buf is None: return
+        if self.owner: _U16.pack_into(self._buf, _CLOSED_OFFSET, 1)
+        self._buf = None
+        self._shm.close()
+        if self.owner:
+            _OWNED.discard(self._shm._name)
+            try: self._shm.unlink()
+            except FileNotFoundError: pass
+
+
+class RingReader:
+    """
+    Cursore privato su un EventRing. start: "latest" (solo eventi futuri), "oldest" (il più vecchio
+    ancora nel ring) o un seq. poll() non blocca: ritorna gli eventi pubblicati dall'ultima chiamata.
+    """
+
+    def __init__(self, ring, start="latest"):
+        self.ring = ring
+        self.lost = 0
+        head = ring.head
+        if start == "latest": self.cursor = head + 1
+        elif start == "oldest": self.cursor = max(1, head - ring.capacity + 1)
+        else: self.cursor = max(1, int(start))
+
+    @property
+    def backlog(self):
+        return max(0, self.ring.head - self.cursor + 1)
+
+    def poll(self, max_events=1024):
+        ring = self.ring
+        buf, cap, size = ring._buf, ring.capacity, ring.record_size
+        if buf is None: return []
+        head = _U64.unpack_from(buf, _WRITE_SEQ_OFFSET)[0]
+        if head - self.cursor + 1 > cap:
+            # Superati dallo scrittore: si riparte dal più vecchio ancora valido
+            self.lost += head - cap + 1 - self.cursor
+            self.cursor = head - cap + 1
+        out = []
+        while self.cursor <= head and len(out) < max_events:
+            seq = self.cursor
+            self.cursor += 1
+            off = _HEADER_BYTES + (seq % cap) * size
+            slot_seq, ts, topic_len, payload_len, codec = _SLOT.unpack_from(buf, off)
+            if slot_seq != seq or _SLOT.size + topic_len + payload_len > size:
+                self.lost += 1
+                continue
+            body = off + _SLOT.size
+            record = bytes(buf[body:body + topic_len + payload_len])
+            if _U64.unpack_from(buf, off)[0] != seq:
+                # Slot riscritto durante la copia
+                self.lost += 1
+                continue
+            out.append(RingEvent(seq, ts, record[:topic_len].decode("utf-8", "replace"), codec, record[topic_len:]))
+        return out
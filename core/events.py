@@ -1,4 +1,6 @@
-from enum import Enum
+from collections import namedtuple
+from collections.abc import Mapping
+from enum import Enum, IntEnum
 
 
 class AppEvent(str, Enum):
@@ -13,3 +15,114 @@ class AppEvent(str, Enum):
     BET_UNKNOWN = "BET_UNKNOWN"
     STATE_CHANGE = "STATE_CHANGE"
     BET_ERROR = "BET_ERROR"
+    BALANCE_UPDATE = "BALANCE_UPDATE"
+    HEARTBEAT = "HEARTBEAT"
+
+
+class EventPriority(IntEnum):
+    """Priority classes of the event bus (lower value = drained first)."""
+
+    CRITICAL = 0
+    HIGH = 1
+    NORMAL = 2
+    LOW = 3
+
+
+# Ledger-critical outcomes must never wait behind UI/state traffic.
+EVENT_PRIORITY = {
+    AppEvent.BET_FAILED: EventPriority.CRITICAL,
+    AppEvent.BET_UNKNOWN: EventPriority.CRITICAL,
+    AppEvent.BET_ERROR: EventPriority.CRITICAL,
+    AppEvent.BET_SUCCESS: EventPriority.HIGH,
+    AppEvent.STATE_CHANGE: EventPriority.LOW,
+    AppEvent.BALANCE_UPDATE: EventPriority.NORMAL,
+    AppEvent.HEARTBEAT: EventPriority.LOW,
+}
+
+# Latest-value topics: while a listener is busy only the newest payload per key is kept.
+# Value = payload field that identifies the key (None = a single latest value for the topic).
+COALESCED_EVENTS = {
+    AppEvent.STATE_CHANGE: None,
+    AppEvent.BALANCE_UPDATE: "account",
+    AppEvent.HEARTBEAT: "source",
+}
+
+
+class EventPayload:
+    """
+    Mixin for typed bus payloads built on namedtuple: one compact immutable tuple per event,
+    shared as-is by every subscriber (no defensive copies, nothing to mutate).
+
+    The dict-style shim (get, [], keys, items, in, dict(payload)) keeps existing `payload.get(...)`
+    subscribers working. Integer indexes and unpacking still behave like a tuple.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._index = {name: i for i, name in enumerate(cls._fields)}
+        cls._required = frozenset(cls._fields) - frozenset(cls._field_defaults)
+
+    @classmethod
+    def coerce(cls, data):
+        """Validate once at emit time: an instance passes through, a mapping must match the fields."""
+        if isinstance(data, cls): return data
+        if not isinstance(data, Mapping):
+            raise TypeError(f"{cls.__name__} payload expected, got {type(data).__name__}")
+        unknown = data.keys() - cls._index.keys()
+        if unknown: raise ValueError(f"{cls.__name__}: unknown fields {sorted(unknown)}")
+        missing = cls._required - data.keys()
+        if missing: raise ValueError(f"{cls.__name__}: missing fields {sorted(missing)}")
+        return cls(**data)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            i = self._index.get(key)
+            if i is None: raise KeyError(key)
+            key = i
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+
+class BetSuccess(EventPayload, namedtuple("BetSuccess", ("tx_id", "teams", "stake"), defaults=("", 0.0))):
+    __slots__ = ()
+
+
+class BetFailed(EventPayload, namedtuple("BetFailed", ("tx_id", "reason", "duplicate"), defaults=("", False))):
+    __slots__ = ()
+
+
+class BalanceUpdate(EventPayload, namedtuple("BalanceUpdate", ("account", "balance", "peak"), defaults=(0.0,))):
+    __slots__ = ()
+
+
+class Heartbeat(EventPayload, namedtuple("Heartbeat", ("source", "ts"))):
+    __slots__ = ()
+
+
+# Typed payloads: the bus coerces dict payloads of these topics once, at emit.
+EVENT_PAYLOADS = {
+    AppEvent.BET_SUCCESS: BetSuccess,
+    AppEvent.BET_FAILED: BetFailed,
+    AppEvent.BALANCE_UPDATE: BalanceUpdate,
+    AppEvent.HEARTBEAT: Heartbeat,
+}
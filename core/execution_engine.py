@@ -5,6 +5,9 @@ import uuid
 import re
 from typing import Dict, Any
 from core.circuit_breaker import CircuitBreaker
+from core.database import DEFAULT_ACCOUNT
+from core.signal_dedup import DuplicateSignalError, signal_fingerprint
+from core.events import BetSuccess, BetFailed
 
 class ExecutionEngine:
     def __init__(self, bus, executor, logger=None):
@@ -36,6 +39,7 @@ class ExecutionEngine:
             tx_id = None
             tx_reserved = tx_pre_committed = tx_placed = False
             teams = payload.get("teams", "Unknown")
+            market = payload.get("market") or "1"
             stake = self._safe_float(payload.get("stake"), 2.0)
 
             if stake <= 0: return
@@ -43,20 +47,29 @@ class ExecutionEngine:
             try:
                 with self._processing_lock:
                     tx_id = str(uuid.uuid4())
-                    money_manager.db.reserve(tx_id, stake, teams=teams)
+                    fingerprint = signal_fingerprint(teams, market)
+                    money_manager.db.reserve(tx_id, stake, teams=teams, match_hash=fingerprint, robot=payload.get("robot_name", ""),
+                                             account=payload.get("account") or DEFAULT_ACCOUNT)
                     tx_reserved = True
 
                     money_manager.db.mark_pre_commit(tx_id)
                     tx_pre_committed = True
 
+                    money_manager.db.log_pre_click(tx_id)
                     bet_ok = self.executor.place_bet(teams, "1", stake)
                     if not bet_ok: raise RuntimeError("Click fallito")
 
+                    money_manager.db.log_post_click(tx_id)
                     tx_placed = True
                     money_manager.db.mark_placed(tx_id)
                     self.breaker.record_success()
-                    self.bus.emit("BET_SUCCESS", {"tx_id": tx_id, "teams": teams, "stake": stake})
+                # Esito emesso fuori da _processing_lock: il bus non trattiene mai il prossimo segnale
+                self.bus.emit("BET_SUCCESS", BetSuccess(tx_id, teams, stake))
 
+            except DuplicateSignalError as e:
+                # Tip ripostato: nessun fondo riservato, non è un guasto del breaker
+                self.logger.info(f"🔁 {e}")
+                self.bus.emit("BET_FAILED", BetFailed(tx_id, str(e), True))
             except Exception as e:
                 final_exc = e
                 actual_side_effect = False
@@ -75,7 +88,7 @@ class ExecutionEngine:
                     final_exc = Exception("PANIC Ledger Triggered")
 
                 self.breaker.record_failure(final_exc)
-                self.bus.emit("BET_FAILED", {"tx_id": tx_id, "reason": str(final_exc)})
+                self.bus.emit("BET_FAILED", BetFailed(tx_id, str(final_exc)))
                 
         finally:
             with self._active_tx_lock: self._active_tx -= 1
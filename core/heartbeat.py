@@ -7,14 +7,31 @@ DATA_DIR = os.path.join(str(Path.home()), ".superagent_data")
 HEARTBEAT_FILE = os.path.join(DATA_DIR, "heartbeat.dat")
 
 class AppHeartbeat:
+    @staticmethod
+    def _follow_bus(state):
+        # 🔁 Lettore del ring del bus: ultimo seq visto e ultimo HEARTBEAT del controller
+        from core.event_ring import EventRing
+        if state.get("reader") is None or state["reader"].ring.closed:
+            if state.get("reader") is not None: state["reader"].ring.close()
+            state["reader"] = None
+            try: state["reader"] = EventRing.attach().reader(start="oldest")
+            except (FileNotFoundError, ValueError): return
+        for event in state["reader"].poll(max_events=1 << 16):
+            state["seq"] = event.seq
+            if event.topic == "HEARTBEAT": state["bus_ts"] = event.ts
+
     @staticmethod
     def _pulse():
+        state = {"reader": None, "seq": 0, "bus_ts": 0.0}
         while True:
+            try: AppHeartbeat._follow_bus(state)
+            except Exception: pass
             try:
                 # 🔴 FIX HEDGE-GRADE: Scrittura atomica per l'heartbeat
+                # Riga 1: battito di questo processo. Riga 2: ultimo seq del bus e ultimo HEARTBEAT visto sul ring
                 tmp_file = HEARTBEAT_FILE + ".tmp"
                 with open(tmp_file, "w") as f:
-                    f.write(str(time.time()))
+                    f.write(f"{time.time()}\n{state['seq']} {state['bus_ts']}\n")
                 os.replace(tmp_file, HEARTBEAT_FILE)
             except Exception: 
                 pass
@@ -26,4 +43,4 @@ class AppHeartbeat:
         os.makedirs(DATA_DIR, exist_ok=True)
         # Processo su core CPU isolato
         p = multiprocessing.Process(target=AppHeartbeat._pulse, daemon=True)
-        p.start()
\ No newline at end of file
+        p.start()
@@ -0,0 +1,189 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+import threading
+
+# Layout record fisso (little-endian): magic, kind, len(tx_id), seq, timestamp, tx_id (padded) + CRC32
+_REC = struct.Struct("<2sBBQd64s")
+_CRC = struct.Struct("<I")
+RECORD_SIZE = _REC.size + _CRC.size
+MAGIC = b"IL"
+
+PRE_CLICK = 1
+POST_CLICK = 2
+RESOLVED = 3
+
+SEGMENT_SIZE = 1024 * 1024
+
+
+class IntentLog:
+    """
+    Intent log append-only su segmento memory-mapped, record a dimensione fissa con CRC32.
+    Registra i marker PRE_CLICK / POST_CLICK di ogni tx con barriere di flush esplicite (msync/fsync)
+    e i RESOLVED una volta che lo stato è durevole nel ledger.
+    Il replay è un'unica scansione sequenziale: si ferma al primo record vuoto o strappato (CRC errato),
+    quindi il tempo di recovery è limitato dalla dimensione del log.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, size=SEGMENT_SIZE):
+        """Un'istanza per file e processo: più Database nello stesso processo condividono lo stesso segmento."""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            inst = cls._instances.get(key)
+            if inst is None or inst._pid != os.getpid():
+                inst = cls(key, size)
+                cls._instances[key] = inst
+            return inst
+
+    def __init__(self, path, size=SEGMENT_SIZE):
+        self.path = path
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self.size = os.fstat(fd).st_size
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size)
+        self._offset, self._seq = self._scan_end()
+        self._finish_compaction()
+
+    # --- Scansione ---
+
+    def _records(self, limit=None):
+        end = self.size if limit is None else limit
+        off = 0
+        while off + RECORD_SIZE <= end:
+            raw = self._mm[off:off + RECORD_SIZE]
+            body, crc = raw[:_REC.size], _CRC.unpack(raw[_REC.size:])[0]
+            magic, kind, tx_len, seq, ts, tx = _REC.unpack(body)
+            if magic != MAGIC or zlib.crc32(body) != crc:
+                return
+            yield off, kind, seq, tx[:tx_len].decode("utf-8")
+            off += RECORD_SIZE
+
+    def _scan_end(self):
+        offset, seq = 0, 0
+        for off, _, rec_seq, _ in self._records():
+            offset, seq = off + RECORD_SIZE, rec_seq
+        return offset, seq
+
+    def pending(self):
+        """Replay single-pass: {tx_id: ultimo marker} per le tx non ancora RESOLVED."""
+        with self._lock:
+            state = {}
+            for _, kind, _, tx_id in self._records(self._offset):
+                if kind == RESOLVED: state.pop(tx_id, None)
+                else: state[tx_id] = max(kind, state.get(tx_id, 0))
+            return state
+
+    # --- Scrittura ---
+
+    def _pack(self, kind, tx_id):
+        tx = tx_id.encode("utf-8")
+        if len(tx) > 64: raise ValueError(f"tx_id troppo lungo per l'intent log: {tx_id}")
+        self._seq += 1
+        body = _REC.pack(MAGIC, kind, len(tx), self._seq, time.time(), tx)
+        return body + _CRC.pack(zlib.crc32(body))
+
+    def _write_locked(self, records, barrier):
+        data = b"".join(records)
+        if self._offset + len(data) > self.size:
+            self._compact_locked()
+            if self._offset + len(data) > self.size:
+                raise RuntimeError("IntentLog pieno: troppe tx non risolte per il segmento.")
+        start = self._offset
+        self._mm[start:start + len(data)] = data
+        self._offset += len(data)
+        if barrier: self._flush_locked(start, len(data))
+
+    def _flush_locked(self, start, length):
+        aligned = (start // mmap.ALLOCATIONGRANULARITY) * mmap.ALLOCATIONGRANULARITY
+        self._mm.flush(aligned, start + length - aligned)
+        # Su Windows FlushViewOfFile non svuota la cache disco: serve anche FlushFileBuffers
+        if os.name == "nt": os.fsync(self._fd)
+
+    def append(self, kind, tx_id, barrier=True):
+        with self._lock:
+            self._write_locked([self._pack(kind, tx_id)], barrier)
+
+    def resolve_many(self, tx_ids, barrier=True):
+        tx_ids = list(tx_ids)
+        if not tx_ids: return
+        with self._lock:
+            self._write_locked([self._pack(RESOLVED, t) for t in tx_ids], barrier)
+
+    def barrier(self):
+        with self._lock:
+            if self._offset: self._flush_locked(0, self._offset)
+
+    @classmethod
+    def sync(cls, path):
+        """Barriera sul segmento di path, se aperto in questo processo (es. prima di copiarlo in un backup)."""
+        with cls._instances_lock:
+            inst = cls._instances.get(os.path.abspath(path))
+        if inst is not None and inst._pid == os.getpid(): inst.barrier()
+
+    def compact(self):
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """
+        Riscrive il segmento con i soli marker non risolti.
+        Crash-safe: i record vivi vengono prima resi durevoli in <log>.next (write + fsync + rename atomico),
+        poi copiati in place. Se il processo muore durante la copia, la prossima open completa il lavoro da .next.
+        """
+        state = {}
+        for _, kind, _, tx_id in self._records(self._offset):
+            if kind == RESOLVED: state.pop(tx_id, None)
+            else: state[tx_id] = max(kind, state.get(tx_id, 0))
+        data = b"".join(self._pack(kind, tx_id) for tx_id, kind in state.items())
+
+        staging = self.path + ".next"
+        with open(staging + ".tmp", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging + ".tmp", staging)
+        self._rewrite_locked(data)
+        os.remove(staging)
+
+    def _rewrite_locked(self, data):
+        used = self._offset
+        self._mm[0:len(data)] = data
+        if used > len(data):
+            self._mm[len(data):used] = bytes(used - len(data))
+        self._offset = len(data)
+        self._flush_locked(0, max(used, len(data)) or RECORD_SIZE)
+
+    def _finish_compaction(self):
+        staging = self.path + ".next"
+        # .next.tmp incompleto: la compattazione non era iniziata, il segmento principale è intatto
+        if os.path.exists(staging + ".tmp"): os.remove(staging + ".tmp")
+        if not os.path.exists(staging): return
+        with open(staging, "rb") as f:
+            data = f.read()
+        with self._lock:
+            self._offset = self.size
+            self._rewrite_locked(data)
+            self._offset, self._seq = self._scan_end()
+        os.remove(staging)
+
+    def close(self):
+        with self._lock:
+            try:
+                self._mm.flush()
+                self._mm.close()
+                os.close(self._fd)
+            except Exception: pass
+        # Un open() successivo nello stesso processo rimappa il file invece di ritornare il segmento chiuso
+        with IntentLog._instances_lock:
+            if IntentLog._instances.get(self.path) is self:
+                del IntentLog._instances[self.path]
@@ -1,22 +1,107 @@
 import os
 import logging
+from abc import ABC, abstractmethod
+
+VALID_STATUSES = ("RESERVED", "PRE_COMMIT", "PLACED", "SETTLED", "VOID", "MANUAL_CHECK")
+
+
+class LedgerInvariant(ABC):
+    """
+    Invariante pluggabile del ledger, per ciò che lo schema non sa esprimere
+    (il Double Spend, invariante 2, è già UNIQUE(tx_id): la violazione arriva da handle_db_error).
+    check(): verifica incrementale sulle sole righe toccate dalla transazione corrente (O(k log n)).
+    audit(): verifica completa della tabella, da usare solo in modalità audit esplicita.
+    Entrambi ritornano il tx_id che viola l'invariante, oppure None.
+    """
+    code = "0"
+    description = ""
+
+    @abstractmethod
+    def check(self, conn, touched): ...
+
+    @abstractmethod
+    def audit(self, conn): ...
+
+
+class ValidStatusInvariant(LedgerInvariant):
+    code = "4"
+    description = "Stato journal illegale"
+
+    _placeholders = ",".join("?" for _ in VALID_STATUSES)
+
+    def check(self, conn, touched):
+        row = conn.execute(f"""
+            SELECT j.tx_id FROM temp.ledger_touched t
+            CROSS JOIN main.journal j ON j.tx_id = t.tx_id
+            WHERE j.status NOT IN ({self._placeholders}) LIMIT 1
+        """, VALID_STATUSES).fetchone()
+        return row["tx_id"] if row else None
+
+    def audit(self, conn):
+        row = conn.execute(
+            f"SELECT tx_id FROM journal WHERE status NOT IN ({self._placeholders}) LIMIT 1", VALID_STATUSES
+        ).fetchone()
+        return row["tx_id"] if row else None
+
 
 class LedgerGuard:
     logger = logging.getLogger("LedgerGuard")
+    invariants = [ValidStatusInvariant()]
+
+    @classmethod
+    def register(cls, invariant):
+        if not any(type(i) is type(invariant) for i in cls.invariants):
+            cls.invariants.append(invariant)
+
+    @classmethod
+    def install(cls, conn):
+        """
+        Installa sulla connessione scrittrice il touched-row set: tabella TEMP alimentata da trigger TEMP.
+        Essendo TEMP, partecipa alla transazione (un ROLLBACK svuota anche il set) e non tocca lo schema su disco.
+        """
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS ledger_touched (tx_id TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.execute("""
+            CREATE TEMP TRIGGER IF NOT EXISTS ledger_touch_insert AFTER INSERT ON main.journal
+            BEGIN INSERT OR IGNORE INTO ledger_touched (tx_id) VALUES (NEW.tx_id); END;
+        """)
+        conn.execute("""
+            CREATE TEMP TRIGGER IF NOT EXISTS ledger_touch_update AFTER UPDATE ON main.journal
+            BEGIN INSERT OR IGNORE INTO ledger_touched (tx_id) VALUES (NEW.tx_id); END;
+        """)
 
     @classmethod
     def pre_commit_check(cls, conn):
         try:
-            dups = conn.execute("SELECT tx_id FROM journal GROUP BY tx_id HAVING COUNT(id) > 1").fetchone()
-            if dups:
-                cls.logger.critical(f"💀 FATAL INVARIANT 2 VIOLATO: Double Spend! TX_ID: {dups['tx_id']}.")
-                cls._trigger_kill_switch(RuntimeError(f"Double Spend Detected: {dups['tx_id']}"))
+            try:
+                touched = conn.execute("SELECT COUNT(*) FROM temp.ledger_touched").fetchone()[0]
+            except Exception:
+                # Connessione senza touched-row set: ripiego sulla verifica completa
+                cls.audit(conn)
+                return
+
+            if touched:
+                for inv in cls.invariants:
+                    bad = inv.check(conn, touched)
+                    if bad is not None: cls._violation(inv, bad)
+                conn.execute("DELETE FROM temp.ledger_touched")
         except SystemExit:
             raise
         except Exception as e:
             cls.logger.critical(f"💀 GUARD ERROR: Errore verifica invarianti Python-side ({e}).")
             cls._trigger_kill_switch(e)
 
+    @classmethod
+    def audit(cls, conn):
+        """Modalità audit: verifica full-table di tutti gli invarianti registrati. Costo O(n), non usarla per commit."""
+        for inv in cls.invariants:
+            bad = inv.audit(conn)
+            if bad is not None: cls._violation(inv, bad)
+
+    @classmethod
+    def _violation(cls, invariant, tx_id):
+        cls.logger.critical(f"💀 FATAL INVARIANT {invariant.code} VIOLATO: {invariant.description}! TX_ID: {tx_id}.")
+        cls._trigger_kill_switch(RuntimeError(f"{invariant.description} Detected: {tx_id}"))
+
     @classmethod
     def assert_transition(cls, conn, tx_id, target_status):
         if target_status == "SETTLED":
@@ -28,6 +113,21 @@ class LedgerGuard:
                 cls.logger.critical(f"💀 FATAL INVARIANT 3 VIOLATO: Transizione illegale {row['status']} -> SETTLED.")
                 cls._trigger_kill_switch(RuntimeError("Transizione illegale"))
 
+    @classmethod
+    def assert_bulk_settle(cls, conn):
+        """Invariante 3 in un solo passaggio su temp.settle_batch: ogni tx deve esistere ed essere PLACED."""
+        row = conn.execute("""
+            SELECT s.tx_id, j.status FROM temp.settle_batch s
+            LEFT JOIN main.journal j ON j.tx_id = s.tx_id
+            WHERE j.status IS NULL OR j.status != 'PLACED' LIMIT 1
+        """).fetchone()
+        if row:
+            if row["status"] is None:
+                cls.logger.critical(f"💀 FATAL INVARIANT 3 VIOLATO: Tx {row['tx_id']} inesistente.")
+                cls._trigger_kill_switch(RuntimeError("Tx inesistente"))
+            cls.logger.critical(f"💀 FATAL INVARIANT 3 VIOLATO: Transizione illegale {row['status']} -> SETTLED ({row['tx_id']}).")
+            cls._trigger_kill_switch(RuntimeError("Transizione illegale"))
+
     @classmethod
     def handle_db_error(cls, error):
         cls.logger.critical(f"💀 FATAL DB CONSTRAINT VIOLATO: {error}. ROLLBACK FORZATO.")
@@ -43,6 +143,6 @@ class LedgerGuard:
         if os.environ.get("CI") == "true" or os.environ.get("ALLOW_DB_EXCEPTION") == "1":
             cls.logger.warning("🧪 [CI MODE ATTIVO] Bypass os._exit(1) -> Sollevo eccezione per PyTest.")
             raise error
-        
+
         cls.logger.critical("🔌 [PROD MODE] STACCO LA CORRENTE. KILLED.")
         os._exit(1)
\ No newline at end of file
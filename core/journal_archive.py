@@ -0,0 +1,207 @@
+import os
+import time
+import sqlite3
+import logging
+import contextlib
+
+ARCHIVE_HORIZON_DAYS = 90
+ARCHIVE_BATCH_SIZE = 2000
+# Limite prudente di ATTACH per connessione (SQLITE_MAX_ATTACHED di default è 10, main e temp esclusi)
+ARCHIVE_ATTACH_CHUNK = 8
+ARCHIVABLE_STATUSES = ("SETTLED", "VOID")
+
+
+class JournalArchiver:
+    """
+    Tiering del journal: le righe terminali (SETTLED/VOID) più vecchie dell'orizzonte vengono spostate
+    in file mensili archive/journal_YYYY_MM.sqlite, così money_db.sqlite resta piccolo.
+
+    Spostamento crash-safe senza transazioni multi-file (non atomiche in WAL):
+      1. INSERT OR IGNORE nell'archivio + COMMIT durevole
+      2. DELETE dal file caldo tramite il LedgerWriter (group-commit)
+    Un crash tra 1 e 2 lascia solo duplicati identici: il run successivo è idempotente
+    e le query unificate usano UNION, che collassa le righe uguali.
+    """
+
+    def __init__(self, db, archive_dir, logger=None):
+        self.db = db
+        self.archive_dir = archive_dir
+        self.logger = logger or logging.getLogger("JournalArchiver")
+        # Incrementata a ogni run che sposta righe: le cache costruite sul journal caldo si invalidano
+        self.generation = 0
+        self._newest = None
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    # --- Percorsi ---
+
+    def _path(self, month):
+        return os.path.join(self.archive_dir, f"journal_{month}.sqlite")
+
+    def months(self):
+        """Mesi archiviati disponibili, ordinati ('YYYY_MM')."""
+        out = []
+        for name in os.listdir(self.archive_dir):
+            if name.startswith("journal_") and name.endswith(".sqlite"):
+                out.append(name[len("journal_"):-len(".sqlite")])
+        return sorted(out)
+
+    @staticmethod
+    def month_of(ts):
+        return time.strftime("%Y_%m", time.gmtime(int(ts)))
+
+    def months_between(self, since=None, until=None):
+        lo = self.month_of(since) if since is not None else None
+        hi = self.month_of(until) if until is not None else None
+        return [m for m in self.months() if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    def newest_timestamp(self):
+        """Timestamp più recente negli archivi (None se vuoti): in cache finché un run non sposta righe."""
+        months = self.months()
+        key = (self.generation, months[-1] if months else None)
+        if self._newest is None or self._newest[0] != key:
+            ts = None
+            if months:
+                uri = f"file:{self._path(months[-1])}?mode=ro"
+                with contextlib.closing(sqlite3.connect(uri, uri=True)) as conn:
+                    ts = conn.execute("SELECT MAX(timestamp) FROM journal").fetchone()[0]
+            self._newest = (key, ts)
+        return self._newest[1]
+
+    # --- Scrittura archivio ---
+
+    def _hot_columns(self, conn):
+        return [r[1] for r in conn.execute("PRAGMA main.table_info(journal)").fetchall()]
+
+    def _open_archive(self, month, columns):
+        conn = sqlite3.connect(self._path(month), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=DELETE;")
+        conn.execute("PRAGMA synchronous=FULL;")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY,
+                tx_id TEXT UNIQUE NOT NULL
+            )
+        """)
+        # Lo schema caldo evolve con le migrazioni: l'archivio si allinea per colonne aggiunte
+        existing = {r[1] for r in conn.execute("PRAGMA table_info(journal)").fetchall()}
+        for col in columns:
+            if col not in existing:
+                conn.execute(f"ALTER TABLE journal ADD COLUMN {col}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_timestamp ON journal(timestamp, id)")
+        # Filtri dello storico paginato: come idx_journal_status_ts / idx_journal_robot_ts sul file caldo
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_status_ts ON journal(status, timestamp, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_robot_ts ON journal(robot, timestamp, id)")
+        return conn
+
+    def run(self, horizon_days=ARCHIVE_HORIZON_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+        """Archivia a batch tutte le righe terminali più vecchie di horizon_days. Ritorna il numero di righe spostate."""
+        cutoff = int(time.time()) - int(horizon_days) * 86400
+        status_sql = ",".join(f"'{s}'" for s in ARCHIVABLE_STATUSES)
+        moved = 0
+        last_id = 0
+
+        while True:
+            with self.db.readers.connection() as rconn:
+                columns = self._hot_columns(rconn)
+                rows = rconn.execute(
+                    f"SELECT * FROM journal WHERE status IN ({status_sql}) AND timestamp < ? AND id > ? "
+                    f"ORDER BY id LIMIT ?", (cutoff, last_id, batch_size)
+                ).fetchall()
+            if not rows: break
+            last_id = rows[-1]["id"]
+
+            by_month = {}
+            for r in rows:
+                by_month.setdefault(self.month_of(r["timestamp"]), []).append(tuple(r[c] for c in columns))
+
+            # 1. Copia durevole negli archivi mensili
+            placeholders = ",".join("?" for _ in columns)
+            col_sql = ",".join(columns)
+            for month, values in by_month.items():
+                aconn = self._open_archive(month, columns)
+                try:
+                    aconn.execute("BEGIN IMMEDIATE")
+                    aconn.executemany(f"INSERT OR IGNORE INTO journal ({col_sql}) VALUES ({placeholders})", values)
+                    aconn.execute("COMMIT")
+                except Exception:
+                    try: aconn.execute("ROLLBACK")
+                    except: pass
+                    raise
+                finally:
+                    aconn.close()
+
+            # 2. Rimozione dal file caldo: solo dopo che ogni archivio è committato
+            ids = [(r["id"],) for r in rows]
+            tx_ids = [(r["tx_id"],) for r in rows]
+
+            def _delete(conn):
+                conn.executemany(f"DELETE FROM journal WHERE id = ? AND status IN ({status_sql})", ids)
+                # Lo storico delle transizioni segue il journal caldo: oltre l'orizzonte non serve alle latenze
+                conn.executemany("DELETE FROM journal_transitions WHERE tx_id = ?", tx_ids)
+            self.db._run_write(_delete)
+            moved += len(rows)
+
+        if moved:
+            self.generation += 1
+            self.logger.info(f"🗄️ Archiviazione journal: {moved} righe spostate negli archivi mensili.")
+        return moved
+
+    # --- Lettura unificata ---
+
+    @contextlib.contextmanager
+    def attached(self, conn, months):
+        """ATTACH read-only on-demand dei mesi richiesti sulla connessione data; DETACH garantito in uscita."""
+        aliases = []
+        try:
+            for month in months:
+                alias = f"arc_{month}"
+                conn.execute("ATTACH DATABASE ? AS " + alias, (f"file:{self._path(month)}?mode=ro",))
+                aliases.append(alias)
+            yield aliases
+        finally:
+            for alias in aliases:
+                try: conn.execute(f"DETACH DATABASE {alias}")
+                except: pass
+
+    def query(self, conn, where="1=1", params=(), since=None, until=None, order_by="timestamp DESC, id DESC", limit=None):
+        """
+        Query sul journal caldo + archivi mensili nel range [since, until).
+        where/params vengono applicati a ogni sorgente; il risultato è ordinato e limitato globalmente
+        (oltre ARCHIVE_ATTACH_CHUNK mesi il merge tra chunk ordina per timestamp, id).
+        """
+        columns = self._hot_columns(conn)
+        time_sql, time_params = "", []
+        if since is not None:
+            time_sql += " AND timestamp >= ?"
+            time_params.append(int(since))
+        if until is not None:
+            time_sql += " AND timestamp < ?"
+            time_params.append(int(until))
+        src_params = list(params) + time_params
+        tail = f" ORDER BY {order_by}" + (f" LIMIT {int(limit)}" if limit is not None else "")
+
+        months = self.months_between(since, until)
+        chunks = [months[i:i + ARCHIVE_ATTACH_CHUNK] for i in range(0, len(months), ARCHIVE_ATTACH_CHUNK)] or [[]]
+        results = []
+        for idx, chunk in enumerate(chunks):
+            with self.attached(conn, chunk) as aliases:
+                selects, all_params = [], []
+                sources = (["main"] if idx == 0 else []) + aliases
+                for schema in sources:
+                    present = {r[1] for r in conn.execute(f"PRAGMA {schema}.table_info(journal)").fetchall()}
+                    cols = ",".join(c if c in present else f"NULL AS {c}" for c in columns)
+                    selects.append(f"SELECT {cols} FROM {schema}.journal WHERE ({where}){time_sql}")
+                    all_params.extend(src_params)
+                if not selects: continue
+                results.extend(dict(r) for r in conn.execute(" UNION ".join(selects) + tail, all_params).fetchall())
+
+        if len(chunks) > 1:
+            # Merge dei chunk: dedup per tx_id (stessa riga terminale in caldo e archivio) e riordino globale
+            seen, merged = set(), []
+            for r in results:
+                if r["tx_id"] in seen: continue
+                seen.add(r["tx_id"])
+                merged.append(r)
+            merged.sort(key=lambda r: (r.get("timestamp") or 0, r.get("id") or 0), reverse="DESC" in order_by.upper())
+            results = merged[:limit] if limit is not None else merged
+        return results
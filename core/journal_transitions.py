@@ -0,0 +1,87 @@
+import time
+import collections
+
+TRACKED_STATES = ("RESERVED", "PRE_COMMIT", "PLACED", "MANUAL_CHECK")
+PERCENTILES = (50, 95, 99)
+
+
+def install(conn):
+    """
+    Installa sulla connessione scrittrice il log delle transizioni: trigger TEMP su main.journal che
+    appendono a journal_transitions nella stessa transazione del cambio di stato (ROLLBACK incluso).
+    I timestamp vengono da funzioni Python registrate sulla connessione: monotonic_ns per le durate,
+    time_ns per il giorno; session distingue gli avvii (monotonic non è confrontabile tra riavvii macchina).
+    """
+    session = time.time_ns()
+    conn.create_function("ledger_mono_ns", 0, time.monotonic_ns)
+    conn.create_function("ledger_wall_ns", 0, time.time_ns)
+    insert = f"""
+        INSERT INTO journal_transitions (tx_id, from_status, to_status, mono_ns, wall_ns, session, robot, table_id)
+        VALUES (NEW.tx_id, {{from_status}}, NEW.status, ledger_mono_ns(), ledger_wall_ns(), {session}, NEW.robot, NEW.table_id);
+    """
+    conn.execute(f"""
+        CREATE TEMP TRIGGER IF NOT EXISTS journal_transition_insert AFTER INSERT ON main.journal
+        BEGIN {insert.format(from_status="NULL")} END;
+    """)
+    conn.execute(f"""
+        CREATE TEMP TRIGGER IF NOT EXISTS journal_transition_update AFTER UPDATE OF status ON main.journal
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN {insert.format(from_status="OLD.status")} END;
+    """)
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank: nessuna interpolazione, il valore ritornato è sempre una durata osservata
+    idx = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[idx]
+
+
+def time_in_state(conn, since=None, until=None, by=("day", "robot", "table_id")):
+    """
+    Percentili p50/p95/p99 del tempo trascorso in ogni stato (ms), raggruppati per stato + `by`
+    (sottoinsieme di day/robot/table_id). Conta solo le permanenze concluse, con ingresso in [since, until).
+    """
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("wall_ns >= ?")
+        params.append(int(since * 1e9))
+    if until is not None:
+        clauses.append("wall_ns < ?")
+        params.append(int(until * 1e9))
+    window = " AND ".join(clauses) or "1=1"
+
+    # Finestra ristretta via idx_transitions_wall alle sole tx con ingressi nel range, poi LEAD per tx
+    rows = conn.execute(f"""
+        SELECT to_status AS state, robot, table_id, wall_ns,
+               CASE WHEN next_session = session THEN next_mono - mono_ns ELSE next_wall - wall_ns END AS dur_ns
+        FROM (
+            SELECT to_status, robot, table_id, mono_ns, wall_ns, session,
+                   LEAD(mono_ns) OVER w AS next_mono,
+                   LEAD(wall_ns) OVER w AS next_wall,
+                   LEAD(session) OVER w AS next_session
+            FROM journal_transitions
+            WHERE tx_id IN (SELECT tx_id FROM journal_transitions WHERE {window})
+            WINDOW w AS (PARTITION BY tx_id ORDER BY id)
+        )
+        WHERE {window} AND next_mono IS NOT NULL
+    """, params + params).fetchall()
+
+    groups = collections.defaultdict(list)
+    for r in rows:
+        if r["state"] not in TRACKED_STATES: continue
+        key = {"state": r["state"]}
+        if "day" in by: key["day"] = time.strftime("%Y-%m-%d", time.gmtime(r["wall_ns"] / 1e9))
+        if "robot" in by: key["robot"] = r["robot"] or ""
+        if "table_id" in by: key["table_id"] = r["table_id"]
+        groups[tuple(sorted(key.items()))].append(max(r["dur_ns"], 0))
+
+    out = []
+    for key, values in groups.items():
+        values.sort()
+        entry = dict(key)
+        entry["count"] = len(values)
+        for pct in PERCENTILES:
+            entry[f"p{pct}_ms"] = round(_percentile(values, pct) / 1e6, 3)
+        out.append(entry)
+    out.sort(key=lambda e: (e.get("day", ""), e["state"], e.get("robot", ""), e.get("table_id") or 0))
+    return out
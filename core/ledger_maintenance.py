@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import threading
+from core.signal_dedup import prune_fingerprints
+
+MAINTENANCE_INTERVAL = 30
+# Soglie WAL: PASSIVE appena il file cresce, TRUNCATE solo nei momenti di quiete (nessuna bet in reserve/pre-commit)
+WAL_PASSIVE_BYTES = 4 * 1024 * 1024
+WAL_TRUNCATE_BYTES = 16 * 1024 * 1024
+# Un TRUNCATE attende i lettori: mai più di questo col lock di scrittura in mano
+CHECKPOINT_BUSY_TIMEOUT_MS = 200
+OPTIMIZE_INTERVAL = 6 * 3600
+OPTIMIZE_ANALYSIS_LIMIT = 400
+VACUUM_MIN_FREE_PAGES = 1024
+VACUUM_STEP_PAGES = 2048
+
+_AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+
+class LedgerMaintenance:
+    """
+    Scheduler di manutenzione del ledger su thread dedicato.
+    Con la UI che interroga di continuo i lettori possono affamare l'autocheckpoint e il -wal cresce
+    fino al riavvio: qui il checkpoint è esplicito, PASSIVE oltre WAL_PASSIVE_BYTES e TRUNCATE
+    quando il ledger è fermo. Nei momenti di quiete gira anche PRAGMA optimize periodico e,
+    se il file è in auto_vacuum=INCREMENTAL, il recupero a step delle pagine libere.
+    A ogni giro l'indice di dedup dei segnali viene potato oltre il TTL.
+    Tutte le operazioni passano dal lock di scrittura del Database: mai in mezzo a un batch.
+    """
+
+    def __init__(self, db, wal_path, interval=MAINTENANCE_INTERVAL, logger=None):
+        self.db = db
+        self.wal_path = wal_path
+        self.interval = interval
+        self.logger = logger or logging.getLogger("LedgerMaintenance")
+        self.checkpoints = 0
+        self.checkpoint_ms_total = 0.0
+        self.checkpoint_ms_max = 0.0
+        self.last_checkpoint = None
+        self.last_optimize = None
+        self.last_vacuum = None
+        self.vacuumed_pages = 0
+        self.pruned_fingerprints = 0
+        self.last_run = None
+        self._next_optimize = time.time() + OPTIMIZE_INTERVAL
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="LedgerMaintenance")
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Manutenzione ledger fallita: {e}")
+
+    # --- Stato ---
+
+    def wal_size(self):
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    def is_quiet(self):
+        """
+        Momento di quiete: nessuna bet in RESERVED/PRE_COMMIT e nessuna transizione in coda al writer.
+        PLACED e MANUAL_CHECK restano aperte per ore: non devono bloccare TRUNCATE, optimize e vacuum.
+        """
+        return self.db._writer._queue.empty() and not self.db.has_transient()
+
+    # --- Operazioni ---
+
+    def run_once(self, force=False):
+        """Un giro di manutenzione. force=True ignora le soglie (non la quiete per TRUNCATE/vacuum)."""
+        quiet = self.is_quiet()
+        wal = self.wal_size()
+        if quiet and (force or wal >= WAL_TRUNCATE_BYTES):
+            self.checkpoint("TRUNCATE")
+        elif force or wal >= WAL_PASSIVE_BYTES:
+            self.checkpoint("PASSIVE")
+
+        if quiet and (force or time.time() >= self._next_optimize):
+            self.optimize()
+        if quiet:
+            self.incremental_vacuum(force)
+        self.pruned_fingerprints += self.db._run_write(lambda conn: prune_fingerprints(conn, self.db.dedup_ttl))
+        self.last_run = time.time()
+
+    def checkpoint(self, mode="PASSIVE"):
+        wal_before = self.wal_size()
+        started = time.perf_counter()
+        with self.db._write_lock:
+            with self.db._lock:
+                conn = self.db.conn
+                conn.execute(f"PRAGMA busy_timeout = {CHECKPOINT_BUSY_TIMEOUT_MS}")
+                try:
+                    busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+                finally:
+                    conn.execute("PRAGMA busy_timeout = 30000")
+        elapsed = (time.perf_counter() - started) * 1000
+        self.checkpoints += 1
+        self.checkpoint_ms_total += elapsed
+        self.checkpoint_ms_max = max(self.checkpoint_ms_max, elapsed)
+        self.last_checkpoint = {
+            "mode": mode, "at": time.time(), "ms": round(elapsed, 2), "busy": bool(busy),
+            "wal_frames": log, "checkpointed": done, "wal_before": wal_before, "wal_after": self.wal_size(),
+        }
+        if busy or (log > 0 and done < log):
+            self.logger.info(f"🧹 Checkpoint {mode} parziale ({done}/{log} frame): lettori attivi sul WAL.")
+        return self.last_checkpoint
+
+    def optimize(self):
+        started = time.perf_counter()
+        with self.db._write_lock:
+            with self.db._lock:
+                self.db.conn.execute(f"PRAGMA analysis_limit = {OPTIMIZE_ANALYSIS_LIMIT}")
+                self.db.conn.execute("PRAGMA optimize")
+        self.last_optimize = {"at": time.time(), "ms": round((time.perf_counter() - started) * 1000, 2)}
+        self._next_optimize = time.time() + OPTIMIZE_INTERVAL
+
+    def _page_stats(self, conn):
+        return {
+            "auto_vacuum": _AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0], "?"),
+            "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+            "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        }
+
+    def incremental_vacuum(self, force=False):
+        """Recupera al più VACUUM_STEP_PAGES pagine libere. Solo su file creati in auto_vacuum=INCREMENTAL."""
+        with self.db._write_lock:
+            with self.db._lock:
+                conn = self.db.conn
+                pages = self._page_stats(conn)
+                if pages["auto_vacuum"] != "INCREMENTAL": return 0
+                if not force and pages["freelist_count"] < VACUUM_MIN_FREE_PAGES: return 0
+                if not pages["freelist_count"]: return 0
+                # execute() farebbe un solo sqlite3_step, cioè una pagina: executescript esegue fino in fondo
+                conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+                freed = pages["freelist_count"] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        self.vacuumed_pages += freed
+        self.last_vacuum = {"at": time.time(), "pages": freed}
+        return freed
+
+    def stats(self):
+        with self.db._lock:
+            pages = self._page_stats(self.db.conn)
+        return {
+            "wal_bytes": self.wal_size(),
+            "checkpoints": self.checkpoints,
+            "checkpoint_ms_avg": round(self.checkpoint_ms_total / self.checkpoints, 2) if self.checkpoints else 0.0,
+            "checkpoint_ms_max": round(self.checkpoint_ms_max, 2),
+            "last_checkpoint": self.last_checkpoint,
+            "last_optimize": self.last_optimize,
+            "last_vacuum": self.last_vacuum,
+            "vacuumed_pages": self.vacuumed_pages,
+            "pruned_fingerprints": self.pruned_fingerprints,
+            "last_run": self.last_run,
+            **pages,
+        }
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
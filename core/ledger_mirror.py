@@ -0,0 +1,97 @@
+import threading
+from collections import defaultdict
+
+
+class LedgerMirror:
+    """
+    Specchio in-memory write-through del ledger.
+    Viene aggiornato dal LedgerWriter nella stessa sezione critica del COMMIT, quindi riflette
+    solo stato durevole. Tutte le letture sono O(1), senza SQL e senza il lock del Database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balance = 0.0
+        self._peak = 0.0
+        self._exposure = 0.0
+        self._inflight = {}  # tx_id -> (amount, table_id, robot)
+        self._by_table = defaultdict(float)
+        self._by_robot = defaultdict(float)
+
+    def rebuild(self, balance, inflight_rows):
+        """Ricostruisce lo specchio da SQLite (avvio o divergenza): balance=(current, peak), righe (tx_id, amount, table_id, robot)."""
+        with self._lock:
+            self._balance, self._peak = float(balance[0]), float(balance[1])
+            self._inflight.clear()
+            self._by_table.clear()
+            self._by_robot.clear()
+            self._exposure = 0.0
+            for r in inflight_rows:
+                self._add_locked(r[0], float(r[1] or 0.0), r[2], r[3] or "")
+
+    # --- Scritture (solo dal thread LedgerWriter, post-COMMIT) ---
+
+    def set_balance(self, current, peak):
+        with self._lock:
+            self._balance = float(current)
+            self._peak = float(peak)
+
+    def add(self, tx_id, amount, table_id=1, robot=""):
+        with self._lock:
+            self._add_locked(tx_id, float(amount), table_id, robot)
+
+    def remove(self, tx_id):
+        with self._lock:
+            entry = self._inflight.pop(tx_id, None)
+            if entry is None: return
+            amount, table_id, robot = entry
+            self._exposure -= amount
+            self._by_table[table_id] -= amount
+            self._by_robot[robot] -= amount
+            if self._by_table[table_id] <= 1e-9: del self._by_table[table_id]
+            if self._by_robot[robot] <= 1e-9: del self._by_robot[robot]
+            # Azzera la deriva floating point quando non c'è nulla in volo
+            if not self._inflight: self._exposure = 0.0
+
+    def _add_locked(self, tx_id, amount, table_id, robot):
+        if tx_id in self._inflight: return
+        self._inflight[tx_id] = (amount, table_id, robot)
+        self._exposure += amount
+        self._by_table[table_id] += amount
+        self._by_robot[robot] += amount
+
+    # --- Letture O(1) ---
+
+    def get_balance(self):
+        with self._lock:
+            return self._balance, self._peak
+
+    def has_tx(self, tx_id):
+        return tx_id in self._inflight
+
+    def total_exposure(self):
+        with self._lock:
+            return max(self._exposure, 0.0)
+
+    def table_exposure(self, table_id):
+        with self._lock:
+            return self._by_table.get(table_id, 0.0)
+
+    def robot_exposure(self, robot):
+        with self._lock:
+            return self._by_robot.get(robot, 0.0)
+
+    @property
+    def pending_count(self):
+        return len(self._inflight)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "balance": self._balance,
+                "peak": self._peak,
+                "exposure": max(self._exposure, 0.0),
+                "pending": len(self._inflight),
+                "by_table": dict(self._by_table),
+                "by_robot": dict(self._by_robot),
+            }
@@ -1,6 +1,8 @@
 import threading
 import math
 import logging
+from core.database import DEFAULT_ACCOUNT
+from core.signal_dedup import DuplicateSignalError
 
 class MoneyManager:
     def __init__(self, db, logger=None):
@@ -9,7 +11,7 @@ class MoneyManager:
         self._lock = threading.RLock()
         self.max_exposure = 200.0
 
-    def get_stake_and_reserve(self, tx_id, requested_stake, odds, table_id=1, teams=""):
+    def get_stake_and_reserve(self, tx_id, requested_stake, odds, table_id=1, teams="", robot="", account=DEFAULT_ACCOUNT, match_hash=""):
         with self._lock:
             try:
                 odds = float(odds)
@@ -19,26 +21,29 @@ class MoneyManager:
                 stake = float(requested_stake)
                 if stake <= 0: return 0.0
 
-                pending = self.db.pending()
-                if any(p["tx_id"] == tx_id for p in pending):
+                # ⚡ Letture O(1) dagli specchi in-memory del ledger: nessuna query né lock del Database
+                if self.db.has_inflight(tx_id):
                     return 0.0
 
-                # 🛡️ FIX ARCHITETTURALE: Controllo deterministico sul bankroll reale
-                current_balance, _ = self.db.get_balance()
+                # 🛡️ FIX ARCHITETTURALE: Controllo deterministico sul bankroll reale del conto
+                current_balance, _ = self.db.get_balance(account)
                 
                 if stake > current_balance:
-                    self.logger.warning(f"Stake {stake}€ rifiutato: supera il saldo disponibile ({current_balance}€).")
+                    self.logger.warning(f"Stake {stake}€ rifiutato: supera il saldo disponibile del conto {account} ({current_balance}€).")
                     return 0.0
 
-                # L'esposizione logica viene calcolata solo se ci sono i fondi reali
-                current_exposure = sum(float(p["amount"]) for p in pending if p["amount"])
+                # L'esposizione logica è globale (somma di tutti i conti) e viene calcolata solo se ci sono i fondi reali
+                current_exposure = self.db.total_exposure()
                 if current_exposure + stake > self.max_exposure:
                     self.logger.warning(f"Stake {stake}€ rifiutato: supera la max_exposure ({self.max_exposure}€).")
                     return 0.0
 
                 # Esecuzione atomica garantita
-                self.db.reserve(tx_id, stake, table_id, teams)
+                self.db.reserve(tx_id, stake, table_id, teams, match_hash=match_hash, robot=robot, account=account)
                 return stake
+            except DuplicateSignalError as e:
+                self.logger.warning(f"Stake rifiutato: {e}")
+                return 0.0
             except Exception as e:
                 self.logger.error(f"Errore critico durante reserve: {e}")
                 return 0.0
@@ -48,6 +53,45 @@ class MoneyManager:
             try: self.db.resolve_panics()
             except Exception as e: self.logger.error(f"Errore riconciliazione: {e}")
 
+    def reconcile_settled(self, settled_bets):
+        """
+        Riconciliazione bulk della lista di bet chiuse letta dal bookmaker.
+        Ogni voce: {"tx_id", "status": WIN/LOSS/VOID, "payout"}. Le voci non PLACED nel ledger
+        vengono scartate con warning; le altre sono chiuse in un'unica transazione (settle_many).
+        SETTLED è terminale: si chiude solo su WIN (con payout obbligatorio), LOSS o VOID. Ogni altro
+        stato (PENDING, OPEN, refusi) resta PLACED e viene loggato.
+        """
+        with self._lock:
+            try:
+                placed = {p["tx_id"]: float(p["amount"]) for p in self.db.get_unsettled_placed()}
+                batch = []
+                for bet in settled_bets or []:
+                    tx_id = bet.get("tx_id")
+                    if tx_id not in placed:
+                        self.logger.warning(f"Settlement ignorato: TX {tx_id} non risulta PLACED nel ledger.")
+                        continue
+                    status = str(bet.get("status", "")).strip().upper()
+                    if status == "LOSS": payout = 0.0
+                    elif status == "VOID": payout = placed[tx_id]
+                    elif status == "WIN":
+                        try: payout = float(bet["payout"])
+                        except (KeyError, TypeError, ValueError): payout = None
+                        if payout is None or math.isnan(payout) or math.isinf(payout) or payout < 0:
+                            self.logger.warning(f"Settlement ignorato: TX {tx_id} WIN senza payout valido ({bet.get('payout')!r}).")
+                            continue
+                    else:
+                        self.logger.warning(f"Settlement ignorato: TX {tx_id} con stato non terminale {status or '∅'}.")
+                        continue
+                    batch.append((tx_id, payout))
+                    del placed[tx_id]
+
+                settled = self.db.settle_many(batch) if batch else 0
+                if settled: self.logger.info(f"Settlement bulk completato: {settled} bet chiuse.")
+                return settled
+            except Exception as e:
+                self.logger.error(f"Errore settlement bulk: {e}")
+                return 0
+
     # 🛡️ Backward Compatibility per ULTRA_SYSTEM_TEST e Execution Engine
     def refund(self, tx_id: str):
         """
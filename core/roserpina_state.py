@@ -0,0 +1,50 @@
+from types import MappingProxyType
+
+ROSERPINA_FIELDS = ("loss", "in_recovery", "current_stake", "status")
+
+
+class TableState:
+    """Record immutabile di un tavolo Roserpina: ogni modifica produce un nuovo record (copy-on-write)."""
+    __slots__ = ("table_id", "loss", "in_recovery", "current_stake", "status")
+
+    def __init__(self, table_id, loss=0.0, in_recovery=0, current_stake=0.0, status="IDLE"):
+        self.table_id = int(table_id)
+        self.loss = float(loss or 0.0)
+        self.in_recovery = int(in_recovery or 0)
+        self.current_stake = float(current_stake or 0.0)
+        self.status = status or "IDLE"
+
+    def replace(self, **changes):
+        values = {f: getattr(self, f) for f in ROSERPINA_FIELDS}
+        values.update(changes)
+        return TableState(self.table_id, **values)
+
+    def as_dict(self):
+        return {"table_id": self.table_id, **{f: getattr(self, f) for f in ROSERPINA_FIELDS}}
+
+    def __repr__(self):
+        return f"TableState({self.as_dict()})"
+
+
+class RoserpinaStore:
+    """
+    Stato Roserpina in memoria, pubblicato ai lettori senza lock.
+    La mappa table_id -> TableState è immutabile: load() ne pubblica una copia nuova con uno swap
+    di riferimento, quindi snapshot()/get() non prendono mai lock (né del Database né dello store)
+    e non eseguono query.
+    """
+
+    def __init__(self):
+        self._snapshot = MappingProxyType({})
+
+    def load(self, rows):
+        """(Ri)carica lo stato da righe roserpina_tables (avvio o divergenza)."""
+        self._snapshot = MappingProxyType({r["table_id"]: TableState(**dict(r)) for r in rows})
+
+    # --- Letture lock-free ---
+
+    def snapshot(self):
+        return self._snapshot
+
+    def get(self, table_id):
+        return self._snapshot.get(int(table_id)) or TableState(table_id)
@@ -1,11 +1,269 @@
 import os
-import zipfile
 import time
+import shutil
+import sqlite3
+import hashlib
+import concurrent.futures
 import logging
 import threading
 import json
 from pathlib import Path
 from core.security import SecurityModule
+from core.intent_log import IntentLog
+
+# Backup online: pagine copiate per step e pausa tra gli step (il writer del ledger non resta mai fermo a lungo)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.002
+BACKUP_KEEP = 48
+SQLITE_SUFFIXES = (".sqlite", ".db")
+SKIP_SUFFIXES = (".bak", "-wal", "-shm", "-journal", ".tmp", ".next")
+SKIP_FILES = (".master.key", ".device.salt")
+# Segmenti mmap a dimensione fissa: size e mtime non seguono le scritture, si rileggono sempre dopo un msync
+REHASH_FILES = ("intent.log",)
+# Stato transitorio rigenerato a runtime: journal/spill del bus e dump di telemetria non vanno nei backup
+SKIP_DIRS = ("event_journal", "bus_spill", "telemetry")
+# Archivi mensili del journal: chiusi, vanno nello store content-addressed una volta sola
+ARCHIVE_SUBDIR = "archive"
+
+
+class FileChangedError(Exception):
+    """Il file è stato modificato durante la copia nello store."""
+
+
+class BackupEngine:
+    """
+    Backup online e incrementale di .superagent_data, eseguito su un thread dedicato.
+
+    - File SQLite: copiati con l'online backup API a step di BACKUP_PAGES_PER_STEP pagine.
+      Sui database WAL la connessione sorgente tiene aperta una transazione di lettura:
+      lo snapshot è consistente, non ricomincia a ogni scrittura e non blocca il writer.
+    - Altri file: store content-addressed (objects/<sha[:2]>/<sha256>), hash riusato se size/mtime
+      non cambiano rispetto al manifest precedente. Ogni snapshot scrive solo ciò che è cambiato.
+    - Archivi mensili chiusi (archive/journal_*.sqlite): nello store come i file normali, quindi salvati
+      una volta sola. Un archivio in scrittura (-journal accanto o modificato durante la copia) passa
+      dalla backup API come gli altri SQLite.
+    - intent.log: msync del segmento aperto e poi store content-addressed, rihashato a ogni snapshot.
+      Contiene i POST_CLICK non risolti che resolve_panics deve ritrovare dopo un restore
+      (un record strappato a metà copia si scarta al replay, come dopo un crash).
+    - Esclusi: event_journal, bus_spill e telemetry (stato del bus rigenerato a runtime).
+
+    Layout: backups/snapshot_<ms>/ con le copie SQLite + manifest.json (scritto per ultimo, rename atomico).
+    """
+
+    def __init__(self, data_dir, backup_dir, logger=None, keep=BACKUP_KEEP):
+        self.data_dir = os.path.abspath(data_dir)
+        self.backup_dir = os.path.abspath(backup_dir)
+        self.objects_dir = os.path.join(self.backup_dir, "objects")
+        self.logger = logger or logging.getLogger("BackupEngine")
+        self.keep = keep
+        self.last_stats = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="LedgerBackup")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def submit(self):
+        """Accoda uno snapshot sul thread di backup. Ritorna un Future con le statistiche."""
+        return self._executor.submit(self.run)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    # --- Inventario ---
+
+    def _scan(self):
+        sqlite_files, other_files = [], []
+        for root, dirs, files in os.walk(self.data_dir):
+            if os.path.abspath(root).startswith(self.backup_dir):
+                dirs[:] = []
+                continue
+            if os.path.abspath(root) == self.data_dir:
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for name in files:
+                if name in SKIP_FILES or name.endswith(SKIP_SUFFIXES):
+                    continue
+                rel = os.path.relpath(os.path.join(root, name), self.data_dir)
+                if self._is_closed_archive(rel): other_files.append(rel)
+                else: (sqlite_files if name.endswith(SQLITE_SUFFIXES) else other_files).append(rel)
+        return sorted(sqlite_files), sorted(other_files)
+
+    def _is_closed_archive(self, rel):
+        head, name = os.path.split(rel)
+        if head != ARCHIVE_SUBDIR or not (name.startswith("journal_") and name.endswith(".sqlite")):
+            return False
+        # Archivi in rollback-journal: il -journal accanto indica una scrittura in corso
+        return not os.path.exists(os.path.join(self.data_dir, rel + "-journal"))
+
+    def snapshots(self):
+        """Snapshot completi (con manifest), dal più vecchio al più recente."""
+        out = []
+        for name in os.listdir(self.backup_dir):
+            path = os.path.join(self.backup_dir, name)
+            if name.startswith("snapshot_") and os.path.isfile(os.path.join(path, "manifest.json")):
+                out.append(path)
+        return sorted(out, key=os.path.getmtime)
+
+    def _load_manifest(self, snapshot):
+        try:
+            with open(os.path.join(snapshot, "manifest.json"), "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    # --- Copia ---
+
+    def _backup_sqlite(self, src_path, dst_path, stats):
+        src = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True, timeout=30, isolation_level=None)
+        dst = sqlite3.connect(dst_path, isolation_level=None)
+        last = [time.perf_counter()]
+
+        def progress(status, remaining, total):
+            now = time.perf_counter()
+            stats["max_step_ms"] = max(stats["max_step_ms"], (now - last[0]) * 1000)
+            stats["steps"] += 1
+            # sleep= di backup() vale solo su BUSY/LOCKED: la pausa tra step la facciamo qui
+            time.sleep(BACKUP_STEP_SLEEP)
+            last[0] = time.perf_counter()
+
+        try:
+            # In WAL la transazione di lettura fissa lo snapshot senza bloccare il writer.
+            # In rollback-journal (archivi) non la teniamo: bloccherebbe i commit per tutta la copia.
+            wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if wal:
+                src.execute("BEGIN")
+                src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+            if wal: src.execute("COMMIT")
+            page_size = dst.execute("PRAGMA page_size").fetchone()[0]
+            pages = dst.execute("PRAGMA page_count").fetchone()[0]
+            # La copia è un file standalone: niente -wal accanto
+            dst.execute("PRAGMA journal_mode=DELETE")
+            stats["pages"] += pages
+            stats["bytes"] += pages * page_size
+        finally:
+            dst.close()
+            src.close()
+
+    def _hash_file(self, path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _store_file(self, rel, previous, stats, stable=False):
+        src = os.path.join(self.data_dir, rel)
+        rehash = os.path.basename(rel) in REHASH_FILES
+        if rehash: IntentLog.sync(src)
+        st = os.stat(src)
+        prev = previous.get(rel)
+        if prev and not rehash and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns and os.path.exists(self._object_path(prev["sha256"])):
+            stats["files_reused"] += 1
+            return prev
+
+        digest = self._hash_file(src)
+        obj = self._object_path(digest)
+        if os.path.exists(obj):
+            reused = True
+        else:
+            reused = False
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            shutil.copyfile(src, obj + ".tmp")
+        if stable:
+            # stable=True (archivi): hash e copia devono vedere lo stesso file
+            now = os.stat(src)
+            if (now.st_size, now.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+                if not reused:
+                    os.remove(obj + ".tmp")
+                    try: os.rmdir(os.path.dirname(obj))
+                    except OSError: pass  # directory condivisa con altri oggetti
+                raise FileChangedError(rel)
+        if reused:
+            stats["files_reused"] += 1
+        else:
+            os.replace(obj + ".tmp", obj)
+            stats["files_new"] += 1
+            stats["bytes"] += st.st_size
+        return {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    # --- Snapshot ---
+
+    def run(self):
+        started = time.perf_counter()
+        stats = {"bytes": 0, "pages": 0, "steps": 0, "max_step_ms": 0.0, "files_new": 0, "files_reused": 0}
+        name = f"snapshot_{int(time.time() * 1000)}"
+        final = os.path.join(self.backup_dir, name)
+        staging = final + ".tmp"
+
+        previous = self.snapshots()
+        prev_files = self._load_manifest(previous[-1]).get("files", {}) if previous else {}
+        sqlite_files, other_files = self._scan()
+
+        os.makedirs(staging, exist_ok=True)
+        try:
+            for rel in sqlite_files:
+                dst = os.path.join(staging, rel)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                self._backup_sqlite(os.path.join(self.data_dir, rel), dst, stats)
+
+            files = {}
+            for rel in other_files:
+                try:
+                    files[rel] = self._store_file(rel, prev_files, stats, stable=rel.endswith(SQLITE_SUFFIXES))
+                except FileNotFoundError:
+                    continue  # rimosso durante lo snapshot
+                except FileChangedError:
+                    # Archivio riaperto dall'archiver durante la copia: snapshot consistente via backup API
+                    dst = os.path.join(staging, rel)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    self._backup_sqlite(os.path.join(self.data_dir, rel), dst, stats)
+                    sqlite_files.append(rel)
+
+            stats["duration_s"] = round(time.perf_counter() - started, 3)
+            stats["mb_per_s"] = round(stats["bytes"] / 1048576 / max(stats["duration_s"], 1e-6), 2)
+            stats["max_step_ms"] = round(stats["max_step_ms"], 2)
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump({"created": time.time(), "sqlite": sqlite_files, "files": files, "stats": stats}, f)
+            os.replace(staging, final)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        stats["snapshot"] = final
+        self.last_stats = stats
+        self.logger.info(
+            f"✅ Snapshot {name}: {stats['bytes'] / 1048576:.1f} MB in {stats['duration_s']}s "
+            f"({stats['mb_per_s']} MB/s, step max {stats['max_step_ms']} ms, "
+            f"file nuovi {stats['files_new']}, riusati {stats['files_reused']})"
+        )
+        self.rotate()
+        return stats
+
+    # --- Retention ---
+
+    def rotate(self, keep=None):
+        """Tiene gli ultimi `keep` snapshot (directory e zip legacy), poi rimuove gli oggetti non più referenziati."""
+        keep = self.keep if keep is None else keep
+        for name in os.listdir(self.backup_dir):
+            if name.startswith("snapshot_") and name.endswith(".tmp"):
+                shutil.rmtree(os.path.join(self.backup_dir, name), ignore_errors=True)
+
+        legacy = [os.path.join(self.backup_dir, f) for f in os.listdir(self.backup_dir) if f.endswith(".zip")]
+        backups = sorted(self.snapshots() + legacy, key=os.path.getmtime)
+        while len(backups) > keep:
+            victim = backups.pop(0)
+            if os.path.isdir(victim): shutil.rmtree(victim, ignore_errors=True)
+            else: os.remove(victim)
+
+        live = set()
+        for snap in self.snapshots():
+            live.update(entry["sha256"] for entry in self._load_manifest(snap).get("files", {}).values())
+        for root, _, files in os.walk(self.objects_dir):
+            for digest in files:
+                if digest not in live:
+                    os.remove(os.path.join(root, digest))
+
 
 class SecureStorage:
     def __init__(self, logger=None):
@@ -14,39 +272,30 @@ class SecureStorage:
         self.backup_dir = os.path.join(self.data_dir, "backups")
         self._io_lock = threading.RLock()
         os.makedirs(self.backup_dir, exist_ok=True)
+        self.backups = BackupEngine(self.data_dir, self.backup_dir, self.logger)
 
-    def create_snapshot(self):
-        with self._io_lock:
-            try:
-                zip_name = os.path.join(self.backup_dir, f"snapshot_{int(time.time())}.zip")
-                backup_dir_abs = os.path.abspath(self.backup_dir)
-                
-                with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(self.data_dir):
-                        if os.path.abspath(root).startswith(backup_dir_abs): 
-                            continue
-                        for file in files:
-                            if file in [".master.key", ".device.salt"] or file.endswith(".bak"): 
-                                continue
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, self.data_dir)
-                            zipf.write(file_path, arcname)
-                            
-                self.logger.info(f"✅ Snapshot di sicurezza creato: {zip_name}")
-                self._rotate_backups()
-                return True
-            except Exception as e:
-                self.logger.error(f"❌ Errore snapshot: {e}")
-                return False
+    def create_snapshot(self, wait=True):
+        """
+        Snapshot online sul thread di backup (vedi BackupEngine).
+        wait=True: attende e ritorna True/False come prima. wait=False: ritorna subito il Future.
+        """
+        future = self.backups.submit()
+        if not wait:
+            return future
+        try:
+            future.result()
+            return True
+        except Exception as e:
+            self.logger.error(f"❌ Errore snapshot: {e}")
+            return False
+
+    @property
+    def last_backup_stats(self):
+        return dict(self.backups.last_stats)
 
-    def _rotate_backups(self, keep=48):
+    def _rotate_backups(self, keep=BACKUP_KEEP):
         try:
-            backups = sorted(
-                [os.path.join(self.backup_dir, f) for f in os.listdir(self.backup_dir) if f.endswith('.zip')],
-                key=os.path.getmtime
-            )
-            while len(backups) > keep: 
-                os.remove(backups.pop(0))
+            self.backups.rotate(keep)
         except Exception as e:
             self.logger.warning(f"Errore rotazione backup: {e}")
 
@@ -0,0 +1,50 @@
+import re
+import time
+import hashlib
+import unicodedata
+
+# Finestra di dedup: lo stesso tip ripostato entro il TTL è lo stesso segnale; dopo, la riga viene
+# potata e il fingerprint torna giocabile. Il fingerprint non contiene il tempo: niente bordi di bucket
+DEDUP_TTL_SECONDS = 6 * 3600
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_TEAM_SEPARATORS = {"vs", "v", "x"}
+
+
+class DuplicateSignalError(ValueError):
+    """Segnale già giocato: il fingerprint è presente nell'indice di dedup (entro il TTL)."""
+
+
+def _canonical(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def signal_fingerprint(teams, market=""):
+    """
+    Fingerprint canonico di un segnale: token delle squadre (normalizzati e ordinati) e mercato.
+    "Inter - Milan", "Inter-Milan" e "MILAN vs Inter" producono lo stesso hash; la finestra è il TTL del dedup.
+    """
+    tokens = sorted(set(_canonical(teams).split()) - _TEAM_SEPARATORS)
+    raw = f"{' '.join(tokens)}#{_canonical(market)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def claim_fingerprint(conn, fingerprint, tx_id, ttl=DEDUP_TTL_SECONDS, now=None):
+    """
+    Insert-or-reject sull'indice unico, da chiamare dentro la transazione di reserve (O(log n)).
+    Un fingerprint scaduto ma non ancora potato viene sostituito.
+    """
+    now = int(time.time() if now is None else now)
+    conn.execute("DELETE FROM signal_dedup WHERE fingerprint = ? AND created_at < ?", (fingerprint, now - int(ttl)))
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO signal_dedup (fingerprint, tx_id, created_at) VALUES (?, ?, ?)", (fingerprint, tx_id, now)
+    )
+    if cur.rowcount == 0:
+        owner = conn.execute("SELECT tx_id FROM signal_dedup WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        raise DuplicateSignalError(f"Segnale duplicato {fingerprint}: già giocato da TX {owner[0] if owner else '?'}.")
+
+
+def prune_fingerprints(conn, ttl=DEDUP_TTL_SECONDS, now=None):
+    now = int(time.time() if now is None else now)
+    return conn.execute("DELETE FROM signal_dedup WHERE created_at < ?", (now - int(ttl),)).rowcount
@@ -4,6 +4,11 @@ import sys
 import os
 import datetime
 
+# 🔁 Il bus dell'app è leggibile in shared memory: oltre il crash si rileva anche il blocco
+HANG_TIMEOUT = 90          # secondi senza HEARTBEAT sul ring (dopo il primo) = app bloccata
+POLL_INTERVAL = 1.0
+ALERT_TOPICS = ("BET_FAILED", "BET_UNKNOWN", "BET_ERROR")
+
 def log_event(msg):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] 👁️ WATCHDOG: {msg}")
@@ -12,6 +17,43 @@ def log_event(msg):
     with open("supervisor_crash.log", "a", encoding="utf-8") as f:
         f.write(f"[{timestamp}] {msg}\n")
 
+def attach_bus(launched_at):
+    """Lettore sul ring del bus della sessione corrente; None se non ancora creato (o residuo di una precedente)."""
+    try:
+        from core.event_ring import EventRing
+        ring = EventRing.attach()
+    except Exception:
+        return None
+    if ring.closed or ring.created < launched_at - 1:
+        ring.close()
+        return None
+    return ring.reader(start="oldest")
+
+def watch(process, launched_at):
+    """Attende la fine del processo seguendo il bus: HEARTBEAT fermo da HANG_TIMEOUT = kill (gestito come crash)."""
+    reader, last_beat = None, None
+    while process.poll() is None:
+        time.sleep(POLL_INTERVAL)
+        if reader is None:
+            reader = attach_bus(launched_at)
+            if reader is None: continue
+        for event in reader.poll():
+            if event.topic == "HEARTBEAT":
+                last_beat = time.monotonic()
+            elif event.topic in ALERT_TOPICS:
+                log_event(f"⚠️ {event.topic} dal bus: {event.data}")
+        # Ring chiuso dal bus: l'app è in spegnimento, niente più battiti da attendere
+        if reader.ring.closed: last_beat = None
+        if last_beat is not None and time.monotonic() - last_beat > HANG_TIMEOUT:
+            log_event(f"🧊 Nessun HEARTBEAT sul bus da {HANG_TIMEOUT}s: applicazione bloccata, terminazione forzata.")
+            process.kill()
+            process.wait()
+            break
+    if reader is not None:
+        if reader.lost: log_event(f"Eventi del bus persi dal supervisor (ring superato): {reader.lost}")
+        reader.ring.close()
+    return process.returncode
+
 def run_watchdog():
     log_event("Avvio Supervisor di sistema.")
     
@@ -37,12 +79,11 @@ def run_watchdog():
         log_event("Lancio applicazione SuperAgent Core...")
         
         # Lancia l'EXE (o il PY) e resta in ascolto
+        launched_at = time.time()
         process = subprocess.Popen(target_cmd)
         
-        # Il supervisor si blocca qui e aspetta che il bot muoia
-        process.wait()
-        
-        exit_code = process.returncode
+        # Il supervisor resta qui finché il bot muore (o si blocca e viene terminato)
+        exit_code = watch(process, launched_at)
         log_event(f"SuperAgent terminato. Codice di uscita: {exit_code}")
         
         if exit_code == 0:
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# I moduli core calcolano i percorsi di ~/.superagent_data all'import: HOME va isolata prima di importarli
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+os.environ["HOME"] = tempfile.mkdtemp(prefix="superagent_tests_")
+# LedgerGuard: in test il kill switch solleva l'eccezione invece di os._exit(1)
+os.environ["ALLOW_DB_EXCEPTION"] = "1"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Ledger fresco in una .superagent_data privata del test (bankroll iniziale 1000)."""
+    from core import database
+    root = database.DB_DIR
+    data_dir = str(tmp_path / ".superagent_data")
+    os.makedirs(data_dir)
+    for name, value in list(vars(database).items()):
+        if name.isupper() and isinstance(value, str) and value.startswith(root):
+            monkeypatch.setattr(database, name, data_dir + value[len(root):])
+    ledger = database.Database(database.DB_PATH)
+    yield ledger
+    ledger.close()
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from core import database
+
+
+def test_accounts_are_separate_shards(db):
+    db.update_bankroll(300.0, 300.0, account="exchange")
+    db.reserve("main-1", 100.0)
+    db.reserve("ex-1", 50.0, account="exchange")
+
+    assert os.path.isfile(os.path.join(database.ACCOUNTS_DIR, "exchange.sqlite"))
+    assert db.accounts() == ["default", "exchange"]
+    assert db.get_balance()[0] == pytest.approx(900.0)
+    assert db.get_balance("exchange")[0] == pytest.approx(250.0)
+    assert db.total_exposure() == pytest.approx(150.0)
+
+    # Transizioni instradate allo shard che possiede la tx
+    db.mark_pre_commit("ex-1")
+    db.mark_placed("ex-1")
+    db.commit("ex-1", 80.0)
+    assert db.get_balance("exchange")[0] == pytest.approx(330.0)
+    assert db.ledger("exchange").conn.execute("SELECT status FROM journal WHERE tx_id = 'ex-1'").fetchone()[0] == "SETTLED"
+    assert db.conn.execute("SELECT COUNT(*) FROM journal WHERE tx_id = 'ex-1'").fetchone()[0] == 0
+
+    snap = db.accounts_snapshot()
+    assert snap["total"]["balance"] == pytest.approx(1230.0)
+    assert snap["total"]["pending"] == 1
+
+
+def test_new_account_starts_unfunded_and_tx_ids_stay_unique(db):
+    with pytest.raises(ValueError, match="Fondi insufficienti"):
+        db.reserve("ex-1", 1.0, account="empty")
+    db.reserve("tx-1", 5.0)
+    with pytest.raises(ValueError):
+        db.reserve("tx-1", 5.0, account="empty")
+    with pytest.raises(ValueError):
+        db.ledger("../escape")
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+import pytest
+
+from core.async_event_bus import AsyncEventBus
+from core.event_bus import EventBusV6
+
+LOGGER = logging.getLogger("test_async_event_bus")
+
+
+def test_emit_and_wait_collects_results_of_sync_and_async_listeners():
+    async def main():
+        bus = AsyncEventBus(LOGGER)
+
+        async def double(d):
+            await asyncio.sleep(0.01)
+            return d * 2
+
+        bus.subscribe("Q", double)
+        bus.subscribe("Q", lambda d: d + 1)
+        bus.subscribe("E", lambda d: 1 / 0)
+        assert await bus.emit_and_wait("Q", 20) == [40, 21]
+        with pytest.raises(ZeroDivisionError):
+            await bus.emit_and_wait("E", 0)
+        assert isinstance((await bus.emit_and_wait("E", 0, return_exceptions=True))[0], ZeroDivisionError)
+        assert bus.errors["E"] == 2 and bus.dispatched["Q"] == 1
+        assert await bus.emit_and_wait("nobody", 0) == []
+
+    asyncio.run(main())
+
+
+def test_concurrency_one_delivers_in_order():
+    async def main():
+        bus = AsyncEventBus(LOGGER)
+        bus.set_concurrency("O", 1)
+        got = []
+
+        async def listener(d):
+            # Attese decrescenti: senza il semaforo a 1 l'ordine si invertirebbe
+            await asyncio.sleep((10 - d) * 0.002)
+            got.append(d)
+
+        bus.subscribe("O", listener)
+        for i in range(10): bus.emit("O", i)
+        await bus.wait_idle()
+        assert got == list(range(10))
+
+    asyncio.run(main())
+
+
+def test_capacity_rejects_instead_of_queueing():
+    async def main():
+        bus = AsyncEventBus(LOGGER, capacity=5)
+        gate = asyncio.Event()
+
+        async def blocked(d): await gate.wait()
+
+        bus.subscribe("C", blocked)
+        for i in range(8): bus.emit("C", i)
+        assert bus.pending_count == 5 and bus.rejected["C"] == 3
+        gate.set()
+        await bus.wait_idle()
+        assert bus.pending_count == 0
+
+    asyncio.run(main())
+
+
+def test_bridge_forwards_sync_bus_topics_to_the_loop():
+    sync_bus = EventBusV6(LOGGER)
+    try:
+        async def main():
+            bus = AsyncEventBus(LOGGER)
+            with pytest.raises(RuntimeError):
+                bus.bridge(sync_bus, "S")
+            loop = bus.bind()
+            done = asyncio.Event()
+            got = []
+
+            async def listener(d):
+                assert asyncio.get_running_loop() is loop
+                got.append(d)
+                if len(got) == 50: done.set()
+
+            bus.set_concurrency("S", 1)
+            bus.subscribe("S", listener)
+            bus.bridge(sync_bus, "S")
+            for i in range(50): sync_bus.emit("S", i)
+            await asyncio.wait_for(done.wait(), 5)
+            await bus.wait_idle()
+            assert got == list(range(50))
+
+        asyncio.run(main())
+    finally:
+        sync_bus.stop()
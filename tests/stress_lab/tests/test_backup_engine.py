@@ -0,0 +1,48 @@
+import json
+import os
+import sqlite3
+
+from core import database
+from core.intent_log import IntentLog, POST_CLICK
+from core.secure_storage import BackupEngine
+
+
+def _manifest(snapshot):
+    with open(os.path.join(snapshot, "manifest.json")) as f:
+        return json.load(f)
+
+
+def test_snapshot_copies_ledger_and_intent_log(db, tmp_path):
+    db.reserve("tx-1", 10.0)
+    db.log_post_click("tx-1")
+    os.makedirs(os.path.join(database.DB_DIR, "event_journal"))
+    with open(os.path.join(database.DB_DIR, "event_journal", "seg_0.log"), "wb") as f: f.write(b"x")
+
+    engine = BackupEngine(database.DB_DIR, str(tmp_path / "backups"))
+    try:
+        first = engine.run()
+        manifest = _manifest(first["snapshot"])
+        assert "money_db.sqlite" in manifest["sqlite"]
+        assert "intent.log" in manifest["files"]
+        assert not any(rel.startswith("event_journal") for rel in manifest["files"])
+
+        # Copia SQLite consistente e intent log ripristinabile
+        copy = sqlite3.connect(os.path.join(first["snapshot"], "money_db.sqlite"))
+        assert copy.execute("SELECT status FROM journal WHERE tx_id = 'tx-1'").fetchone() == ("RESERVED",)
+        copy.close()
+        obj = manifest["files"]["intent.log"]
+        restored = tmp_path / "restored.log"
+        with open(engine._object_path(obj["sha256"]), "rb") as src, open(restored, "wb") as dst: dst.write(src.read())
+        log = IntentLog.open(str(restored))
+        try:
+            assert log.pending() == {"tx-1": POST_CLICK}
+        finally:
+            log.close()
+
+        # Snapshot successivo: intent.log cambiato viene riscritto, il resto è riusato
+        db.log_post_click("tx-2")
+        second = engine.run()
+        assert _manifest(second["snapshot"])["files"]["intent.log"]["sha256"] != obj["sha256"]
+        assert len(engine.snapshots()) == 2
+    finally:
+        engine.shutdown()
@@ -0,0 +1,66 @@
+import json
+import logging
+import time
+
+import pytest
+
+from core.bus_telemetry import Histogram
+from core.event_bus import EventBusV6
+
+
+@pytest.fixture
+def make_bus():
+    buses = []
+
+    def factory(**kwargs):
+        buses.append(EventBusV6(logging.getLogger("test_event_bus"), **kwargs))
+        return buses[-1]
+
+    yield factory
+    for bus in buses: bus.stop()
+
+
+def test_histogram_percentiles_are_upper_bounds():
+    h = Histogram()
+    h.add_many([1_000_000] * 99)
+    h.add(100_000_000)
+    s = h.summary()
+    assert s["count"] == 100 and s["max_ms"] == 100.0
+    # Bucket log2: 1ms cade in [0.524, 1.049) ms, il percentile ne riporta il limite superiore
+    assert s["p50_ms"] == s["p99_ms"] == 1.049
+    assert h.percentile_ms(100) == 100.0
+    assert Histogram().summary()["p99_ms"] == 0.0
+
+
+def test_snapshot_counts_topics_and_listeners(make_bus, tmp_path):
+    bus = make_bus(listener_budget=10)
+
+    def slow(d): time.sleep(0.005)
+
+    bus.subscribe("T", slow)
+    bus.subscribe("T", lambda d: None)
+    bus.subscribe("E", lambda d: 1 / 0)
+    for i in range(20): bus.emit("T", i)
+    bus.emit("E", 0)
+    assert bus.wait_idle(5)
+
+    snap = bus.telemetry_snapshot()
+    t = snap["topics"]["T"]
+    assert t["emitted"] == t["dispatched"] == 20 and t["lag"]["count"] == 20
+    assert [l["count"] for l in t["listeners"]] == [20, 20]
+    assert snap["topics"]["E"]["listeners"][0]["errors"] == 1
+    assert snap["slowest_listeners"][0]["listener"].endswith("slow")
+    assert snap["pending"] == snap["quarantined"] == snap["backlog"] == 0
+
+    path = bus.dump_telemetry(str(tmp_path / "telemetry" / "bus.json"))
+    with open(path) as f:
+        assert json.load(f)["topics"]["T"]["dispatched"] == 20
+
+
+def test_telemetry_can_be_disabled(make_bus):
+    bus = make_bus(telemetry=False)
+    bus.subscribe("T", lambda d: None)
+    for i in range(5): bus.emit("T", i)
+    assert bus.wait_idle(5)
+    t = bus.telemetry_snapshot()["topics"]["T"]
+    assert t["lag"]["count"] == 0 and t["listeners"][0]["count"] == 0
@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from core.event_bus import EventBusV6
+from core.events import AppEvent
+
+
+@pytest.fixture
+def make_bus():
+    buses = []
+
+    def factory(**kwargs):
+        buses.append(EventBusV6(logging.getLogger("test_event_bus"), **kwargs))
+        return buses[-1]
+
+    yield factory
+    for bus in buses: bus.stop()
+
+
+def _wait_taken(bus):
+    deadline = time.monotonic() + 5
+    while bus.pending_count and time.monotonic() < deadline: time.sleep(0.01)
+
+
+def test_busy_listener_sees_only_latest_value_per_key(make_bus):
+    bus = make_bus(listener_budget=10)
+    bus.set_coalescing("B", key="account")
+    gate = threading.Event()
+    got = []
+    bus.subscribe("B", lambda d: (gate.wait(10), got.append((d["account"], d["balance"]))))
+
+    bus.emit("B", {"account": "main", "balance": 0})
+    _wait_taken(bus)
+    for i in range(1, 50):
+        bus.emit("B", {"account": "main", "balance": i})
+        bus.emit("B", {"account": "exchange", "balance": -i})
+    assert bus.coalescing_stats()["B"] == {"merged": 96, "queued_keys": 2}
+    gate.set()
+    assert bus.wait_idle(5)
+    # Il valore già in consegna resta, poi solo l'ultimo per chiave, nell'ordine di prima comparsa
+    assert got == [("main", 0), ("main", 49), ("exchange", -49)]
+    assert bus.merged["B"] == 96 and bus.pending_count == 0
+
+
+def test_topic_without_key_keeps_a_single_latest_value(make_bus):
+    bus = make_bus(listener_budget=10)
+    bus.set_coalescing(AppEvent.STATE_CHANGE)
+    gate = threading.Event()
+    got = []
+    bus.subscribe(AppEvent.STATE_CHANGE, lambda d: (gate.wait(10), got.append(d)))
+
+    bus.emit(AppEvent.STATE_CHANGE, "IDLE")
+    _wait_taken(bus)
+    for state in ("RUNNING", "PAUSED", "STOPPED"): bus.emit(AppEvent.STATE_CHANGE, state)
+    gate.set()
+    assert bus.wait_idle(5)
+    assert got == ["IDLE", "STOPPED"]
+
+
+def test_coalescing_cannot_be_enabled_on_a_busy_topic(make_bus):
+    bus = make_bus(listener_budget=10)
+    gate = threading.Event()
+    bus.subscribe("X", lambda d: gate.wait(10))
+    bus.emit("X", 0)
+    bus.emit("X", 1)
+    try:
+        with pytest.raises(RuntimeError):
+            bus.set_coalescing("X")
+    finally:
+        gate.set()
+    assert bus.wait_idle(5)
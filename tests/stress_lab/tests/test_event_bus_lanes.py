@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from core import event_bus
+from core.event_bus import EventBusV6
+
+
+@pytest.fixture
+def make_bus():
+    buses = []
+
+    def factory(**kwargs):
+        buses.append(EventBusV6(logging.getLogger("test_event_bus"), **kwargs))
+        return buses[-1]
+
+    yield factory
+    for bus in buses: bus.stop()
+
+
+def test_topics_keep_fifo_order_across_workers(make_bus):
+    bus = make_bus(workers=4)
+    seen = {t: [] for t in "ABCD"}
+    for t in "ABCD": bus.subscribe(t, seen[t].append)
+    for i in range(500):
+        for t in "ABCD": bus.emit(t, i)
+    assert bus.wait_idle(10)
+    assert all(seen[t] == list(range(500)) for t in "ABCD")
+
+
+def test_blocked_topic_does_not_stall_other_topics(make_bus):
+    bus = make_bus(workers=3)
+    gate, done = threading.Event(), threading.Event()
+    fast = []
+    bus.subscribe("slow", lambda d: gate.wait(10))
+    bus.subscribe("fast", lambda d: (fast.append(d), len(fast) == 100 and done.set()))
+
+    bus.emit("slow", 0)
+    for i in range(100): bus.emit("fast", i)
+    try:
+        assert done.wait(2) and fast == list(range(100))
+    finally:
+        gate.set()
+    assert bus.wait_idle(5)
+
+
+def test_listener_is_quarantined_after_repeated_overruns_and_released(make_bus):
+    bus = make_bus(listener_budget=0.02)
+    calls, fast = [], []
+
+    def sometimes_slow(d):
+        calls.append(d)
+        if d < 3: time.sleep(0.05)
+
+    bus.subscribe("Q", sometimes_slow)
+    bus.subscribe("Q", fast.append)
+
+    # Un singolo sforamento non basta
+    bus.emit("Q", 0)
+    assert bus.wait_idle(5) and bus.isolated_listeners() == {}
+    for i in (1, 2): bus.emit("Q", i)
+    assert bus.wait_idle(5) and list(bus.isolated_listeners()) == ["Q"]
+
+    # Tempi di nuovo nel budget per una finestra intera: il listener rientra
+    for i in range(3, 3 + event_bus.QUARANTINE_WINDOW + 1):
+        bus.emit("Q", i)
+        assert bus.wait_idle(5)
+    assert bus.isolated_listeners() == {}
+    assert calls == fast == list(range(3 + event_bus.QUARANTINE_WINDOW + 1))
+
+
+def test_quarantined_listener_never_holds_back_the_topic(make_bus, monkeypatch):
+    monkeypatch.setattr(event_bus, "QUARANTINE_CAPACITY", 5)
+    bus = make_bus(listener_budget=0.02)
+    gate = threading.Event()
+    fast = []
+
+    def stuck(d):
+        if d < 3: time.sleep(0.05)
+        else: gate.wait(5)
+
+    bus.subscribe("S", stuck)
+    bus.subscribe("S", fast.append)
+    for i in range(3):
+        bus.emit("S", i)
+        assert bus.wait_idle(5)
+
+    for i in range(3, 40): bus.emit("S", i)
+    deadline = time.monotonic() + 5
+    while len(fast) < 40 and time.monotonic() < deadline: time.sleep(0.01)
+    try:
+        assert fast == list(range(40)) and bus.pending_count == 0
+        # Classe NORMAL: oltre la capacità della quarantena si scarta il più vecchio
+        assert bus.overflow["S"]["quarantine_dropped"] > 0
+    finally:
+        gate.set()
+    assert bus.wait_idle(5)
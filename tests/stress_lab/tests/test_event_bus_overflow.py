@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from core import event_bus
+from core.event_bus import EventBusV6, OverflowPolicy
+from core.events import EventPriority
+
+
+@pytest.fixture
+def make_bus(tmp_path):
+    buses = []
+
+    def factory(**kwargs):
+        kwargs.setdefault("spill_dir", str(tmp_path / "bus_spill"))
+        buses.append(EventBusV6(logging.getLogger("test_event_bus"), **kwargs))
+        return buses[-1]
+
+    yield factory
+    for bus in buses: bus.stop()
+
+
+def test_spill_is_lossless_fifo_and_counted_in_backlog(make_bus, tmp_path):
+    bus = make_bus(workers=3, listener_budget=10,
+                   priorities={"H": EventPriority.HIGH, "C": EventPriority.CRITICAL},
+                   priority_capacity={EventPriority.HIGH: 5, EventPriority.CRITICAL: 5})
+    gate = threading.Event()
+    order = []
+    bus.subscribe("H", lambda d: (gate.wait(10), order.append(("H", d))))
+    bus.subscribe("C", lambda d: (gate.wait(10), order.append(("C", d))))
+
+    for i in range(20): bus.emit("H", i)
+    for i in range(20): bus.emit("C", i)
+    stats = bus.overflow_stats()
+    assert stats["spill_backlog"] > 0 and os.listdir(tmp_path / "bus_spill")
+    # Il load shedding misura anche l'arretrato su disco, non solo la coda in memoria
+    assert bus.backlog == bus.pending_count + stats["spill_backlog"] > bus.pending_count
+    assert stats["topics"]["C"]["policy"] == OverflowPolicy.SPILL.value
+
+    gate.set()
+    assert bus.wait_idle(10)
+    assert [d for t, d in order if t == "H"] == list(range(20))
+    assert [d for t, d in order if t == "C"] == list(range(20))
+    assert bus.backlog == 0 and sum(bus.rejected.values()) == 0
+    assert bus.overflow["C"]["replayed"] == bus.overflow["C"]["spilled"] > 0
+
+
+def test_critical_spill_is_replayed_before_high(make_bus):
+    bus = make_bus(workers=1, listener_budget=10,
+                   priorities={"H": EventPriority.HIGH, "C": EventPriority.CRITICAL, "gate": EventPriority.LOW},
+                   priority_capacity={EventPriority.HIGH: 2, EventPriority.CRITICAL: 2})
+    gate = threading.Event()
+    order = []
+    bus.subscribe("gate", lambda d: gate.wait(10))
+    bus.subscribe("H", lambda d: order.append("H"))
+    bus.subscribe("C", lambda d: order.append("C"))
+
+    # Unico worker fermo: H e C riempiono la coda della classe e finiscono su disco
+    bus.emit("gate", 0)
+    deadline = time.monotonic() + 5
+    while bus.pending_count and time.monotonic() < deadline: time.sleep(0.01)
+    for _ in range(10): bus.emit("H", 0)
+    for _ in range(10): bus.emit("C", 0)
+    gate.set()
+    assert bus.wait_idle(10)
+    assert order.count("H") == order.count("C") == 10
+    # Spill riversato classe per classe: l'ultimo CRITICAL esce prima dell'ultimo HIGH
+    assert len(order) - 1 - order[::-1].index("C") < len(order) - 1 - order[::-1].index("H")
+
+
+def test_quarantined_high_listener_spills_instead_of_dropping(make_bus, monkeypatch):
+    monkeypatch.setattr(event_bus, "QUARANTINE_CAPACITY", 5)
+    bus = make_bus(listener_budget=0.01, priorities={"Q": EventPriority.HIGH})
+    got = []
+    bus.subscribe("Q", lambda d: (time.sleep(0.02), got.append(d)))
+    for i in range(3):
+        bus.emit("Q", i)
+        assert bus.wait_idle(5)
+    assert list(bus.isolated_listeners()) == ["Q"]
+
+    for i in range(3, 60): bus.emit("Q", i)
+    assert bus.wait_idle(10)
+    assert got == list(range(60))
+    assert bus.overflow["Q"]["quarantine_spilled"] > 0 and not bus.overflow["Q"]["quarantine_dropped"]
+
+
+def test_drop_oldest_and_reject_policies(make_bus):
+    bus = make_bus(workers=3, listener_budget=10, priorities={"L": EventPriority.LOW, "N": EventPriority.NORMAL},
+                   priority_capacity={EventPriority.LOW: 3, EventPriority.NORMAL: 3})
+    gate = threading.Event()
+    low, normal = [], []
+    bus.subscribe("L", lambda d: (gate.wait(10), low.append(d)))
+    bus.subscribe("N", lambda d: (gate.wait(10), normal.append(d)))
+
+    bus.emit("L", 0)
+    bus.emit("N", 0)
+    deadline = time.monotonic() + 5
+    while bus.pending_count and time.monotonic() < deadline: time.sleep(0.01)
+    for i in range(1, 10):
+        bus.emit("L", i)
+        bus.emit("N", i)
+    gate.set()
+    assert bus.wait_idle(10)
+    assert low == [0, 7, 8, 9] and bus.overflow["L"]["dropped_oldest"] == 6
+    assert normal == [0, 1, 2, 3] and bus.rejected["N"] == 6
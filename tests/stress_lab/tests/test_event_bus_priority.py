@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from core.event_bus import EventBusV6
+from core.events import EventPriority
+
+
+@pytest.fixture
+def make_bus():
+    buses = []
+
+    def factory(**kwargs):
+        buses.append(EventBusV6(logging.getLogger("test_event_bus"), **kwargs))
+        return buses[-1]
+
+    yield factory
+    for bus in buses: bus.stop()
+
+
+def test_deadline_is_checked_per_event_inside_a_batch(make_bus):
+    bus = make_bus(listener_budget=10)
+    gate = threading.Event()
+    got = []
+
+    def listener(d):
+        if d == "block": gate.wait(5)
+        elif d == 0: time.sleep(0.6)
+        got.append(d)
+
+    bus.subscribe("D", listener)
+    bus.emit("D", "block")
+    for i in range(5): bus.emit("D", i, deadline=0.3)
+    gate.set()
+    assert bus.wait_idle(5)
+    # 1..4 erano nello stesso batch di 0, ma scadono mentre 0 è ancora in consegna
+    assert got == ["block", 0]
+    assert bus.expired["D"] == 4
+    assert bus.priority_stats()["NORMAL"]["expired"] == 4
+
+
+def test_critical_lane_is_served_while_normal_workers_are_busy(make_bus):
+    bus = make_bus(workers=2, listener_budget=10, priorities={"ledger": EventPriority.CRITICAL})
+    gate, delivered = threading.Event(), threading.Event()
+    bus.subscribe("ui", lambda d: gate.wait(10))
+    bus.subscribe("ledger", lambda d: delivered.set())
+
+    bus.emit("ui", 0)
+    try:
+        bus.emit("ledger", 0)
+        # Worker riservato ai CRITICAL: il ledger non aspetta il listener UI bloccato
+        assert delivered.wait(2)
+    finally:
+        gate.set()
+    assert bus.wait_idle(5)
+
+
+def test_class_capacity_isolates_low_priority_bursts(make_bus):
+    bus = make_bus(listener_budget=10, priorities={"noise": EventPriority.NORMAL, "ledger": EventPriority.CRITICAL},
+                   priority_capacity={EventPriority.NORMAL: 10})
+    gate = threading.Event()
+    got = []
+    bus.subscribe("noise", lambda d: gate.wait(10))
+    bus.subscribe("ledger", got.append)
+
+    bus.emit("noise", 0)
+    deadline = time.monotonic() + 5
+    while bus.pending_count and time.monotonic() < deadline: time.sleep(0.01)
+    for i in range(1, 50): bus.emit("noise", i)
+    for i in range(20): bus.emit("ledger", i)
+    gate.set()
+    assert bus.wait_idle(5)
+    assert got == list(range(20))
+    assert bus.rejected["noise"] == 39 and bus.rejected["ledger"] == 0
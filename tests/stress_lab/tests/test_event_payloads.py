@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+from core.event_bus import EventBusV6
+from core.events import AppEvent, BalanceUpdate, BetFailed, BetSuccess
+
+
+@pytest.fixture
+def bus():
+    bus = EventBusV6(logging.getLogger("test_event_payloads"))
+    yield bus
+    bus.stop()
+
+
+def test_payload_validation_and_dict_shim():
+    p = BetSuccess.coerce({"tx_id": "tx-1", "stake": 2.5})
+    assert p == BetSuccess("tx-1", "", 2.5) and BetSuccess.coerce(p) is p
+    assert p["stake"] == p.get("stake") == p[2] == 2.5 and p.get("missing", 0) == 0
+    assert "teams" in p and dict(p) == p.as_dict() == {"tx_id": "tx-1", "teams": "", "stake": 2.5}
+    tx_id, _, stake = p
+    assert (tx_id, stake) == ("tx-1", 2.5)
+    with pytest.raises(KeyError):
+        p["missing"]
+    with pytest.raises(ValueError):
+        BetFailed.coerce({"reason": "x"})
+    with pytest.raises(ValueError):
+        BalanceUpdate.coerce({"account": "main", "balance": 1.0, "bogus": 1})
+    with pytest.raises(TypeError):
+        BetSuccess.coerce("tx-1")
+
+
+def test_bus_coerces_once_and_shares_the_tuple(bus):
+    seen = []
+    bus.subscribe(AppEvent.BET_FAILED, seen.append)
+    bus.subscribe(AppEvent.BET_FAILED, seen.append)
+    bus.emit(AppEvent.BET_FAILED, {"tx_id": "a", "reason": "quota cambiata"})
+    assert bus.wait_idle(5)
+    assert seen[0] is seen[1] and seen[0] == BetFailed("a", "quota cambiata", False)
+    with pytest.raises(AttributeError):
+        seen[0].reason = "x"
+
+
+def test_invalid_payload_is_delivered_as_is_and_counted(bus):
+    seen = []
+    bus.subscribe(AppEvent.BET_SUCCESS, seen.append)
+    bus.emit(AppEvent.BET_SUCCESS, {"bogus": 1})
+    bus.emit(AppEvent.BET_SUCCESS, {"tx_id": "ok"})
+    assert bus.wait_idle(5)
+    assert seen == [{"bogus": 1}, BetSuccess("ok")]
+    assert bus.invalid[AppEvent.BET_SUCCESS.value] == 1
+    assert bus.telemetry_snapshot()["invalid_payloads"] == {AppEvent.BET_SUCCESS.value: 1}
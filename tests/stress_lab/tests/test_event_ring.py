@@ -0,0 +1,68 @@
+import logging
+import os
+import subprocess
+import sys
+import uuid
+
+import pytest
+
+from core.event_bus import EventBusV6
+from core.event_ring import EventRing
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+
+@pytest.fixture
+def ring():
+    ring = EventRing.create(f"sa_test_{uuid.uuid4().hex[:12]}", capacity=16, record_size=256)
+    yield ring
+    ring.close()
+
+
+def test_reader_sees_records_in_order_and_oversize_is_truncated(ring):
+    reader = EventRing.attach(ring.name).reader(start="latest")
+    ring.publish("A", {"i": 1})
+    ring.publish("RAW", b"\x00\x01")
+    ring.publish("BIG", {"x": "y" * 1000})
+    events = reader.poll()
+    assert [e.seq for e in events] == [1, 2, 3]
+    assert [(e.topic, e.data) for e in events[:2]] == [("A", {"i": 1}), ("RAW", b"\x00\x01")]
+    assert events[2].truncated and events[2].data is None and ring.stats()["oversize"] == 1
+    assert reader.poll() == []
+    reader.ring.close()
+
+
+def test_slow_reader_is_overrun_and_counts_lost_events(ring):
+    reader = ring.reader(start="latest")
+    for i in range(40): ring.publish("X", i)
+    # Lo scrittore non aspetta: restano solo gli ultimi `capacity` eventi
+    events = reader.poll()
+    assert reader.lost == 24 and [e.data for e in events] == list(range(24, 40))
+    assert ring.reader(start="oldest").poll(4)[0].seq == 25
+
+
+def test_bus_publishes_to_ring_read_by_another_process(ring):
+    bus = EventBusV6(logging.getLogger("test_event_ring"))
+    bus.attach_ring(ring)
+    for i in range(5): bus.emit("T", {"i": i})
+    assert bus.telemetry_snapshot()["ring"]["published"] == 5
+
+    code = (
+        "import sys\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "from core.event_ring import EventRing\n"
+        f"r = EventRing.attach({ring.name!r})\n"
+        "print([(e.topic, e.data['i']) for e in r.reader(start='oldest').poll()])\n"
+        "r.close()\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=30)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == str([("T", i) for i in range(5)])
+
+    reader = EventRing.attach(ring.name)
+    bus.stop()
+    # Lo stop del bus chiude il ring: i lettori lo vedono chiuso, il segmento è rimosso
+    assert reader.closed and bus.ring is None
+    reader.close()
+    with pytest.raises(FileNotFoundError):
+        EventRing.attach(ring.name)
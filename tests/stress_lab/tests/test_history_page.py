@@ -0,0 +1,45 @@
+import time
+
+
+def _backdate(db, tx_id, ts):
+    db._run_write(lambda conn: conn.execute("UPDATE journal SET timestamp = ? WHERE tx_id = ?", (ts, tx_id)))
+
+
+def _ids(page):
+    return [r["tx_id"] for r in page["rows"]]
+
+
+def test_keyset_pages_walk_hot_journal_and_archives(db):
+    now = int(time.time())
+    db.reserve("old", 10.0)
+    db.mark_pre_commit("old")
+    db.mark_placed("old")
+    db.commit("old", 0.0)
+    _backdate(db, "old", now - 200 * 86400)
+    assert db.archive_journal(90) == 1
+    for i in range(1, 7):
+        db.reserve(f"tx-{i}", 1.0)
+        _backdate(db, f"tx-{i}", now - 1000 + i)
+
+    first = db.history_page(limit=3)
+    assert _ids(first) == ["tx-6", "tx-5", "tx-4"] and first["prev"] is None
+    second = db.history_page(limit=3, before=first["next"])
+    assert _ids(second) == ["tx-3", "tx-2", "tx-1"]
+    # Ultima pagina servita dall'archivio mensile
+    third = db.history_page(limit=3, before=second["next"])
+    assert _ids(third) == ["old"] and third["next"] is None
+    assert _ids(db.history_page(limit=3, after=second["prev"])) == ["tx-6", "tx-5", "tx-4"]
+
+    assert _ids(db.history_page(limit=10, status="SETTLED")) == ["old"]
+
+
+def test_history_changes_returns_only_the_delta(db):
+    db.reserve("tx-1", 1.0)
+    version = db.journal_version()
+    assert db.history_changes(version)["rows"] == []
+
+    db.reserve("tx-2", 1.0)
+    db.mark_pre_commit("tx-1")
+    delta = db.history_changes(version)
+    assert sorted(r["tx_id"] for r in delta["rows"]) == ["tx-1", "tx-2"]
+    assert delta["version"] == db.journal_version() > version
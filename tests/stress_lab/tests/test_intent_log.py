@@ -0,0 +1,38 @@
+from core.intent_log import IntentLog, PRE_CLICK, POST_CLICK, RECORD_SIZE
+
+
+def test_markers_survive_reopen_and_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "intent.log")
+    log = IntentLog.open(path, size=64 * RECORD_SIZE)
+    log.append(PRE_CLICK, "a")
+    log.append(PRE_CLICK, "b")
+    log.append(POST_CLICK, "b")
+    log.append(PRE_CLICK, "c")
+    log.resolve_many(["a"])
+    # Ultimo record strappato a metà scrittura: il CRC non torna
+    log._mm[4 * RECORD_SIZE + 3] ^= 0xFF
+    log.barrier()
+    log.close()
+
+    reopened = IntentLog.open(path)
+    try:
+        assert reopened.pending() == {"a": PRE_CLICK, "b": POST_CLICK, "c": PRE_CLICK}
+        reopened.resolve_many(["a", "c"])
+        reopened.compact()
+        assert reopened.pending() == {"b": POST_CLICK}
+    finally:
+        reopened.close()
+
+
+def test_resolve_panics_replays_post_click_markers(db):
+    db.reserve("clicked", 10.0)
+    db.mark_pre_commit("clicked")
+    db.log_pre_click("clicked")
+    db.log_post_click("clicked")
+    db.reserve("not-clicked", 10.0)
+    db.log_pre_click("not-clicked")
+
+    db.resolve_panics()
+    status = dict(db.conn.execute("SELECT tx_id, status FROM journal").fetchall())
+    assert status == {"clicked": "PLACED", "not-clicked": "RESERVED"}
+    assert db.intents.pending() == {"not-clicked": PRE_CLICK}
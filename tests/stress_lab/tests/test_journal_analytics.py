@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+
+def _settle(db, tx_id, amount, payout, robot="", table_id=1):
+    db.reserve(tx_id, amount, table_id=table_id, robot=robot)
+    db.mark_pre_commit(tx_id)
+    db.mark_placed(tx_id)
+    db.commit(tx_id, payout)
+
+
+def test_summary_profit_drawdown_and_breakdowns(db):
+    # P&L: +10, -20, -10, +30 -> equity 10, -10, -20, 10
+    _settle(db, "a", 10.0, 20.0, robot="alpha", table_id=1)
+    _settle(db, "b", 20.0, 0.0, robot="alpha", table_id=2)
+    _settle(db, "c", 10.0, 0.0, robot="beta", table_id=2)
+    _settle(db, "d", 10.0, 40.0, robot="beta", table_id=1)
+
+    s = db.journal_analytics(rolling_window=2)
+    assert s["settled"] == 4
+    assert s["net_profit"] == pytest.approx(10.0)
+    assert s["roi"] == pytest.approx(0.2)
+    assert s["hit_rate"] == pytest.approx(0.5)
+    assert s["max_drawdown"] == pytest.approx(30.0)
+    assert s["start_bankroll"] == pytest.approx(1000.0)
+    assert s["rolling_roi_last"] == pytest.approx(20.0 / 20.0)
+    assert s["by_robot"]["alpha"]["net_profit"] == pytest.approx(-10.0)
+    assert s["by_table"][1]["bets"] == 2
+
+
+def test_summary_is_cached_and_refreshed_incrementally(db):
+    _settle(db, "a", 10.0, 20.0)
+    first = db.journal_analytics()
+    assert db.journal_analytics() is first
+
+    _settle(db, "b", 10.0, 0.0)
+    second = db.journal_analytics()
+    assert second["settled"] == 2 and second["high_water_mark"] > first["high_water_mark"]
@@ -0,0 +1,33 @@
+import os
+import time
+
+from core import database
+
+
+def _settle(db, tx_id, amount, payout, age_days):
+    db.reserve(tx_id, amount)
+    db.mark_pre_commit(tx_id)
+    db.mark_placed(tx_id)
+    db.commit(tx_id, payout)
+    ts = int(time.time()) - age_days * 86400
+    db._run_write(lambda conn: conn.execute("UPDATE journal SET timestamp = ? WHERE tx_id = ?", (ts, tx_id)))
+
+
+def test_old_settled_rows_move_to_monthly_archives(db):
+    _settle(db, "old", 10.0, 5.0, age_days=200)
+    _settle(db, "recent", 10.0, 0.0, age_days=1)
+    db.reserve("open", 5.0)
+
+    assert db.archive_journal(90) == 1
+    assert db.archive.months() and os.path.isdir(database.ARCHIVE_DIR)
+    with db._lock:
+        hot = {r["tx_id"] for r in db.conn.execute("SELECT tx_id FROM journal")}
+    assert hot == {"recent", "open"}
+
+    # Query unificata: file caldo + mesi archiviati attaccati on-demand
+    rows = db.query_journal("status = ?", ("SETTLED",))
+    assert [r["tx_id"] for r in rows] == ["recent", "old"]
+    assert db.query_journal("tx_id = ?", ("old",), until=int(time.time()) - 100 * 86400)[0]["payout"] == 5.0
+
+    # Run successivo idempotente
+    assert db.archive_journal(90) == 0
@@ -0,0 +1,38 @@
+import pytest
+
+
+def test_every_state_change_is_recorded(db):
+    db.reserve("tx-1", 10.0, robot="alpha", table_id=2)
+    db.mark_pre_commit("tx-1")
+    db.mark_placed("tx-1")
+    db.commit("tx-1", 0.0)
+    db.reserve("tx-2", 10.0)
+    db.rollback("tx-2")
+
+    with db._lock:
+        rows = db.conn.execute("SELECT tx_id, from_status, to_status FROM journal_transitions ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [
+        ("tx-1", None, "RESERVED"), ("tx-1", "RESERVED", "PRE_COMMIT"), ("tx-1", "PRE_COMMIT", "PLACED"),
+        ("tx-1", "PLACED", "SETTLED"), ("tx-2", None, "RESERVED"), ("tx-2", "RESERVED", "VOID"),
+    ]
+
+
+def test_rolled_back_transition_leaves_no_history(db):
+    db.reserve("tx-1", 10.0)
+    with pytest.raises(RuntimeError):
+        db._run_write(lambda conn: conn.execute("UPDATE journal SET status = 'BOGUS' WHERE tx_id = 'tx-1'"))
+    with db._lock:
+        assert db.conn.execute("SELECT COUNT(*) FROM journal_transitions").fetchone()[0] == 1
+
+
+def test_time_in_state_percentiles_per_robot(db):
+    for i in range(3):
+        db.reserve(f"tx-{i}", 1.0, robot="alpha", table_id=1)
+        db.mark_pre_commit(f"tx-{i}")
+    latency = db.transition_latency(by=("robot",))
+    reserved = [e for e in latency if e["state"] == "RESERVED"]
+    assert len(reserved) == 1
+    assert reserved[0]["robot"] == "alpha" and reserved[0]["count"] == 3
+    assert 0 <= reserved[0]["p50_ms"] <= reserved[0]["p95_ms"] <= reserved[0]["p99_ms"]
+    # PRE_COMMIT ancora aperto: nessuna permanenza conclusa
+    assert not [e for e in latency if e["state"] == "PRE_COMMIT"]
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from core import database
+from core.invariants_guard import LedgerInvariant
+
+
+def _status(db, tx_id):
+    return db.conn.execute("SELECT status FROM journal WHERE tx_id = ?", (tx_id,)).fetchone()["status"]
+
+
+def test_ledger_invariant_is_abstract():
+    with pytest.raises(TypeError):
+        LedgerInvariant()
+
+
+def test_illegal_status_rolls_back_the_batch(db):
+    db.reserve("tx-1", 10.0)
+    with pytest.raises(RuntimeError):
+        db._run_write(lambda conn: conn.execute("UPDATE journal SET status = 'BOGUS' WHERE tx_id = 'tx-1'"))
+    assert _status(db, "tx-1") == "RESERVED"
+
+
+def test_commit_checks_only_touched_rows(db):
+    # Riga illegale scritta fuori dal writer: nessun trigger TEMP la marca come toccata
+    raw = sqlite3.connect(database.DB_PATH)
+    raw.execute("INSERT INTO journal (tx_id, amount, status, timestamp) VALUES ('legacy', 1.0, 'BOGUS', 0)")
+    raw.commit()
+    raw.close()
+
+    db.reserve("tx-2", 10.0)
+    assert _status(db, "tx-2") == "RESERVED"
+
+    # La verifica full-table resta disponibile in modalità audit
+    with pytest.raises(RuntimeError):
+        db.audit_ledger()
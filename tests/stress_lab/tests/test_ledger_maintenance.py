@@ -0,0 +1,28 @@
+def test_quiet_ledger_gets_truncate_checkpoint(db):
+    for i in range(20):
+        db.reserve(f"tx-{i}", 1.0)
+        db.rollback(f"tx-{i}")
+    maintenance = db.maintenance
+    assert maintenance.is_quiet() and maintenance.wal_size() > 0
+
+    maintenance.run_once(force=True)
+    assert maintenance.last_checkpoint["mode"] == "TRUNCATE"
+    assert maintenance.last_checkpoint["checkpointed"] == maintenance.last_checkpoint["wal_frames"]
+    assert maintenance.last_checkpoint["wal_after"] == 0
+    assert maintenance.last_optimize is not None
+
+
+def test_transient_bets_downgrade_to_passive_checkpoint(db):
+    db.reserve("open", 1.0)
+    maintenance = db.maintenance
+    assert not maintenance.is_quiet()
+
+    maintenance.run_once(force=True)
+    assert maintenance.last_checkpoint["mode"] == "PASSIVE"
+    assert maintenance.last_optimize is None
+
+    # PLACED resta aperta per ore: non blocca la quiete
+    db.mark_pre_commit("open")
+    db.mark_placed("open")
+    assert maintenance.is_quiet()
+    assert db.maintenance_stats()["checkpoints"] == 1
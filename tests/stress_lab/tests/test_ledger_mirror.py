@@ -0,0 +1,35 @@
+import pytest
+
+from core.ledger_mirror import LedgerMirror
+
+
+def test_mirror_tracks_exposure_by_table_and_robot():
+    mirror = LedgerMirror()
+    mirror.rebuild((1000.0, 1000.0), [])
+    mirror.add("a", 10.0, table_id=1, robot="alpha")
+    mirror.add("b", 5.0, table_id=2, robot="alpha")
+    mirror.add("c", 2.5, table_id=2, robot="beta")
+    mirror.remove("b")
+
+    assert mirror.total_exposure() == pytest.approx(12.5)
+    assert mirror.table_exposure(2) == pytest.approx(2.5)
+    assert mirror.robot_exposure("alpha") == pytest.approx(10.0)
+    assert mirror.pending_count == 2
+    assert mirror.has_tx("a") and not mirror.has_tx("b")
+
+
+def test_mirror_follows_committed_transitions(db):
+    db.reserve("tx-1", 40.0, table_id=3)
+    db.reserve("tx-2", 10.0, table_id=3)
+    assert db.get_balance() == (pytest.approx(950.0), pytest.approx(1000.0))
+    assert db.mirror.table_exposure(3) == pytest.approx(50.0)
+
+    db.rollback("tx-2")
+    assert db.get_balance()[0] == pytest.approx(960.0)
+    assert db.mirror.total_exposure() == pytest.approx(40.0)
+
+    # Transizione fallita: lo specchio resta allineato all'ultimo COMMIT
+    with pytest.raises(ValueError):
+        db.reserve("tx-3", 5000.0)
+    assert not db.mirror.has_tx("tx-3")
+    assert db.get_balance()[0] == pytest.approx(960.0)
@@ -0,0 +1,42 @@
+import pytest
+
+
+def test_transitions_queued_behind_lock_commit_in_one_batch(db):
+    writer = db._writer
+    batches = writer.batches
+
+    def debit(amount):
+        return lambda conn: conn.execute("UPDATE balance SET current_balance = current_balance - ? WHERE id = 1", (amount,))
+
+    def broken(conn):
+        conn.execute("UPDATE balance SET current_balance = current_balance - 500 WHERE id = 1")
+        raise ValueError("transizione rifiutata")
+
+    # Writer fermo sul lock: tutte le transizioni si accumulano in coda
+    with db._write_lock:
+        futures = [writer.submit(debit(1.0)) for _ in range(40)]
+        bad = writer.submit(broken)
+        futures += [writer.submit(debit(1.0)) for _ in range(9)]
+
+    for f in futures: f.result(timeout=10)
+    with pytest.raises(ValueError):
+        bad.result(timeout=10)
+
+    # Al più il batch già raccolto più quello con il resto della coda; il SAVEPOINT isola la transizione fallita
+    assert writer.batches - batches <= 2
+    assert db.conn.execute("SELECT current_balance FROM balance WHERE id = 1").fetchone()[0] == pytest.approx(951.0)
+
+
+def test_reserve_commit_roundtrip(db):
+    db.reserve("tx-1", 25.0)
+    db.mark_pre_commit("tx-1")
+    db.mark_placed("tx-1")
+    db.commit("tx-1", 20.0)
+
+    row = db.conn.execute("SELECT status, payout FROM journal WHERE tx_id = 'tx-1'").fetchone()
+    assert (row["status"], row["payout"]) == ("SETTLED", 20.0)
+    assert db.conn.execute("SELECT current_balance FROM balance WHERE id = 1").fetchone()[0] == pytest.approx(995.0)
+
+    with pytest.raises(ValueError, match="Fondi insufficienti"):
+        db.reserve("tx-2", 5000.0)
+    assert db.conn.execute("SELECT COUNT(*) FROM journal WHERE tx_id = 'tx-2'").fetchone()[0] == 0
@@ -0,0 +1,38 @@
+import sqlite3
+import threading
+
+import pytest
+
+from core import database
+
+
+def test_exhausted_pool_hands_connection_to_waiter(db):
+    pool = database.ReaderPool(database.DB_PATH, size=1)
+    got = []
+
+    def reader():
+        with pool.connection() as conn:
+            got.append(conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0])
+
+    try:
+        with pool.connection() as held:
+            # Checkout annidato sullo stesso thread: stessa connessione, nessuna attesa
+            with pool.connection() as nested:
+                assert nested is held
+            t = threading.Thread(target=reader)
+            t.start()
+            t.join(0.2)
+            assert t.is_alive() and not got
+        t.join(5)
+        assert got == [0]
+        assert pool.stats()["waits"] == 1 and pool.stats()["open"] == 1
+    finally:
+        pool.close()
+
+
+def test_readers_see_committed_state_and_cannot_write(db):
+    db.reserve("tx-1", 10.0)
+    assert [r["tx_id"] for r in db.pending()] == ["tx-1"]
+    with db.readers.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM journal")
@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from core.roserpina_state import RoserpinaStore, TableState
+
+
+def test_store_publishes_immutable_snapshots():
+    store = RoserpinaStore()
+    store.load([{"table_id": 1, "loss": 5.0, "in_recovery": 1, "current_stake": 2.0, "status": "ACTIVE"}])
+    before = store.snapshot()
+
+    store.load([{"table_id": 1, "loss": 0.0, "in_recovery": 0, "current_stake": 0.0, "status": "IDLE"}])
+    assert before[1].loss == 5.0 and store.get(1).loss == 0.0
+    with pytest.raises(TypeError):
+        before[2] = TableState(2)
+    with pytest.raises(AttributeError):
+        before[1].extra = 1
+    assert store.get(7).as_dict() == {"table_id": 7, "loss": 0.0, "in_recovery": 0, "current_stake": 0.0, "status": "IDLE"}
+    assert before[1].replace(loss=1.0).loss == 1.0 and before[1].loss == 5.0
+
+
+def test_dashboard_read_never_waits_for_the_writer(db):
+    out = []
+    with db._write_lock, db._lock:
+        t = threading.Thread(target=lambda: out.append(db.get_roserpina_tables()))
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+    assert [r["table_id"] for r in out[0]] == list(range(1, 11))
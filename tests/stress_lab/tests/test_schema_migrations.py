@@ -0,0 +1,28 @@
+from core import database
+
+
+def _indexes(db):
+    return {r["name"] for r in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'journal'")}
+
+
+def test_fresh_ledger_is_at_latest_schema_version(db):
+    assert db.schema_version == database.SCHEMA_MIGRATIONS[-1][0]
+    assert "idx_journal_inflight" in _indexes(db)
+
+
+def test_legacy_file_is_upgraded_in_place(db):
+    # File pre-migrazioni: user_version 0 e nessun indice sul journal
+    with db._lock:
+        db.conn.execute("DROP INDEX idx_journal_inflight")
+        db.conn.execute("DROP INDEX idx_journal_timestamp")
+        db.conn.execute("PRAGMA user_version = 0")
+        db._migrate()
+    assert db.schema_version == database.SCHEMA_MIGRATIONS[-1][0]
+    assert {"idx_journal_inflight", "idx_journal_timestamp"} <= _indexes(db)
+
+
+def test_inflight_queries_use_the_partial_index(db):
+    plan = " ".join(r["detail"] for r in db.conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT * FROM journal WHERE {database._INFLIGHT_SQL} AND status = 'PLACED'"
+    ))
+    assert "idx_journal_inflight" in plan
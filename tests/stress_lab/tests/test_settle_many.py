@@ -0,0 +1,50 @@
+import pytest
+
+from core.money_management import MoneyManager
+
+
+def _place(db, tx_id, amount):
+    db.reserve(tx_id, amount)
+    db.mark_pre_commit(tx_id)
+    db.mark_placed(tx_id)
+
+
+def _status(db, tx_id):
+    return db.conn.execute("SELECT status FROM journal WHERE tx_id = ?", (tx_id,)).fetchone()["status"]
+
+
+def test_settle_many_settles_batch_in_one_transaction(db):
+    for i in range(3): _place(db, f"tx-{i}", 10.0)
+    batches = db._writer.batches
+
+    assert db.settle_many([("tx-0", 25.0), ("tx-1", 0.0), ("tx-2", 10.0)]) == 3
+    assert db._writer.batches == batches + 1
+    assert {_status(db, f"tx-{i}") for i in range(3)} == {"SETTLED"}
+    assert db.get_balance() == (pytest.approx(1005.0), pytest.approx(1005.0))
+
+
+def test_settle_many_is_all_or_nothing(db):
+    _place(db, "placed", 10.0)
+    db.reserve("reserved", 10.0)
+
+    with pytest.raises(RuntimeError):
+        db.settle_many([("placed", 20.0), ("reserved", 20.0)])
+    assert _status(db, "placed") == "PLACED"
+    with pytest.raises(ValueError):
+        db.settle_many([("placed", 1.0), ("placed", 2.0)])
+
+
+def test_reconcile_settled_maps_bookmaker_outcomes(db):
+    for tx_id in ("win", "loss", "void", "open"): _place(db, tx_id, 10.0)
+    mm = MoneyManager(db)
+
+    settled = mm.reconcile_settled([
+        {"tx_id": "win", "status": "WIN", "payout": 30.0},
+        {"tx_id": "loss", "status": "LOSS"},
+        {"tx_id": "void", "status": "VOID"},
+        {"tx_id": "open", "status": "PENDING"},
+        {"tx_id": "unknown", "status": "WIN", "payout": 5.0},
+    ])
+    assert settled == 3
+    assert _status(db, "open") == "PLACED"
+    assert db.get_balance()[0] == pytest.approx(1000.0 - 40.0 + 30.0 + 10.0)
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from core.money_management import MoneyManager
+from core.signal_dedup import DuplicateSignalError, signal_fingerprint
+
+
+def test_fingerprint_ignores_team_order_and_formatting():
+    assert signal_fingerprint("Inter vs Milan", "1X2") == signal_fingerprint("milan - INTER", "1x2")
+    assert signal_fingerprint("Inter vs Milan", "1X2") != signal_fingerprint("Inter vs Milan", "Over 2.5")
+
+
+def test_duplicate_signal_is_rejected_without_reserving(db):
+    fp = signal_fingerprint("Inter vs Milan", "1X2")
+    db.reserve("tx-1", 10.0, match_hash=fp)
+    with pytest.raises(DuplicateSignalError):
+        db.reserve("tx-2", 10.0, match_hash=fp)
+    assert db.get_balance()[0] == pytest.approx(990.0)
+    assert MoneyManager(db).get_stake_and_reserve("tx-3", 10.0, 2.0, match_hash=fp) == 0.0
+
+    # Bet mai piazzata: il rollback libera il segnale
+    db.rollback("tx-1")
+    db.reserve("tx-4", 10.0, match_hash=fp)
+
+
+def test_expired_fingerprints_are_pruned(db):
+    fp = signal_fingerprint("Roma vs Lazio", "GG")
+    db.reserve("tx-1", 10.0, match_hash=fp)
+    db._run_write(lambda conn: conn.execute("UPDATE signal_dedup SET created_at = ?", (int(time.time()) - 7200,)))
+
+    db.set_dedup_ttl(3600)
+    assert db.prune_signal_dedup() == 1
+    db.reserve("tx-2", 10.0, match_hash=fp)
@@ -1,15 +1,24 @@
 import logging
 from datetime import datetime
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
                                QTableWidget, QTableWidgetItem, QHeaderView, QPushButton)
 from PySide6.QtCore import QTimer, Qt
 from PySide6.QtGui import QColor
 
+STATUS_FILTERS = ["TUTTI", "RESERVED", "PRE_COMMIT", "PLACED", "MANUAL_CHECK", "SETTLED", "VOID"]
+PAGE_SIZE = 100
+
 class HistoryTab(QWidget):
     def __init__(self, logger, controller):
         super().__init__()
         self.logger = logger
         self.controller = controller
+
+        # Stato di paginazione keyset: cursore della pagina visibile + versione del journal già mostrata
+        self._cursor = None        # None = pagina più recente
+        self._direction = "before"
+        self._page = {"rows": [], "next": None, "prev": None}
+        self._version = 0
         
         layout = QVBoxLayout(self)
         
@@ -27,11 +36,27 @@ class HistoryTab(QWidget):
             
         layout.addLayout(stats_layout)
         layout.addSpacing(10)
+
+        # --- FILTRI E PAGINAZIONE ---
+        nav_layout = QHBoxLayout()
+        self.status_combo = QComboBox()
+        self.status_combo.addItems(STATUS_FILTERS)
+        self.status_combo.currentIndexChanged.connect(self.first_page)
+        self.btn_newer = QPushButton("◀ Più recenti")
+        self.btn_newer.clicked.connect(self.newer_page)
+        self.btn_older = QPushButton("Più vecchie ▶")
+        self.btn_older.clicked.connect(self.older_page)
+        nav_layout.addWidget(QLabel("Stato:"))
+        nav_layout.addWidget(self.status_combo)
+        nav_layout.addStretch()
+        nav_layout.addWidget(self.btn_newer)
+        nav_layout.addWidget(self.btn_older)
+        layout.addLayout(nav_layout)
         
         # --- TABELLA STORICO ---
         self.table = QTableWidget(0, 8)
         self.table.setHorizontalHeaderLabels([
-            "ID", "Data/Ora", "Tavolo", "Evento", "Mercato", "Quota", "Stake", "Profit"
+            "ID", "Data/Ora", "Tavolo", "Evento", "Robot", "Stato", "Stake", "Profit"
         ])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setStyleSheet("background-color: #121212; gridline-color: #333;")
@@ -42,39 +67,86 @@ class HistoryTab(QWidget):
         self.timer.timeout.connect(self.refresh_data)
         self.timer.start(5000) # Ogni 5 secondi
         
-        self.refresh_data()
+        self.first_page()
+
+    # --- Paginazione ---
+
+    def _status_filter(self):
+        status = self.status_combo.currentText()
+        return None if status == "TUTTI" else status
+
+    def _load_page(self, cursor, direction):
+        db = self.controller.db
+        kwargs = {direction: cursor} if cursor is not None else {}
+        self._page = db.history_page(limit=PAGE_SIZE, status=self._status_filter(), **kwargs)
+        self._cursor, self._direction = cursor, direction
+        self._render_rows(self._page["rows"])
+
+    def first_page(self):
+        try:
+            self._version = self.controller.db.journal_version()
+            self._load_page(None, "before")
+            self._refresh_stats()
+        except Exception as e:
+            logging.error(f"❌ [HISTORY] Errore caricamento storico: {e}")
+
+    def older_page(self):
+        if self._page.get("next"): self._load_page(self._page["next"], "before")
+
+    def newer_page(self):
+        if self._page.get("prev"): self._load_page(self._page["prev"], "after")
+        else: self._load_page(None, "before")
+
+    # --- Refresh ---
 
     def refresh_data(self):
         try:
-            # Recupera dati dal database del controller
-            bets = self.controller.db.get_all_bets()
-            current_balance = self.controller.db.get_current_balance()
-            peak_balance = self.controller.db.get_peak_balance()
-            pending_count = len([b for b in bets if b['status'] == 'PENDING'])
-            
-            # Blocca aggiornamento grafico per performance
-            self.table.setUpdatesEnabled(False)
-            self.table.setRowCount(0)
-            
-            for row_idx, b in enumerate(bets):
-                self.table.insertRow(row_idx)
-                # ... popolamento celle ...
-                self.table.setItem(row_idx, 0, QTableWidgetItem(str(b['id'])))
-                self.table.setItem(row_idx, 3, QTableWidgetItem(b['teams']))
-                # ... (restante logica di popolamento) ...
-            
-            self.table.setUpdatesEnabled(True)
-            
-            # Aggiorna Label
-            self.lbl_balance.setText(f"💰 Saldo Attuale: € {current_balance:.2f}")
-            self.lbl_peak.setText(f"⛰️ Peak Balance: € {peak_balance:.2f}")
-            self.lbl_pending.setText(f"⏳ In Corso: {pending_count}")
-            
-            net_profit = current_balance - 1000.0 # Assumendo 1000 come base
-            self.lbl_profit.setText(f"📈 Profitto Netto: € {net_profit:.2f}")
-            
+            # Solo il delta dall'ultima versione vista: costo indipendente dalla dimensione del journal
+            changes = self.controller.db.history_changes(self._version, limit=PAGE_SIZE)
+            self._version = changes["version"]
+            if changes["rows"]:
+                # Qualcosa è cambiato: si rilegge solo la pagina visibile
+                self._load_page(self._cursor, self._direction)
+            self._refresh_stats()
+
             # Log silenzioso (Debug) per tracciamento vita
-            logging.debug(f"📊 [HISTORY] Refresh eseguito. Saldo: {current_balance}, Bet attive: {pending_count}")
+            logging.debug(f"📊 [HISTORY] Refresh eseguito. Cambi: {len(changes['rows'])}, versione journal: {self._version}")
 
         except Exception as e:
             logging.error(f"❌ [HISTORY] Errore durante il refresh dello storico: {e}")
+
+    def _refresh_stats(self):
+        db = self.controller.db
+        current_balance, peak_balance = db.get_balance()
+        pending_count = db.mirror.pending_count
+
+        self.lbl_balance.setText(f"💰 Saldo Attuale: € {current_balance:.2f}")
+        self.lbl_peak.setText(f"⛰️ Peak Balance: € {peak_balance:.2f}")
+        self.lbl_pending.setText(f"⏳ In Corso: {pending_count}")
+
+        # P&L realizzato dalle analytics (incrementali dopo il warm-up in background)
+        if db.analytics.ready:
+            stats = db.journal_analytics()
+            self.lbl_profit.setText(f"📈 Profitto Netto: € {stats['net_profit']:.2f} (ROI {stats['roi'] * 100:.1f}%)")
+
+    def _render_rows(self, bets):
+        # Blocca aggiornamento grafico per performance
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(bets))
+
+        for row_idx, b in enumerate(bets):
+            ts = datetime.fromtimestamp(b["timestamp"]).strftime("%d/%m %H:%M:%S") if b.get("timestamp") else ""
+            profit = (b.get("payout") or 0.0) - (b.get("amount") or 0.0) if b["status"] == "SETTLED" else None
+            cells = [
+                str(b["tx_id"])[:8], ts, str(b.get("table_id") or ""), b.get("teams") or "",
+                b.get("robot") or "", b["status"], f"{b.get('amount') or 0.0:.2f}",
+                f"{profit:+.2f}" if profit is not None else "—",
+            ]
+            for col, text in enumerate(cells):
+                self.table.setItem(row_idx, col, QTableWidgetItem(text))
+            if profit is not None:
+                self.table.item(row_idx, 7).setForeground(QColor("#4caf50" if profit > 0 else "#f44336"))
+
+        self.table.setUpdatesEnabled(True)
+        self.btn_older.setEnabled(bool(self._page.get("next")))
+        self.btn_newer.setEnabled(self._cursor is not None)